@@ -0,0 +1,108 @@
+"""Recall@k versus latency report for the in-memory IVF index.
+
+Builds an ``InMemoryVectorStore`` with ``index="ivf"`` and compares each
+``nprobe`` setting against exact search over the same store.
+
+    python benchmarks/ann_recall.py --vectors 200000 --dim 768 --nprobe 4 8 16 32 64
+    python benchmarks/ann_recall.py --from-npy embeddings.npy --json report.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ragify.memory_vector_store import InMemoryVectorStore  # noqa: E402
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    data = centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def measure(store: InMemoryVectorStore, queries: np.ndarray, k: int, **kwargs) -> tuple[list[set], list[float]]:
+    """Run every query, returning result id sets and per-query latency in ms."""
+    results, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        hits = store.search_hits(q, k, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({h["id"] for h in hits})
+    return results, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100_000, help="number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=768, help="synthetic vector dimension")
+    parser.add_argument("--from-npy", help="load vectors from an .npy file instead of generating them")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: 4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this path as JSON")
+    args = parser.parse_args()
+
+    if args.from_npy:
+        data = np.load(args.from_npy).astype(np.float32)
+    else:
+        data = synthetic_vectors(args.vectors, args.dim, clusters=max(8, args.vectors // 1000), seed=args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = data[rng.choice(len(data), size=args.queries, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+    store = InMemoryVectorStore(index="ivf", nlist=args.nlist, min_train_size=len(data) + 1)
+    store.upsert([str(i) for i in range(len(data))], data, [{"text": "", "source": ""}] * len(data))
+    start = time.perf_counter()
+    store.rebuild_index()
+    train_s = time.perf_counter() - start
+
+    truth, exact_ms = measure(store, queries, args.k, exact=True)
+    rows = [{
+        "mode": "exact",
+        "nprobe": None,
+        "recall": 1.0,
+        "p50_ms": float(np.percentile(exact_ms, 50)),
+        "p95_ms": float(np.percentile(exact_ms, 95)),
+    }]
+    for nprobe in args.nprobe:
+        found, ms = measure(store, queries, args.k, nprobe=nprobe)
+        recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+        rows.append({
+            "mode": "ivf",
+            "nprobe": nprobe,
+            "recall": float(recall),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+        })
+
+    report = {
+        "vectors": len(data),
+        "dim": data.shape[1],
+        "k": args.k,
+        "nlist": len(store._index.centroids),
+        "train_seconds": train_s,
+        "results": rows,
+    }
+    print(f"n={report['vectors']} dim={report['dim']} nlist={report['nlist']} "
+          f"k={args.k} train={train_s:.2f}s")
+    print(f"{'mode':<6} {'nprobe':>6} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in rows:
+        nprobe = "-" if r["nprobe"] is None else r["nprobe"]
+        print(f"{r['mode']:<6} {nprobe:>6} {r['recall']:>9.3f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
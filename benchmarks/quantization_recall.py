@@ -0,0 +1,98 @@
+"""Recall@k, latency and memory per vector for quantized in-memory search.
+
+Builds one ``InMemoryVectorStore`` per quantization mode (and per
+``--prefix-dim`` for two-stage Matryoshka search) over the same vectors and
+compares each against exact float32 search. Synthetic vectors spread their
+information evenly across dimensions, so prefix results are only
+meaningful with real text-embedding-3 vectors loaded via ``--from-npy``.
+
+    python benchmarks/quantization_recall.py --vectors 100000 --dim 3072 --rescore-factor 4 10
+    python benchmarks/quantization_recall.py --from-npy embeddings.npy --prefix-dim 256 512 --json report.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ragify.memory_vector_store import InMemoryVectorStore  # noqa: E402
+from ann_recall import measure, synthetic_vectors  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=50_000, help="number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=3072, help="synthetic vector dimension")
+    parser.add_argument("--from-npy", help="load vectors from an .npy file instead of generating them")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", default=["int8", "binary"], choices=["int8", "binary"])
+    parser.add_argument("--prefix-dim", type=int, nargs="*", default=[],
+                        help="also run two-stage search on these prefix sizes")
+    parser.add_argument("--rescore-factor", type=int, nargs="+", default=[1, 4, 10])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this path as JSON")
+    args = parser.parse_args()
+
+    if args.from_npy:
+        data = np.load(args.from_npy).astype(np.float32)
+    else:
+        data = synthetic_vectors(args.vectors, args.dim, clusters=max(8, args.vectors // 1000), seed=args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = data[rng.choice(len(data), size=args.queries, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+    ids = [str(i) for i in range(len(data))]
+    payloads = [{"text": "", "source": ""}] * len(data)
+
+    baseline = InMemoryVectorStore(quantization="none", lexical=False)
+    baseline.upsert(ids, data, payloads)
+    truth, exact_ms = measure(baseline, queries, args.k)
+    rows = [{
+        "mode": "float32",
+        "prefix_dim": None,
+        "rescore_factor": None,
+        "bytes_per_vector": baseline.memory_stats()["bytes_per_vector"],
+        "recall": 1.0,
+        "p50_ms": float(np.percentile(exact_ms, 50)),
+        "p95_ms": float(np.percentile(exact_ms, 95)),
+    }]
+    del baseline
+
+    configs = [(mode, None) for mode in args.modes]
+    configs += [(mode, prefix) for prefix in args.prefix_dim for mode in ["none", *args.modes]]
+    for mode, prefix_dim in configs:
+        store = InMemoryVectorStore(quantization=mode, prefix_dim=prefix_dim, lexical=False)
+        store.upsert(ids, data, payloads)
+        for factor in args.rescore_factor:
+            store.rescore_factor = factor
+            found, ms = measure(store, queries, args.k)
+            recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+            rows.append({
+                "mode": "float32" if mode == "none" else mode,
+                "prefix_dim": prefix_dim,
+                "rescore_factor": factor,
+                "bytes_per_vector": store.memory_stats()["bytes_per_vector"],
+                "recall": float(recall),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+            })
+        store.close()
+
+    report = {"vectors": len(data), "dim": data.shape[1], "k": args.k, "results": rows}
+    print(f"n={report['vectors']} dim={report['dim']} k={args.k}")
+    print(f"{'mode':<8} {'prefix':>6} {'rescore':>7} {'B/vec':>7} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in rows:
+        prefix = "-" if r["prefix_dim"] is None else r["prefix_dim"]
+        factor = "-" if r["rescore_factor"] is None else r["rescore_factor"]
+        print(f"{r['mode']:<8} {prefix:>6} {factor:>7} {r['bytes_per_vector']:>7} {r['recall']:>9.3f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
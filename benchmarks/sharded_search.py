@@ -0,0 +1,83 @@
+"""Query latency of sharded exact search versus shard size and thread count.
+
+Builds one flat ``InMemoryVectorStore`` and times the same queries with
+each ``shard_size`` x ``search_threads`` combination (threads=1 is the
+single-scan baseline), reporting p50/p95 latency, speedup over the
+baseline and batched search throughput. Set ``OMP_NUM_THREADS`` /
+``OPENBLAS_NUM_THREADS`` to 1 to keep BLAS threads from competing with the
+search pool.
+
+    python benchmarks/sharded_search.py --vectors 500000 --dim 768 --threads 1 2 4 8 16
+    python benchmarks/sharded_search.py --shard-sizes 16384 65536 --json report.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ragify.memory_vector_store import InMemoryVectorStore  # noqa: E402
+from ann_recall import measure, synthetic_vectors  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=200_000, help="number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=768, help="synthetic vector dimension")
+    parser.add_argument("--shard-sizes", type=int, nargs="+", default=[16_384, 65_536])
+    parser.add_argument("--threads", type=int, nargs="+", default=[2, 4, 8, 16])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=64, help="queries per batched search")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this path as JSON")
+    args = parser.parse_args()
+
+    data = synthetic_vectors(args.vectors, args.dim, clusters=max(8, args.vectors // 1000), seed=args.seed)
+    store = InMemoryVectorStore(index="flat", lexical=False, quantization="none", search_threads=1)
+    store.upsert([f"v{i}" for i in range(len(data))], data, [{"i": i} for i in range(len(data))])
+    rng = np.random.default_rng(args.seed + 1)
+    queries = data[rng.choice(len(data), size=args.queries)]
+
+    def run(shard_size: int, threads: int) -> tuple[list[set], dict]:
+        store.shard_size, store.search_threads = shard_size, threads
+        measure(store, queries[:5], args.k)  # warm-up
+        results, latencies = measure(store, queries, args.k)
+        start = time.perf_counter()
+        store.search_hits_many(queries[:args.batch], args.k)
+        batch_seconds = time.perf_counter() - start
+        return results, {
+            "shard_size": shard_size,
+            "threads": threads,
+            "shards": -(-len(data) // shard_size) if threads > 1 else 1,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "batch_queries_per_sec": min(args.batch, len(queries)) / batch_seconds,
+        }
+
+    exact, baseline = run(len(data), 1)
+    rows = [baseline]
+    for shard_size in args.shard_sizes:
+        for threads in args.threads:
+            results, row = run(shard_size, threads)
+            if results != exact:
+                raise AssertionError(f"shard_size={shard_size} threads={threads} changed the results")
+            rows.append(row)
+
+    print(f"{len(data)} vectors x {args.dim} dims, k={args.k}, {os.cpu_count()} CPUs")
+    print(f"{'shard size':>10} {'threads':>7} {'shards':>6} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8} {'batch q/s':>10}")
+    for r in rows:
+        print(f"{r['shard_size']:>10} {r['threads']:>7} {r['shards']:>6} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+              f"{baseline['p50_ms'] / r['p50_ms']:>7.2f}x {r['batch_queries_per_sec']:>10.0f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"config": vars(args), "cpus": os.cpu_count(), "results": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Cold-start benchmark: import time of the ragify entry points.
+
+Each module is imported in fresh interpreters, as a new API worker or
+Streamlit process would. Reports the median wall time of the import (the
+interpreter's own start-up excluded), which heavy third-party packages it
+pulled in, and the packages that account for most of the time according to
+``python -X importtime``. With ``--budget-ms`` the exit status is 1 when any
+module's median exceeds the budget, so CI can guard cold-start regressions.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --modules ragify.api --budget-ms 1500 --json results/startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+DEFAULT_MODULES = [
+    "ragify.config",
+    "ragify.rag_service",
+    "ragify.async_rag_service",
+    "ragify.api",
+]
+
+# Packages that should load only when the code path using them runs
+HEAVY_PACKAGES = [
+    "anthropic",
+    "llama_index",
+    "openai",
+    "pypdf",
+    "qdrant_client",
+    "sentence_transformers",
+    "streamlit",
+]
+
+_CHILD = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module({module!r})
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [p for p in {heavy!r} if p in sys.modules]}}))
+"""
+
+
+def _run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(SRC), os.environ.get("PYTHONPATH")])))
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], capture_output=True, text=True, env=env, check=True
+    )
+
+
+def time_import(module: str, repeat: int) -> dict:
+    runs = [json.loads(_run(_CHILD.format(module=module, heavy=HEAVY_PACKAGES)).stdout) for _ in range(repeat)]
+    ms = [1000 * r["seconds"] for r in runs]
+    return {
+        "module": module,
+        "median_ms": statistics.median(ms),
+        "min_ms": min(ms),
+        "max_ms": max(ms),
+        "heavy_loaded": runs[0]["loaded"],
+        "top_packages": top_packages(module),
+    }
+
+
+def top_packages(module: str, limit: int = 8) -> list[tuple[str, float]]:
+    """Top-level packages by total self time (ms) from ``-X importtime``."""
+    stderr = _run(f"import {module}", "-X", "importtime").stderr
+    totals: dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us) / 1000
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--budget-ms", type=float, help="fail when a module's median import exceeds this")
+    parser.add_argument("--json", help="write the report to this path as JSON")
+    args = parser.parse_args()
+
+    rows = [time_import(module, args.repeat) for module in args.modules]
+    print(f"{'module':<26} {'median ms':>10} {'min ms':>8} {'max ms':>8}  heavy packages loaded")
+    for r in rows:
+        print(f"{r['module']:<26} {r['median_ms']:>10.1f} {r['min_ms']:>8.1f} {r['max_ms']:>8.1f}  "
+              f"{', '.join(r['heavy_loaded']) or '-'}")
+    for r in rows:
+        print(f"\n{r['module']} top packages (self ms): "
+              + ", ".join(f"{name} {ms:.0f}" for name, ms in r["top_packages"]))
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps({"config": vars(args), "imports": rows}, indent=2))
+    if args.budget_ms is not None:
+        over = [r["module"] for r in rows if r["median_ms"] > args.budget_ms]
+        if over:
+            print(f"\nover the {args.budget_ms:.0f} ms budget: {', '.join(over)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Offline benchmarks for the ingest and query hot paths.
+
+Everything runs locally: PDFs are generated from seeded synthetic text and
+embeddings come from the local ``HashingEmbeddingService``, so no API key or
+network is needed and runs on the same machine are comparable. Measures
+chunking throughput, end-to-end ingest chunks/sec, single-query search
+latency (p50/p95/p99) and memory per vector at several store sizes, and
+batched search throughput.
+
+    python benchmarks/suite.py --json results/main.json
+    python benchmarks/suite.py --sizes 1000 10000 --json results/branch.json --compare results/main.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ragify.document_processor import DocumentLoader  # noqa: E402
+from ragify.embedding_backends import HashingEmbeddingService  # noqa: E402
+from ragify.manifest import IngestManifest  # noqa: E402
+from ragify.memory_vector_store import InMemoryVectorStore  # noqa: E402
+from ragify.rag_service import RAGService  # noqa: E402
+from ann_recall import synthetic_vectors  # noqa: E402
+
+_WORDS = (
+    "index vector query latency throughput cache shard embedding token chunk "
+    "document page source memory batch search score rank filter payload model "
+    "request response stream budget recall precision cluster centroid quantize"
+).split()
+
+
+def synthetic_text(rng: np.random.Generator, sentences: int) -> str:
+    """Seeded sentences of 6-18 words from a fixed vocabulary."""
+    out = []
+    for _ in range(sentences):
+        words = rng.choice(_WORDS, size=int(rng.integers(6, 19)))
+        out.append(" ".join(words).capitalize() + ".")
+    return " ".join(out)
+
+
+def write_pdf(path: Path, pages: list[str]):
+    """Write a minimal uncompressed PDF with one Helvetica text block per page."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        lines = [text[j:j + 90] for j in range(0, len(text), 90)]
+        shown = " ".join(
+            "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") '" for line in lines
+        )
+        ops = f"BT /F1 10 Tf 40 800 Td 12 TL {shown} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(ops)} >>\nstream\n{ops}\nendstream")
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+
+
+def percentiles(ms: list[float]) -> dict[str, float]:
+    return {f"p{p}_ms": float(np.percentile(ms, p)) for p in (50, 95, 99)}
+
+
+def bench_chunking(pdfs: list[Path]) -> dict:
+    loader = DocumentLoader()
+    loader.splitter.split_text("Loads the tokenizer before timing starts.")
+    start = time.perf_counter()
+    chunks = chars = 0
+    for pdf in pdfs:
+        for _, text in loader.iter_chunks(str(pdf)):
+            chunks += 1
+            chars += len(text)
+    seconds = time.perf_counter() - start
+    return {
+        "documents": len(pdfs),
+        "chunks": chunks,
+        "seconds": seconds,
+        "chunks_per_sec": chunks / seconds,
+        "mb_per_sec": chars / seconds / 1e6,
+    }
+
+
+def bench_ingest(pdfs: list[Path], dim: int) -> dict:
+    service = RAGService(
+        embedding_service=HashingEmbeddingService(dim=dim, cache=None),
+        vector_store=InMemoryVectorStore(lexical=False),
+        manifest=IngestManifest(),
+    )
+    start = time.perf_counter()
+    chunks = sum(service.ingest_document(str(pdf), source_id=pdf.name).ingested for pdf in pdfs)
+    seconds = time.perf_counter() - start
+    return {"documents": len(pdfs), "chunks": chunks, "seconds": seconds, "chunks_per_sec": chunks / seconds}
+
+
+def build_store(size: int, dim: int, seed: int) -> tuple[InMemoryVectorStore, np.ndarray, int]:
+    """Store of ``size`` synthetic vectors; returns it, the vectors and bytes allocated building it."""
+    data = synthetic_vectors(size, dim, clusters=max(8, size // 1000), seed=seed)
+    ids = [f"v{i}" for i in range(size)]
+    payloads = [{"text": f"chunk {i}", "source": f"doc-{i % 100}.pdf", "chunk_index": i} for i in range(size)]
+    tracemalloc.start()
+    store = InMemoryVectorStore(lexical=False)
+    store.upsert(ids, data, payloads)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return store, data, allocated
+
+
+def bench_search(sizes: list[int], dim: int, queries: int, top_k: int, batch: int, seed: int) -> list[dict]:
+    rows = []
+    rng = np.random.default_rng(seed + 1)
+    for size in sizes:
+        store, data, allocated = build_store(size, dim, seed)
+        picks = data[rng.choice(size, size=queries, replace=size < queries)]
+        query_vectors = picks + 0.05 * rng.normal(size=picks.shape).astype(np.float32)
+        store.search_hits(query_vectors[0], top_k)  # warm-up
+        latencies = []
+        for q in query_vectors:
+            start = time.perf_counter()
+            store.search_hits(q, top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        batch_vectors = query_vectors[:batch] if batch <= queries else np.resize(query_vectors, (batch, dim))
+        start = time.perf_counter()
+        store.search_hits_many(batch_vectors, top_k)
+        batch_seconds = time.perf_counter() - start
+        rows.append({
+            "vectors": size,
+            **percentiles(latencies),
+            "queries_per_sec": 1000 * len(latencies) / sum(latencies),
+            "batch_queries_per_sec": len(batch_vectors) / batch_seconds,
+            "vector_bytes": store.memory_stats()["bytes_per_vector"],
+            "bytes_per_vector": allocated / size,
+        })
+        store.close()
+    return rows
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=Path(__file__).parent, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(report: dict, baseline: dict):
+    """Print each metric's ratio to the baseline run (>1 is faster for rates, slower for latencies)."""
+    print(f"\nvs {baseline['environment'].get('commit')} ({baseline['environment']['timestamp']})")
+    for name in ("chunking", "ingest"):
+        old, new = baseline.get(name), report.get(name)
+        if old and new:
+            print(f"{name:<9} chunks/s {new['chunks_per_sec'] / old['chunks_per_sec']:>6.2f}x")
+    old_rows = {r["vectors"]: r for r in baseline.get("search", [])}
+    for row in report["search"]:
+        old = old_rows.get(row["vectors"])
+        if old:
+            print(f"search {row['vectors']:>8}  p50 {row['p50_ms'] / old['p50_ms']:>5.2f}x  "
+                  f"p99 {row['p99_ms'] / old['p99_ms']:>5.2f}x  "
+                  f"batch q/s {row['batch_queries_per_sec'] / old['batch_queries_per_sec']:>5.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=20, help="synthetic PDFs to chunk and ingest")
+    parser.add_argument("--pages", type=int, default=10, help="pages per synthetic PDF")
+    parser.add_argument("--dim", type=int, default=256, help="embedding dimension")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=500, help="single queries timed per size")
+    parser.add_argument("--batch", type=int, default=256, help="queries per batched search")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this path as JSON")
+    parser.add_argument("--compare", help="baseline report to print ratios against")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        pdfs = []
+        for i in range(args.documents):
+            pdfs.append(Path(tmp) / f"doc-{i:03d}.pdf")
+            write_pdf(pdfs[-1], [synthetic_text(rng, 40) for _ in range(args.pages)])
+        chunking = bench_chunking(pdfs)
+        ingest = bench_ingest(pdfs, args.dim)
+    search = bench_search(args.sizes, args.dim, args.queries, args.k, args.batch, args.seed)
+
+    report = {
+        "environment": environment(),
+        "config": vars(args),
+        "chunking": chunking,
+        "ingest": ingest,
+        "search": search,
+    }
+    print(f"chunking  {chunking['chunks']} chunks  {chunking['chunks_per_sec']:>9.0f} chunks/s  "
+          f"{chunking['mb_per_sec']:.2f} MB/s")
+    print(f"ingest    {ingest['chunks']} chunks  {ingest['chunks_per_sec']:>9.0f} chunks/s")
+    print(f"{'vectors':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/s':>8} {'batch q/s':>10} {'B/vec':>8}")
+    for r in search:
+        print(f"{r['vectors']:>8} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['p99_ms']:>8.3f} "
+              f"{r['queries_per_sec']:>8.0f} {r['batch_queries_per_sec']:>10.0f} {r['bytes_per_vector']:>8.0f}")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Semantic cache of generated answers keyed on query embeddings."""
+import hashlib
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from .metrics import metrics
+
+
+def corpus_scope(sources: dict[str, str], **params) -> str:
+    """Scope key for a corpus state: every source with its version, plus query params.
+
+    Re-ingesting a document changes its version and therefore the scope, so
+    answers generated against the old content stop matching.
+    """
+    key = json.dumps({"sources": sorted(sources.items()), "params": params}, sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Entry:
+    vector: np.ndarray
+    scope: str
+    value: dict
+    expires_at: float
+
+
+class SemanticAnswerCache:
+    """LRU + TTL cache where a hit is a cached query with cosine similarity >= ``threshold``.
+
+    Entries are partitioned by scope and only compared against queries in the
+    same scope. Lookups score every live entry of the scope in one
+    matrix-vector product.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 1024):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._by_scope: dict[str, list[int]] = {}
+        # Stacked vectors per scope, rebuilt lazily after the scope changes
+        self._matrices: dict[str, tuple[list[int], np.ndarray]] = {}
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _drop(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        ids = self._by_scope[entry.scope]
+        ids.remove(entry_id)
+        if not ids:
+            del self._by_scope[entry.scope]
+        self._matrices.pop(entry.scope, None)
+
+    def lookup(self, query_vector, scope: str) -> dict | None:
+        """Return the cached value for the most similar query in ``scope``, if close enough."""
+        query = self._normalize(query_vector)
+        now = time.monotonic()
+        with self._lock:
+            for entry_id in [i for i in self._by_scope.get(scope, ()) if self._entries[i].expires_at <= now]:
+                self._drop(entry_id)
+
+            best = None
+            if scope in self._by_scope:
+                if scope not in self._matrices:
+                    ids = list(self._by_scope[scope])
+                    self._matrices[scope] = (ids, np.stack([self._entries[i].vector for i in ids]))
+                ids, matrix = self._matrices[scope]
+                scores = matrix @ query
+                top = int(np.argmax(scores))
+                if scores[top] >= self.threshold:
+                    best = ids[top]
+
+            if best is None:
+                self.misses += 1
+                metrics.cache_lookups("answer", 0, 1)
+                return None
+            self.hits += 1
+            metrics.cache_lookups("answer", 1, 0)
+            self._entries.move_to_end(best)
+            return self._entries[best].value
+
+    def store(self, query_vector, scope: str, value: dict):
+        """Cache ``value`` as the answer for ``query_vector`` within ``scope``."""
+        entry_id = next(self._ids)
+        with self._lock:
+            self._entries[entry_id] = _Entry(
+                vector=self._normalize(query_vector),
+                scope=scope,
+                value=value,
+                expires_at=time.monotonic() + self.ttl_seconds,
+            )
+            self._by_scope.setdefault(scope, []).append(entry_id)
+            self._matrices.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict[str, float]:
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._by_scope.clear()
+            self._matrices.clear()
@@ -1,11 +1,30 @@
 """FastAPI application and Inngest functions."""
+import json
 import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import inngest
 import inngest.fast_api
 
+from ragify.async_rag_service import AsyncRAGService
 from ragify.config import settings
-from ragify.models import RAGChunkAndSrc, RAGUpsertResult, RAGSearchResult
+from ragify.filters import validate_filter
+from ragify.generation import SYSTEM_PROMPT, AnswerGenerator
+from ragify.metrics import metrics
+from ragify.models import (
+    RAGBatchSearchRequest,
+    RAGBatchSearchResult,
+    RAGCachedAnswer,
+    RAGChunkAndSrc,
+    RAGQueryRequest,
+    RAGQueryResult,
+    RAGSearchResult,
+    RAGUpsertResult,
+)
 from ragify.rag_service import RAGService
 from ragify.llm import get_llm_adapter
 
@@ -18,8 +37,39 @@ inngest_client = inngest.Inngest(
     serializer=inngest.PydanticSerializer()
 )
 
-# Initialize RAG service
-rag_service = RAGService()
+# RAG services are built on first use, so importing the app (and worker start-up)
+# does not create API clients or connect to Qdrant
+_services: tuple[RAGService, AsyncRAGService] | None = None
+_services_lock = threading.Lock()
+
+
+def _get_services() -> tuple[RAGService, AsyncRAGService]:
+    global _services
+    if _services is None:
+        with _services_lock:
+            if _services is None:
+                rag_service = RAGService()
+                # Shares the embedding service, answer cache and manifest with the Inngest functions.
+                # Hybrid search needs the BM25 index kept by the writing store, so it is shared too.
+                async_rag_service = AsyncRAGService(
+                    embedding_service=rag_service.embedding_service,
+                    vector_store=rag_service.vector_store if settings.search_mode == "hybrid" else None,
+                    answer_cache=rag_service.answer_cache,
+                    manifest=rag_service.manifest,
+                    generator=AnswerGenerator(),
+                )
+                _services = (rag_service, async_rag_service)
+    return _services
+
+
+def get_rag_service() -> RAGService:
+    """The shared ``RAGService`` used by the Inngest functions."""
+    return _get_services()[0]
+
+
+def get_async_rag_service() -> AsyncRAGService:
+    """The shared ``AsyncRAGService`` used by the HTTP routes."""
+    return _get_services()[1]
 
 
 @inngest_client.create_function(
@@ -30,6 +80,7 @@ async def rag_ingest_pdf(ctx: inngest.Context):
     """Ingest a PDF document into the RAG system."""
     pdf_path = ctx.event.data["pdf_path"]
     source_id = ctx.event.data.get("source_id", pdf_path)
+    rag_service = get_rag_service()
     
     def _ingest() -> RAGUpsertResult:
         return rag_service.ingest_document(pdf_path, source_id)
@@ -46,10 +97,24 @@ async def rag_query_pdf_ai(ctx: inngest.Context):
     """Query the RAG system and generate an answer."""
     question = ctx.event.data["question"]
     top_k = int(ctx.event.data.get("top_k", 5))
+    # Optional chunk metadata filter, e.g. {"source": "manual.pdf"}
+    search_filter = validate_filter(ctx.event.data.get("filter"))
+    rag_service = get_rag_service()
+    
+    # Reuse the answer to a near-duplicate question over unchanged documents
+    def _cached() -> RAGCachedAnswer:
+        query_vector = rag_service.embed_query(question)
+        return RAGCachedAnswer(result=rag_service.lookup_answer(query_vector, top_k, search_filter))
+    
+    cached = await ctx.step.run("cached-answer", _cached, output_type=RAGCachedAnswer)
+    if cached.result is not None:
+        return cached.result.model_dump()
     
     # Search for relevant context
     def _search() -> RAGSearchResult:
-        return rag_service.search_context(question, top_k)
+        return rag_service.search_by_vector(
+            rag_service.embed_query(question), top_k, query_text=question, filter=search_filter
+        )
     
     found = await ctx.step.run("search-context", _search, output_type=RAGSearchResult)
     
@@ -67,22 +132,108 @@ async def rag_query_pdf_ai(ctx: inngest.Context):
             "max_tokens": 1024,
             "temperature": 0.2,
             "messages": [
-                {"role": "system", "content": "You answer questions using only the provided context."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": user_content}
             ]
         }
     )
     
     answer = res["choices"][0]["message"]["content"].strip()
+    result = RAGQueryResult(
+        answer=answer,
+        sources=found.sources,
+        num_contexts=len(found.contexts)
+    )
+    
+    def _store() -> None:
+        rag_service.store_answer(rag_service.embed_query(question), top_k, result, search_filter)
+    
+    await ctx.step.run("cache-answer", _store)
+    return result.model_dump()
+
+
+@inngest_client.create_function(
+    fn_id="RAG: Batch Search",
+    trigger=inngest.TriggerEvent(event="rag/search_batch")
+)
+async def rag_search_batch(ctx: inngest.Context):
+    """Retrieve context for many questions at once (evaluations, cache pre-warming)."""
+    questions = list(ctx.event.data["questions"])
+    top_k = int(ctx.event.data.get("top_k", 5))
+    search_filter = validate_filter(ctx.event.data.get("filter"))
+    rag_service = get_rag_service()
+    
+    def _search() -> RAGBatchSearchResult:
+        return RAGBatchSearchResult(results=rag_service.search_context_batch(questions, top_k, search_filter))
+    
+    found = await ctx.step.run("search-context-batch", _search, output_type=RAGBatchSearchResult)
+    return found.model_dump()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    if _services is not None:
+        await _services[1].aclose()
+
+
+# Create FastAPI app
+app = FastAPI(title="RAGify API", version="0.1.0", lifespan=lifespan)
+
+
+@app.post("/search", response_model=RAGSearchResult)
+async def search(request: RAGQueryRequest) -> RAGSearchResult:
+    """Retrieve context for a question without going through Inngest."""
+    return await get_async_rag_service().search_context(request.question, request.top_k, request.filter)
+
+
+@app.post("/search/batch", response_model=RAGBatchSearchResult)
+async def search_batch(request: RAGBatchSearchRequest) -> RAGBatchSearchResult:
+    """Retrieve context for many questions with batched embedding and one search pass."""
+    results = await get_async_rag_service().search_context_batch(request.questions, request.top_k, request.filter)
+    return RAGBatchSearchResult(results=results)
+
+
+@app.post("/query", response_model=RAGQueryResult)
+async def query(request: RAGQueryRequest) -> RAGQueryResult:
+    """Answer a question directly, skipping event dispatch and step orchestration."""
+    return await get_async_rag_service().query(request.question, request.top_k, request.filter)
+
+
+@app.post("/query/stream")
+async def query_stream(request: RAGQueryRequest) -> StreamingResponse:
+    """Stream the answer as Server-Sent Events (``context``, ``token``..., ``done``)."""
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event, data in get_async_rag_service().stream_query(request.question, request.top_k, request.filter):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            logging.getLogger("uvicorn").exception("Streaming query failed")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/cache/stats")
+async def cache_stats() -> dict[str, dict | None]:
+    """Hit rates and sizes of the answer and embedding caches (None when disabled)."""
+    rag_service = get_rag_service()
+    answer_cache = rag_service.answer_cache
+    embedding_cache = rag_service.embedding_service.cache
     return {
-        "answer": answer,
-        "sources": found.sources,
-        "num_contexts": len(found.contexts)
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "embedding_cache": embedding_cache.stats() if embedding_cache is not None else None,
     }
 
 
-# Create FastAPI app
-app = FastAPI(title="RAGify API", version="0.1.0")
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics() -> PlainTextResponse:
+    """Per-stage durations, item and token counts and cache lookups in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # Register Inngest functions
-inngest.fast_api.serve(app, inngest_client, [rag_ingest_pdf, rag_query_pdf_ai])
+inngest.fast_api.serve(app, inngest_client, [rag_ingest_pdf, rag_query_pdf_ai, rag_search_batch])
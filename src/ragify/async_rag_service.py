@@ -0,0 +1,176 @@
+"""Async RAG service for low-latency, concurrent query serving."""
+import asyncio
+import inspect
+from typing import AsyncIterator
+
+from .answer_cache import SemanticAnswerCache, corpus_scope
+from .config import settings
+from .embedding_backends import EmbeddingBackend, create_embedding_service
+from .filters import SearchFilter
+from .generation import AnswerGenerator
+from .manifest import IngestManifest
+from .metrics import metrics
+from .models import RAGQueryResult, RAGSearchResult
+from .rag_service import RAGService
+
+
+class AsyncRAGService:
+    """Async counterpart of ``RAGService`` for the query path.
+
+    Embeddings, vector search and LLM calls are awaited instead of blocking,
+    so one worker can serve many queries concurrently. All HTTP clients are
+    created once and reuse their connection pools; answers come from a shared
+    ``AnswerGenerator``. Synchronous vector stores (such as
+    ``InMemoryVectorStore``) are searched on a worker thread.
+
+    With an ``answer_cache``, answers are scoped to the document versions
+    recorded in ``manifest`` exactly as in ``RAGService``.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingBackend | None = None,
+        vector_store=None,
+        answer_cache: SemanticAnswerCache | None = None,
+        manifest: IngestManifest | None = None,
+        generator: AnswerGenerator | None = None,
+    ):
+        self.embedding_service = embedding_service or create_embedding_service()
+        if vector_store is None:
+            from .vector_store import AsyncVectorStore
+            vector_store = AsyncVectorStore()
+        self.vector_store = vector_store
+        self.answer_cache = answer_cache
+        self.manifest = manifest or IngestManifest(settings.manifest_path)
+        self.generator = generator or AnswerGenerator()
+
+    async def search_context(
+        self,
+        question: str,
+        top_k: int = 5,
+        filter: SearchFilter | None = None,
+        mmr: bool | None = None,
+    ) -> RAGSearchResult:
+        """Search for relevant context given a question, optionally restricted by a metadata filter.
+
+        ``mmr`` (default ``MMR_ENABLED``) re-ranks candidates for diversity as in ``RAGService``.
+        """
+        query_vector = (await self.embedding_service.aembed_texts([question]))[0]
+        return await self.search_by_vector(query_vector, top_k, query_text=question, filter=filter, mmr=mmr)
+
+    @metrics.timed("retrieve_batch")
+    async def search_context_batch(
+        self,
+        questions: list[str],
+        top_k: int = 5,
+        filter: SearchFilter | None = None,
+    ) -> list[RAGSearchResult]:
+        """Search for context for many questions with batched embedding and one store pass."""
+        query_vectors = await self.embedding_service.aembed_texts(questions)
+        search_many = getattr(self.vector_store, "search_many", None)
+        if search_many is None:
+            return list(await asyncio.gather(*(
+                self.search_by_vector(v, top_k, query_text=q, filter=filter)
+                for v, q in zip(query_vectors, questions)
+            )))
+        if inspect.iscoroutinefunction(search_many):
+            found = await search_many(query_vectors, top_k, query_texts=questions, filter=filter)
+        else:
+            found = await asyncio.to_thread(
+                search_many, query_vectors, top_k, query_texts=questions, filter=filter
+            )
+        return [RAGService.search_result(f) for f in found]
+
+    @metrics.timed("retrieve")
+    async def search_by_vector(
+        self,
+        query_vector: list[float],
+        top_k: int = 5,
+        query_text: str | None = None,
+        filter: SearchFilter | None = None,
+        mmr: bool | None = None,
+    ) -> RAGSearchResult:
+        """Search for relevant context given an embedded question (MMR re-ranked with ``mmr``)."""
+        diverse = settings.mmr_enabled if mmr is None else mmr
+        kwargs = {"query_text": query_text, "filter": filter}
+        if diverse:
+            kwargs["with_vectors"] = True
+        limit = top_k * settings.mmr_candidate_factor if diverse else top_k
+        if inspect.iscoroutinefunction(self.vector_store.search):
+            found = await self.vector_store.search(query_vector, limit, **kwargs)
+        else:
+            found = await asyncio.to_thread(self.vector_store.search, query_vector, limit, **kwargs)
+        if diverse:
+            found = RAGService.diversify(found, top_k)
+        return RAGService.search_result(found)
+
+    async def _lookup(
+        self,
+        question: str,
+        top_k: int,
+        filter: SearchFilter | None,
+    ) -> tuple[list[float], str, RAGQueryResult | None]:
+        """Embed the question and check the answer cache."""
+        query_vector = (await self.embedding_service.aembed_texts([question]))[0]
+        scope = corpus_scope(self.manifest.sources(), top_k=top_k, filter=filter or None)
+        cached = self.answer_cache.lookup(query_vector, scope) if self.answer_cache is not None else None
+        return query_vector, scope, RAGQueryResult(**cached) if cached is not None else None
+
+    @metrics.timed("query")
+    async def query(self, question: str, top_k: int = 5, filter: SearchFilter | None = None) -> RAGQueryResult:
+        """Retrieve context and generate an answer, consulting the answer cache first."""
+        query_vector, scope, cached = await self._lookup(question, top_k, filter)
+        if cached is not None:
+            return cached
+
+        found = await self.search_by_vector(query_vector, top_k, query_text=question, filter=filter)
+        user_content = RAGService.build_prompt(question, found.contexts)
+        answer = await self.generator.agenerate(user_content)
+        result = RAGQueryResult(
+            answer=answer,
+            sources=found.sources,
+            num_contexts=len(found.contexts)
+        )
+        if self.answer_cache is not None:
+            self.answer_cache.store(query_vector, scope, result.model_dump())
+        return result
+
+    async def stream_query(
+        self,
+        question: str,
+        top_k: int = 5,
+        filter: SearchFilter | None = None,
+    ) -> AsyncIterator[tuple[str, dict]]:
+        """Yield ``("context", ...)``, then ``("token", {"text"})`` per chunk, then ``("done", result)``.
+
+        A cached answer arrives as a single token event.
+        """
+        query_vector, scope, cached = await self._lookup(question, top_k, filter)
+        if cached is not None:
+            yield "context", {"sources": cached.sources, "num_contexts": cached.num_contexts}
+            yield "token", {"text": cached.answer}
+            yield "done", cached.model_dump()
+            return
+
+        found = await self.search_by_vector(query_vector, top_k, query_text=question, filter=filter)
+        yield "context", {"sources": found.sources, "num_contexts": len(found.contexts)}
+        user_content = RAGService.build_prompt(question, found.contexts)
+        parts = []
+        async for text in self.generator.astream(user_content):
+            parts.append(text)
+            yield "token", {"text": text}
+        result = RAGQueryResult(
+            answer="".join(parts).strip(),
+            sources=found.sources,
+            num_contexts=len(found.contexts)
+        )
+        if self.answer_cache is not None:
+            self.answer_cache.store(query_vector, scope, result.model_dump())
+        yield "done", result.model_dump()
+
+    async def aclose(self):
+        """Close every pooled client."""
+        await self.embedding_service.aclose()
+        if hasattr(self.vector_store, "aclose"):
+            await self.vector_store.aclose()
+        await self.generator.aclose()
@@ -0,0 +1,63 @@
+"""Command-line interface for RAGify."""
+import argparse
+import sys
+
+from .ingest_pipeline import IngestProgress
+
+
+def _print_progress(progress: IngestProgress):
+    """Render bulk-ingest progress on a single terminal line."""
+    total = progress.documents_total or 0
+    line = (
+        f"\rdocs {progress.documents_done}/{total} "
+        f"(failed {progress.documents_failed}) · chunks {progress.chunks_stored} "
+        f"· {progress.elapsed:.1f}s"
+    )
+    print(line, end="\n" if progress.done else "", file=sys.stderr, flush=True)
+
+
+def _ingest(args: argparse.Namespace) -> int:
+    from .rag_service import RAGService
+
+    vector_store = None
+    if args.store_dir:
+        from .memory_vector_store import InMemoryVectorStore
+        vector_store = InMemoryVectorStore(persist_dir=args.store_dir)
+
+    service = RAGService(vector_store=vector_store)
+    result = service.ingest_directory(
+        args.path,
+        workers=args.workers,
+        on_progress=None if args.quiet else _print_progress,
+    )
+
+    print(
+        f"Ingested {result.documents} documents ({result.chunks} chunks) in {result.seconds:.1f}s: "
+        f"{result.docs_per_sec:.2f} docs/sec, {result.chunks_per_sec:.1f} chunks/sec"
+    )
+    for failure in result.failed:
+        print(f"FAILED {failure.path}: {failure.error}", file=sys.stderr)
+    return 1 if result.failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="ragify", description="RAGify command-line tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="bulk-ingest a directory or glob of PDFs")
+    ingest.add_argument("path", help="directory (searched recursively) or glob pattern, e.g. 'docs/**/*.pdf'")
+    ingest.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    ingest.add_argument(
+        "--store-dir",
+        default=None,
+        help="write to a persistent in-memory store in this directory instead of Qdrant",
+    )
+    ingest.add_argument("--quiet", action="store_true", help="do not print progress")
+    ingest.set_defaults(handler=_ingest)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 """Configuration management for RAGify."""
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 from pydantic import Field
@@ -20,18 +21,16 @@ def _load_local_env() -> None:
 
 _load_local_env()
 
-# Try to load Streamlit secrets (cloud deployment)
-try:
-    import streamlit as st
-    if hasattr(st, "secrets"):
-        try:
-            for key, value in st.secrets.items():
-                os.environ[key] = str(value)
-        except Exception:
-            # st.secrets raises when no secrets.toml is configured; safe to ignore locally
-            pass
-except ImportError:
-    st = None  # Streamlit not installed or not running
+# Load Streamlit secrets (cloud deployment) only inside the Streamlit app, which
+# imports streamlit before ragify; API workers never pay for importing it
+st = sys.modules.get("streamlit")
+if st is not None and hasattr(st, "secrets"):
+    try:
+        for key, value in st.secrets.items():
+            os.environ[key] = str(value)
+    except Exception:
+        # st.secrets raises when no secrets.toml is configured; safe to ignore locally
+        pass
 
 
 class Settings(BaseSettings):
@@ -40,20 +39,104 @@ class Settings(BaseSettings):
     # API Keys
     anthropic_api_key: str | None = Field(default=None, alias="ANTHROPIC_API_KEY")
     openai_api_key: str | None = Field(default=None, alias="OPENAI_API_KEY")
+    openai_base_url: str | None = Field(default=None, alias="OPENAI_BASE_URL")
+    # Connection pool size for the shared async HTTP clients
+    http_max_connections: int = Field(default=100, alias="HTTP_MAX_CONNECTIONS")
     
     # Model Configuration
     anthropic_model: str = Field(default="claude-3-5-sonnet-latest", alias="ANTHROPIC_MODEL")
     openai_model: str = Field(default="gpt-4o-mini", alias="OPENAI_MODEL")
     embedding_model: str = Field(default="text-embedding-3-large", alias="EMBEDDING_MODEL")
+    # "openai", or a local CPU backend: "hashing" (no model files) or "sentence-transformers"
+    embedding_backend: str = Field(default="openai", alias="EMBEDDING_BACKEND")
+    # Local model path or name for the sentence-transformers backend (optionally run via ONNX Runtime)
+    local_embedding_model: str | None = Field(default=None, alias="LOCAL_EMBEDDING_MODEL")
+    local_embedding_onnx: bool = Field(default=False, alias="LOCAL_EMBEDDING_ONNX")
+    local_embedding_threads: int = Field(default=4, alias="LOCAL_EMBEDDING_THREADS")
+    # Stored vector size; text-embedding-3 models are asked for shorter vectors when below native
     embedding_dim: int = Field(default=3072, alias="EMBEDDING_DIM")
+    # SQLite file for cached embeddings (unset = no cache)
+    embedding_cache_path: str | None = Field(default=None, alias="EMBEDDING_CACHE_PATH")
+    embedding_cache_max_entries: int = Field(default=100_000, alias="EMBEDDING_CACHE_MAX_ENTRIES")
+    # Request batching (the API caps inputs at 2048 items / 300k tokens per request)
+    embedding_batch_size: int = Field(default=512, alias="EMBEDDING_BATCH_SIZE")
+    embedding_batch_tokens: int = Field(default=100_000, alias="EMBEDDING_BATCH_TOKENS")
+    embedding_max_concurrency: int = Field(default=4, alias="EMBEDDING_MAX_CONCURRENCY")
+    embedding_max_retries: int = Field(default=5, alias="EMBEDDING_MAX_RETRIES")
+    
+    # LLM Generation (the read timeout bounds the wait for each streamed chunk, including the first)
+    llm_connect_timeout: float = Field(default=3.0, alias="LLM_CONNECT_TIMEOUT")
+    llm_read_timeout: float = Field(default=10.0, alias="LLM_READ_TIMEOUT")
+    llm_max_retries: int = Field(default=2, alias="LLM_MAX_RETRIES")
     
     # Chunking Configuration
     chunk_size: int = Field(default=1000, alias="CHUNK_SIZE")
     chunk_overlap: int = Field(default=200, alias="CHUNK_OVERLAP")
     
+    # Ingest Pipeline Configuration (chunks per embedding batch, batches buffered per stage)
+    ingest_batch_size: int = Field(default=128, alias="INGEST_BATCH_SIZE")
+    ingest_queue_size: int = Field(default=4, alias="INGEST_QUEUE_SIZE")
+    # JSON file of document/chunk fingerprints (unset = kept in memory only)
+    manifest_path: str | None = Field(default=None, alias="MANIFEST_PATH")
+    
     # Vector Database Configuration
     qdrant_url: str = Field(default="http://localhost:6333", alias="QDRANT_URL")
     qdrant_collection: str = Field(default="docs", alias="QDRANT_COLLECTION")
+    qdrant_timeout: int = Field(default=30, alias="QDRANT_TIMEOUT")
+    # gRPC transport (port 6334) instead of REST for lower per-request overhead
+    qdrant_prefer_grpc: bool = Field(default=False, alias="QDRANT_PREFER_GRPC")
+    qdrant_grpc_port: int = Field(default=6334, alias="QDRANT_GRPC_PORT")
+    # Points per upsert request and upsert requests in flight
+    qdrant_upsert_batch_size: int = Field(default=256, alias="QDRANT_UPSERT_BATCH_SIZE")
+    qdrant_upsert_parallel: int = Field(default=4, alias="QDRANT_UPSERT_PARALLEL")
+    
+    # In-Memory Index Configuration ("flat" = exact search, "ivf" = approximate)
+    vector_index: str = Field(default="flat", alias="VECTOR_INDEX")
+    ivf_nlist: int | None = Field(default=None, alias="IVF_NLIST")
+    ivf_nprobe: int = Field(default=16, alias="IVF_NPROBE")
+    ivf_min_train_size: int = Field(default=10000, alias="IVF_MIN_TRAIN_SIZE")
+    # Quantized search codes ("none", "int8", "binary"); candidates rescored in float32 = top_k * factor
+    vector_quantization: str = Field(default="none", alias="VECTOR_QUANTIZATION")
+    rescore_factor: int = Field(default=4, alias="RESCORE_FACTOR")
+    # Two-stage search: coarse pass on this many leading (renormalized) dims, rerank on the full vector
+    search_prefix_dim: int | None = Field(default=None, alias="SEARCH_PREFIX_DIM")
+    # Exact scans split into shards of this many rows, scored in parallel on SEARCH_THREADS threads (1 = one scan)
+    search_shard_size: int = Field(default=65536, alias="SEARCH_SHARD_SIZE")
+    search_threads: int = Field(default=1, alias="SEARCH_THREADS")
+    # Directory for memory-mapped vector snapshots (unset = vectors are not persisted)
+    vector_store_dir: str | None = Field(default=None, alias="VECTOR_STORE_DIR")
+    # Per-tenant stores: RAM budget shared by all of them; least recently used stores beyond it are
+    # closed. Each tenant's store persists in STORE_DIR (default VECTOR_STORE_DIR/sessions); with
+    # neither set closed stores are dropped. Tenants unused for STORE_TTL_HOURS are deleted (0 = never)
+    store_memory_budget_mb: int = Field(default=1024, alias="STORE_MEMORY_BUDGET_MB")
+    store_dir: str | None = Field(default=None, alias="STORE_DIR")
+    store_ttl_hours: float = Field(default=24 * 30, alias="STORE_TTL_HOURS")
+    
+    # Retrieval ("vector" = dense only, "hybrid" = dense + BM25 fused with reciprocal-rank fusion)
+    search_mode: str = Field(default="vector", alias="SEARCH_MODE")
+    # Hits taken from each ranking before fusion
+    hybrid_candidates: int = Field(default=50, alias="HYBRID_CANDIDATES")
+    rrf_k: int = Field(default=60, alias="RRF_K")
+    
+    # Context Packing (overlapping chunks of a source are merged; budget 0 = unlimited)
+    context_packing: bool = Field(default=True, alias="CONTEXT_PACKING")
+    context_max_tokens: int = Field(default=3000, alias="CONTEXT_MAX_TOKENS")
+    
+    # Diversity re-ranking (MMR): fetch top_k * factor candidates, then pick top_k trading relevance
+    # (lambda 1.0) against similarity to the chunks already picked (lambda 0.0)
+    mmr_enabled: bool = Field(default=False, alias="MMR_ENABLED")
+    mmr_lambda: float = Field(default=0.5, alias="MMR_LAMBDA")
+    mmr_candidate_factor: int = Field(default=4, alias="MMR_CANDIDATE_FACTOR")
+    
+    # Semantic Answer Cache (a hit needs cosine similarity >= threshold within the same corpus state)
+    answer_cache_enabled: bool = Field(default=False, alias="ANSWER_CACHE_ENABLED")
+    answer_cache_threshold: float = Field(default=0.95, alias="ANSWER_CACHE_THRESHOLD")
+    answer_cache_ttl_seconds: float = Field(default=3600, alias="ANSWER_CACHE_TTL_SECONDS")
+    answer_cache_max_entries: int = Field(default=1024, alias="ANSWER_CACHE_MAX_ENTRIES")
+    
+    # Observability (per-stage metrics on /metrics; spans need opentelemetry installed)
+    metrics_enabled: bool = Field(default=True, alias="METRICS_ENABLED")
+    tracing_enabled: bool = Field(default=False, alias="TRACING_ENABLED")
     
     # Inngest Configuration
     inngest_app_id: str = Field(default="rag_app", alias="INNGEST_APP_ID")
@@ -0,0 +1,98 @@
+"""Token-budgeted packing of retrieved chunks into prompt contexts."""
+from .tokens import count_tokens
+
+# Shortest shared text treated as chunk overlap rather than coincidence
+_MIN_OVERLAP = 16
+
+
+def overlap_length(first: str, second: str) -> int:
+    """Length of the longest suffix of ``first`` that is also a prefix of ``second``."""
+    if len(first) < _MIN_OVERLAP or len(second) < _MIN_OVERLAP:
+        return 0
+    anchor = second[:_MIN_OVERLAP]
+    start = max(0, len(first) - len(second))
+    # Earliest anchor occurrence whose tail matches gives the longest overlap
+    while (pos := first.find(anchor, start)) != -1:
+        if second.startswith(first[pos:]):
+            return len(first) - pos
+        start = pos + 1
+    return 0
+
+
+def _merge(first: str, second: str) -> str:
+    """Join consecutive chunks, dropping the text they share."""
+    if second in first:
+        return first
+    overlap = overlap_length(first, second)
+    return first + second[overlap:] if overlap else f"{first} {second}"
+
+
+def _position(chunk: dict) -> tuple[str, int] | None:
+    index = chunk.get("chunk_index")
+    return (chunk.get("source", ""), index) if isinstance(index, int) else None
+
+
+def pack_contexts(chunks: list[dict], max_tokens: int | None = None) -> list[str]:
+    """Pack ranked chunk payloads (best first) into de-duplicated passages (see ``pack_chunks``)."""
+    return pack_chunks(chunks, max_tokens)[0]
+
+
+def pack_chunks(chunks: list[dict], max_tokens: int | None = None) -> tuple[list[str], list[str]]:
+    """Pack ranked chunk payloads (best first) into de-duplicated passages.
+
+    Chunks are taken in rank order while their new text fits ``max_tokens``
+    (the best chunk is always kept). Chunks from the same source with
+    consecutive ``chunk_index`` values are merged into one passage with the
+    overlapping text removed, and each passage lists its chunks in document
+    order. Passages keep the rank of their best chunk; exact duplicates are
+    dropped. Payloads without a ``chunk_index`` are kept as they are.
+
+    Returns the passages and the distinct sources of the chunks they kept,
+    in rank order.
+    """
+    selected: dict[tuple[str, int] | int, str] = {}
+    sources: dict[str, None] = {}
+    seen_texts: set[str] = set()
+    used = 0
+    for rank, chunk in enumerate(chunks):
+        text = chunk.get("text", "")
+        if not text or text in seen_texts:
+            continue
+        key = _position(chunk) or rank
+        if key in selected:
+            continue
+        new_text = text
+        if isinstance(key, tuple):
+            source, index = key
+            previous = selected.get((source, index - 1))
+            if previous is not None:
+                new_text = new_text[overlap_length(previous, new_text):]
+            following = selected.get((source, index + 1))
+            if following is not None:
+                new_text = new_text[:len(new_text) - overlap_length(new_text, following)]
+        cost = count_tokens(new_text) if new_text else 0
+        if max_tokens and selected and used + cost > max_tokens:
+            continue
+        selected[key] = text
+        sources.setdefault(chunk.get("source", ""))
+        seen_texts.add(text)
+        used += cost
+
+    # Group consecutive chunks of a source into passages ranked by their best chunk
+    order = {key: rank for rank, key in enumerate(selected)}
+    passages: list[tuple[int, str]] = []
+    run_text, run_rank, run_key = None, 0, None
+    positioned = sorted(key for key in selected if isinstance(key, tuple))
+    for key in positioned:
+        if run_key is not None and key[0] == run_key[0] and key[1] == run_key[1] + 1:
+            run_text = _merge(run_text, selected[key])
+            run_rank = min(run_rank, order[key])
+        else:
+            if run_text is not None:
+                passages.append((run_rank, run_text))
+            run_text, run_rank = selected[key], order[key]
+        run_key = key
+    if run_text is not None:
+        passages.append((run_rank, run_text))
+    passages += [(order[key], text) for key, text in selected.items() if not isinstance(key, tuple)]
+    return [text for _, text in sorted(passages, key=lambda passage: passage[0])], list(sources)
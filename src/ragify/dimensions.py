@@ -0,0 +1,39 @@
+"""Embedding dimension handling: reduced-size requests, validation and Matryoshka prefixes."""
+import numpy as np
+
+# Full output size of the OpenAI embedding models
+NATIVE_DIMS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
+
+def request_dimensions(model: str, dim: int) -> int | None:
+    """``dimensions`` to send for ``model`` so it returns ``dim``-sized vectors.
+
+    None means the model's native size already matches (or the model cannot
+    shorten its output, in which case the response is validated instead).
+    """
+    if not model.startswith("text-embedding-3"):
+        return None
+    native = NATIVE_DIMS.get(model)
+    return None if native == dim else dim
+
+
+def check_dim(actual: int, expected: int, what: str = "Vector"):
+    """Raise if a vector's dimension differs from the store's."""
+    if actual != expected:
+        raise ValueError(f"{what} dimension {actual} does not match store dimension {expected}")
+
+
+def truncate(vectors: np.ndarray, dim: int) -> np.ndarray:
+    """Leading ``dim`` components of each vector, L2-renormalized.
+
+    text-embedding-3 models are trained so these prefixes remain usable
+    embeddings on their own (Matryoshka representation learning).
+    """
+    prefix = np.asarray(vectors, dtype=np.float32)[..., :dim]
+    norms = np.linalg.norm(prefix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return prefix / norms
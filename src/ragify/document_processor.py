@@ -1,43 +1,299 @@
-"""Document loading and text embedding utilities."""
-from openai import OpenAI
-from llama_index.readers.file import PDFReader
-from llama_index.core.node_parser import SentenceSplitter
+"""Document loading and text embedding utilities.
+
+``pypdf``, ``llama_index`` and ``openai`` are imported on first use, so
+importing this module (and ``RAGService``) stays cheap for workers that
+never parse PDFs or call the embeddings API.
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterator
 
 from .config import settings
+from .dimensions import check_dim, request_dimensions
+from .embedding_cache import EmbeddingCache, acached_embed, cached_embed
+from .manifest import file_sha256
+from .metrics import metrics
+from .tokens import count_tokens
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# Longest Retry-After honored; larger server hints are clamped to this
+_MAX_RETRY_AFTER = 30.0
+
+
+@lru_cache(maxsize=None)
+def _retryable_errors() -> tuple[type[Exception], ...]:
+    """Errors worth retrying with backoff; anything else fails the request."""
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
 
 
 class DocumentLoader:
     """Handles PDF loading and chunking."""
     
-    def __init__(self):
-        self.splitter = SentenceSplitter(
-            chunk_size=settings.chunk_size,
-            chunk_overlap=settings.chunk_overlap
-        )
+    def __init__(self, chunk_size: int | None = None, chunk_overlap: int | None = None):
+        self.chunk_size = chunk_size or settings.chunk_size
+        self.chunk_overlap = settings.chunk_overlap if chunk_overlap is None else chunk_overlap
+        self._splitter = None
+    
+    @property
+    def splitter(self):
+        """Sentence splitter, built on first use (importing llama_index is slow)."""
+        if self._splitter is None:
+            from llama_index.core.node_parser import SentenceSplitter
+            self._splitter = SentenceSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap
+            )
+        return self._splitter
+    
+    @staticmethod
+    def page_count(path: str) -> int:
+        """Return the number of pages in a PDF without extracting text."""
+        import pypdf
+        return len(pypdf.PdfReader(path).pages)
+    
+    def iter_chunks(self, path: str) -> Iterator[tuple[int, str]]:
+        """Yield ``(page_number, chunk)`` pairs, parsing one page at a time.
+        
+        Pages are extracted lazily so only the current page's text is held
+        in memory. Page numbers are 1-based; pages without text are skipped.
+        """
+        import pypdf
+        reader = pypdf.PdfReader(path)
+        for page_number, page in enumerate(reader.pages, start=1):
+            with metrics.stage("parse"):
+                text = page.extract_text()
+            metrics.items("parse", 1)
+            if not text:
+                continue
+            with metrics.stage("split"):
+                chunks = self.splitter.split_text(text)
+            metrics.items("split", len(chunks))
+            for chunk in chunks:
+                yield page_number, chunk
     
     def load_and_chunk_pdf(self, path: str) -> list[str]:
         """Load PDF and split into chunks."""
-        docs = PDFReader().load_data(file=path)
-        texts = [d.text for d in docs if getattr(d, "text", None)]
-        chunks = []
-        for t in texts:
-            chunks.extend(self.splitter.split_text(t))
-        return chunks
+        return [chunk for _, chunk in self.iter_chunks(path)]
+
+
+# Per-process loader used by bulk ingestion workers
+_worker_loader: DocumentLoader | None = None
+
+
+def init_chunk_worker(chunk_size: int, chunk_overlap: int):
+    """Process-pool initializer: build the worker's splitter once."""
+    global _worker_loader
+    _worker_loader = DocumentLoader(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def chunk_pdf_file(path: str, known_hash: str | None = None) -> tuple[str, list[tuple[int, str]] | None]:
+    """Parse and split a PDF inside a worker process.
+    
+    Returns ``(file_hash, chunks)``; ``chunks`` is None when the file's hash
+    equals ``known_hash`` and parsing was skipped.
+    """
+    file_hash = file_sha256(path)
+    if file_hash == known_hash:
+        return file_hash, None
+    return file_hash, list(_worker_loader.iter_chunks(path))
 
 
 class EmbeddingService:
-    """Handles text embeddings using OpenAI."""
+    """Handles text embeddings using OpenAI.
     
-    def __init__(self):
+    When an ``EmbeddingCache`` is configured only texts that miss the cache
+    are sent to the API. Inputs are split into requests bounded by item and
+    token count, which run concurrently and retry with exponential backoff
+    on rate limits and transient errors; at most ``max_concurrency`` requests
+    are in flight at once, however many threads call ``embed_texts``.
+    Output order always matches input.
+    
+    ``aembed_texts`` is the asyncio equivalent; it shares one pooled
+    ``AsyncOpenAI`` client across all concurrent callers.
+    """
+    
+    def __init__(
+        self,
+        cache: EmbeddingCache | None = None,
+        batch_size: int | None = None,
+        batch_tokens: int | None = None,
+        max_concurrency: int | None = None,
+        max_retries: int | None = None,
+    ):
         if not settings.openai_api_key:
             raise ValueError("OPENAI_API_KEY must be set for embeddings")
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        from openai import OpenAI
+        # Retries are handled here so backoff spans the whole batch schedule
+        self.client = OpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            max_retries=0,
+        )
         self.model = settings.embedding_model
+        self.dim = settings.embedding_dim
+        # text-embedding-3 models can return shorter vectors (EMBEDDING_DIM < native)
+        self.dimensions = request_dimensions(self.model, self.dim)
+        self.batch_size = batch_size or settings.embedding_batch_size
+        self.batch_tokens = batch_tokens or settings.embedding_batch_tokens
+        self.max_concurrency = max_concurrency or settings.embedding_max_concurrency
+        self.max_retries = settings.embedding_max_retries if max_retries is None else max_retries
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        # Bounds in-flight requests across every concurrent caller, batched or not
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_client: "AsyncOpenAI | None" = None
+        self._async_semaphore: asyncio.Semaphore | None = None
+        if cache is None and settings.embedding_cache_path:
+            cache = EmbeddingCache(
+                settings.embedding_cache_path,
+                max_entries=settings.embedding_cache_max_entries,
+            )
+        self.cache = cache
     
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
         """Generate embeddings for a list of texts."""
-        response = self.client.embeddings.create(
-            model=self.model,
-            input=texts,
-        )
-        return [item.embedding for item in response.data]
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._embed(texts)
+        return cached_embed(self.cache, self.model, self.dim, texts, self._embed)
+    
+    def _batches(self, texts: list[str]) -> Iterator[list[str]]:
+        """Split texts into consecutive batches within the item and token limits."""
+        batch: list[str] = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = count_tokens(text, self.model)
+            if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.batch_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+            metrics.inc("ragify_tokens_total", tokens, stage="embed", kind="input")
+        if batch:
+            yield batch
+    
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts through the API, running batches concurrently."""
+        batches = list(self._batches(texts))
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix="ragify-embed",
+                )
+        # map() yields results in submission order, preserving input order
+        return [
+            vector
+            for batch_vectors in self._executor.map(self._embed_batch, batches)
+            for vector in batch_vectors
+        ]
+    
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Call the embeddings API for one batch, retrying transient failures."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._semaphore, metrics.stage("embed"):
+                    response = self.client.embeddings.create(input=texts, **self._request_params())
+                break
+            except _retryable_errors() as e:
+                if attempt == self.max_retries:
+                    raise
+                # Backoff sleeps are not embedding time
+                time.sleep(self._backoff(attempt, e))
+        metrics.items("embed", len(texts))
+        return self._vectors(response)
+    
+    def _request_params(self) -> dict:
+        params = {"model": self.model}
+        if self.dimensions is not None:
+            params["dimensions"] = self.dimensions
+        return params
+    
+    def _vectors(self, response) -> list[list[float]]:
+        """Embeddings from a response in input order, checked against ``dim``."""
+        data = sorted(response.data, key=lambda item: item.index)
+        if data:
+            check_dim(len(data[0].embedding), self.dim, what=f"{self.model} embedding")
+        return [item.embedding for item in data]
+    
+    @staticmethod
+    def _backoff(attempt: int, error: Exception) -> float:
+        """Seconds to wait before the next attempt, honoring Retry-After up to 30 s."""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(_MAX_RETRY_AFTER, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)
+    
+    @property
+    def async_client(self) -> "AsyncOpenAI":
+        """Lazily created async client whose connection pool is reused."""
+        if self._async_client is None:
+            import httpx
+            import openai
+            
+            self._async_client = openai.AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url,
+                max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.http_max_connections,
+                        max_keepalive_connections=settings.http_max_connections,
+                    ),
+                ),
+            )
+            # Bounds in-flight requests across every concurrent caller
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._async_client
+    
+    async def aembed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Async variant of ``embed_texts``."""
+        if not texts:
+            return []
+        if self.cache is None:
+            return await self._aembed(texts)
+        return await acached_embed(self.cache, self.model, self.dim, texts, self._aembed)
+    
+    async def _aembed(self, texts: list[str]) -> list[list[float]]:
+        results = await asyncio.gather(*(self._aembed_batch(b) for b in self._batches(texts)))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+    
+    async def _aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        client = self.async_client
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._async_semaphore:
+                    with metrics.stage("embed"):
+                        response = await client.embeddings.create(input=texts, **self._request_params())
+                break
+            except _retryable_errors() as e:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+        metrics.items("embed", len(texts))
+        return self._vectors(response)
+    
+    async def aclose(self):
+        """Close the async client's connection pool."""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
@@ -0,0 +1,224 @@
+"""Embedding backends: the protocol services depend on, and local CPU implementations.
+
+``EMBEDDING_BACKEND`` selects the backend built by ``create_embedding_service``:
+
+- ``openai``: ``EmbeddingService`` (remote API, needs ``OPENAI_API_KEY``)
+- ``hashing``: ``HashingEmbeddingService``, a signed feature-hashing
+  vectorizer over words and word pairs; no model files, no network
+- ``sentence-transformers``: ``SentenceTransformerEmbeddingService``, a
+  sentence-transformers model loaded from ``LOCAL_EMBEDDING_MODEL`` (a local
+  path or model name; ``LOCAL_EMBEDDING_ONNX`` runs it through ONNX Runtime)
+
+Every backend returns ``EMBEDDING_DIM``-sized, L2-normalized vectors, so
+the vector stores do not depend on which one produced them.
+"""
+import abc
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Protocol, runtime_checkable
+
+import numpy as np
+
+from .config import settings
+from .dimensions import check_dim, truncate
+from .embedding_cache import EmbeddingCache, cached_embed
+from .lexical_index import tokenize
+from .metrics import metrics
+
+EMBEDDING_BACKENDS = ("openai", "hashing", "sentence-transformers")
+
+
+@runtime_checkable
+class EmbeddingBackend(Protocol):
+    """What ``RAGService`` and ``AsyncRAGService`` need from an embedding service."""
+
+    model: str
+    dim: int
+    cache: EmbeddingCache | None
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts, one ``dim``-sized vector per text in input order."""
+        ...
+
+    async def aembed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Async variant of ``embed_texts``."""
+        ...
+
+    async def aclose(self):
+        """Release clients or worker threads."""
+        ...
+
+
+class LocalEmbeddingService(abc.ABC):
+    """Base for in-process backends: cache lookups, batching and a thread pool.
+
+    Subclasses implement ``_encode`` for one batch. Batches run on
+    ``threads`` worker threads (numpy and model runtimes release the GIL
+    while computing); async calls run on a worker thread as well.
+    """
+
+    model = "local"
+
+    def __init__(
+        self,
+        dim: int | None = None,
+        cache: EmbeddingCache | None = None,
+        batch_size: int | None = None,
+        threads: int | None = None,
+    ):
+        self.dim = dim or settings.embedding_dim
+        self.batch_size = batch_size or settings.embedding_batch_size
+        self.threads = threads or settings.local_embedding_threads
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        if cache is None and settings.embedding_cache_path:
+            cache = EmbeddingCache(
+                settings.embedding_cache_path,
+                max_entries=settings.embedding_cache_max_entries,
+            )
+        self.cache = cache
+
+    @abc.abstractmethod
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        """Return a float32 ``(len(texts), dim)`` matrix of normalized vectors."""
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        with metrics.stage("embed", backend=self.model):
+            vectors = self._encode(texts)
+        metrics.items("embed", len(texts))
+        return vectors
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.threads <= 1:
+            matrices = [self._encode_batch(batch) for batch in batches]
+        else:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.threads,
+                        thread_name_prefix="ragify-local-embed",
+                    )
+            matrices = list(self._executor.map(self._encode_batch, batches))
+        return np.concatenate(matrices).tolist()
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Generate embeddings for a list of texts."""
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._embed(texts)
+        return cached_embed(self.cache, self.model, self.dim, texts, self._embed)
+
+    async def aembed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Async variant of ``embed_texts`` (runs on a worker thread)."""
+        return await asyncio.to_thread(self.embed_texts, texts)
+
+    async def aclose(self):
+        """Stop the batch threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+class HashingEmbeddingService(LocalEmbeddingService):
+    """Signed feature hashing of words and adjacent word pairs.
+
+    Each feature gets a 64-bit BLAKE2b hash (stable across processes): the
+    low 32 bits pick its bucket and the top bit, independent of them, its
+    sign, so colliding features cancel out on average. Bucket sums are
+    damped with ``log1p`` and the vector normalized. Texts sharing
+    vocabulary land close together, which is enough for keyword-heavy
+    corpora, tests and air-gapped deployments, but it carries no semantics:
+    re-embed everything when switching to a model backend.
+    """
+
+    model = "hashing-v2"
+
+    def _features(self, text: str) -> list[str]:
+        tokens = tokenize(text)
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        rows, hashes = [], []
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            rows.extend([row] * len(features))
+            hashes.extend(hashlib.blake2b(f.encode(), digest_size=8).digest() for f in features)
+        hashes = np.frombuffer(b"".join(hashes), dtype="<u8")
+        rows = np.asarray(rows, dtype=np.int64)
+        signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+        buckets = (hashes & np.uint64(0xFFFFFFFF)) % np.uint64(self.dim)
+        flat = rows * self.dim + buckets.astype(np.int64)
+        sums = np.bincount(flat, weights=signs, minlength=len(texts) * self.dim)
+        vectors = (np.sign(sums) * np.log1p(np.abs(sums))).astype(np.float32).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class SentenceTransformerEmbeddingService(LocalEmbeddingService):
+    """A sentence-transformers model run on the CPU.
+
+    The model is loaded on first use from ``model_path``. Models with more
+    dimensions than ``dim`` are truncated to a renormalized prefix (exact for
+    Matryoshka-trained models); models with fewer are rejected, since their
+    vectors would not fit the store.
+    """
+
+    def __init__(self, model_path: str | None = None, onnx: bool | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.model_path = model_path or settings.local_embedding_model
+        if not self.model_path:
+            raise ValueError("LOCAL_EMBEDDING_MODEL must be set for the sentence-transformers backend")
+        self.onnx = settings.local_embedding_onnx if onnx is None else onnx
+        self.model = f"st:{self.model_path}"
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def encoder(self):
+        """Lazy-load the model (once, even when batches start concurrently)."""
+        with self._load_lock:
+            return self._load()
+
+    def _load(self):
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise ImportError(
+                    "EMBEDDING_BACKEND=sentence-transformers needs the sentence-transformers package"
+                ) from e
+            kwargs = {"backend": "onnx"} if self.onnx else {}
+            model = SentenceTransformer(self.model_path, device="cpu", **kwargs)
+            native = model.get_sentence_embedding_dimension()
+            if native < self.dim:
+                check_dim(native, self.dim, what=f"{self.model_path} embedding")
+            self._model = model
+        return self._model
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        vectors = self.encoder.encode(
+            texts,
+            batch_size=min(len(texts), 64),
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return truncate(vectors, self.dim) if vectors.shape[1] > self.dim else vectors
+
+
+def create_embedding_service(backend: str | None = None) -> EmbeddingBackend:
+    """Build the embedding service selected by ``EMBEDDING_BACKEND``."""
+    backend = backend or settings.embedding_backend
+    if backend == "openai":
+        from .document_processor import EmbeddingService
+        return EmbeddingService()
+    if backend == "hashing":
+        return HashingEmbeddingService()
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbeddingService()
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {', '.join(EMBEDDING_BACKENDS)}")
@@ -0,0 +1,188 @@
+"""Persistent content-addressed cache for text embeddings."""
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import numpy as np
+
+from .metrics import metrics
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    """Content address of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache keyed by (model, dimension, sha256(text)).
+
+    Vectors are stored as float32 blobs. Each hit refreshes the entry's
+    ``last_used`` time and the least recently used entries are evicted once
+    the cache holds more than ``max_entries`` vectors.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int = 100_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dim, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, dim: int, texts: list[str]) -> list[list[float] | None]:
+        """Look up texts, returning ``None`` for every miss."""
+        hashes = [text_hash(t) for t in texts]
+        found: dict[str, list[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(hashes), _QUERY_BATCH):
+                batch = list(set(hashes[start:start + _QUERY_BATCH]))
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dim = ? AND text_hash IN ({placeholders})",
+                    [model, dim, *batch],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dim = ? AND text_hash = ?",
+                    [(now, model, dim, h) for h in found],
+                )
+                self._conn.commit()
+
+            results = [found.get(h) for h in hashes]
+            hits = sum(r is not None for r in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model: str, dim: int, texts: list[str], vectors: list[list[float]]):
+        """Store vectors for texts and evict least recently used entries."""
+        now = time.time()
+        rows = {
+            text_hash(t): np.asarray(v, dtype=np.float32).tobytes()
+            for t, v in zip(texts, vectors)
+        }
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, dim, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(model, dim, h, blob, now) for h, blob in rows.items()],
+            )
+            self._size += self._conn.total_changes - before
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE (model, dim, text_hash) IN ("
+                    "SELECT model, dim, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self._size -= overflow
+            self._conn.commit()
+
+    def stats(self) -> dict[str, float]:
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._size,
+        }
+
+    def clear(self):
+        """Remove every cached vector and reset counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def _missing(texts: list[str], vectors: list[list[float] | None]) -> list[str]:
+    """Distinct texts the cache missed, in first-seen order (recorded as cache lookups)."""
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    metrics.cache_lookups("embedding", len(texts) - len(missing), len(missing))
+    return missing
+
+
+def _merge(
+    texts: list[str],
+    vectors: list[list[float] | None],
+    missing: list[str],
+    embedded: list[list[float]],
+) -> list[list[float]]:
+    """Fill the misses in ``vectors`` with the freshly embedded ``missing`` texts."""
+    by_text = dict(zip(missing, embedded))
+    return [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+
+
+def cached_embed(
+    cache: EmbeddingCache,
+    model: str,
+    dim: int,
+    texts: list[str],
+    embed: Callable[[list[str]], list[list[float]]],
+) -> list[list[float]]:
+    """Embed ``texts`` through ``cache``: ``embed`` sees each distinct miss once.
+
+    New vectors are written back to the cache; output order matches ``texts``.
+    """
+    vectors = cache.get_many(model, dim, texts)
+    missing = _missing(texts, vectors)
+    if not missing:
+        return vectors
+    embedded = embed(missing)
+    cache.put_many(model, dim, missing, embedded)
+    return _merge(texts, vectors, missing, embedded)
+
+
+async def acached_embed(
+    cache: EmbeddingCache,
+    model: str,
+    dim: int,
+    texts: list[str],
+    embed: Callable[[list[str]], Awaitable[list[list[float]]]],
+) -> list[list[float]]:
+    """Async variant of ``cached_embed``; SQLite calls run on a worker thread."""
+    vectors = await asyncio.to_thread(cache.get_many, model, dim, texts)
+    missing = _missing(texts, vectors)
+    if not missing:
+        return vectors
+    embedded = await embed(missing)
+    await asyncio.to_thread(cache.put_many, model, dim, missing, embedded)
+    return _merge(texts, vectors, missing, embedded)
@@ -0,0 +1,79 @@
+"""Metadata filters for chunk search.
+
+A filter maps payload fields to conditions, all of which must hold:
+
+    {"source": "manual.pdf"}                      # equals
+    {"source": ["a.pdf", "b.pdf"]}                # any of
+    {"page": {"gte": 3, "lte": 5}}                # range (gt, gte, lt, lte)
+    {"ingested_at": {"gt": 1735689600}}           # Unix seconds
+
+``source`` supports equality and any-of; the numeric fields also support
+ranges.
+"""
+from typing import Any
+
+NUMERIC_FIELDS = ("page", "chunk_index", "ingested_at")
+FILTER_FIELDS = ("source", *NUMERIC_FIELDS)
+RANGE_OPS = ("gt", "gte", "lt", "lte")
+
+SearchFilter = dict[str, Any]
+
+
+def _check_value(field: str, value: Any):
+    if field in NUMERIC_FIELDS:
+        # bool is an int subclass but never a page number or timestamp
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Filter on {field!r} needs numbers, got {value!r}")
+    elif not isinstance(value, str):
+        raise ValueError(f"Filter on {field!r} needs strings, got {value!r}")
+
+
+def validate_filter(filter: SearchFilter | None) -> SearchFilter | None:
+    """Check a filter's fields, conditions and value types, returning it unchanged (None if empty)."""
+    if not filter:
+        return None
+    for field, condition in filter.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unknown filter field {field!r}; expected one of {', '.join(FILTER_FIELDS)}")
+        if isinstance(condition, dict):
+            if field not in NUMERIC_FIELDS:
+                raise ValueError(f"Range filters are only supported on {', '.join(NUMERIC_FIELDS)}")
+            unknown = set(condition) - set(RANGE_OPS)
+            if unknown or not condition:
+                raise ValueError(f"Range filter on {field!r} must use {', '.join(RANGE_OPS)}")
+            values = list(condition.values())
+        elif isinstance(condition, list):
+            if not condition:
+                raise ValueError(f"Filter on {field!r} needs at least one value")
+            values = condition
+        else:
+            values = [condition]
+        for value in values:
+            _check_value(field, value)
+    return filter
+
+
+def _range_matches(value, condition: dict) -> bool:
+    return (
+        ("gt" not in condition or value > condition["gt"])
+        and ("gte" not in condition or value >= condition["gte"])
+        and ("lt" not in condition or value < condition["lt"])
+        and ("lte" not in condition or value <= condition["lte"])
+    )
+
+
+def payload_matches(payload: dict, filter: SearchFilter | None) -> bool:
+    """Whether a chunk payload satisfies every condition of ``filter``."""
+    for field, condition in (filter or {}).items():
+        value = payload.get(field)
+        if value is None:
+            return False
+        if isinstance(condition, dict):
+            if not _range_matches(value, condition):
+                return False
+        elif isinstance(condition, list):
+            if value not in condition:
+                return False
+        elif value != condition:
+            return False
+    return True
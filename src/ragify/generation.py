@@ -0,0 +1,259 @@
+"""Streaming answer generation over pooled Claude and OpenAI clients."""
+import logging
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterator
+
+from .config import settings
+from .metrics import metrics
+from .tokens import count_tokens
+
+if TYPE_CHECKING:
+    import anthropic
+    import httpx
+    import openai
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You answer questions using only the provided context."
+
+
+class AnswerGenerator:
+    """Long-lived LLM layer shared by the Streamlit UI and the API.
+
+    Sync and async clients are created once and keep their connection pools.
+    Claude is used when configured, with OpenAI as the fallback. Reads time
+    out after ``settings.llm_read_timeout`` (with streaming this bounds the
+    wait for the first token) and the primary provider is not retried, so a
+    failing provider hands over within seconds. Once a provider has produced
+    text its errors are raised instead of switching mid-answer.
+    """
+
+    def __init__(self, max_tokens: int = 1024, temperature: float = 0.2):
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        # SDKs are imported with the first client: they dominate import time
+        self._anthropic: "anthropic.Anthropic | None" = None
+        self._openai: "openai.OpenAI | None" = None
+        self._async_anthropic: "anthropic.AsyncAnthropic | None" = None
+        self._async_openai: "openai.AsyncOpenAI | None" = None
+
+    @staticmethod
+    def _timeout() -> "httpx.Timeout":
+        import httpx
+        return httpx.Timeout(settings.llm_read_timeout, connect=settings.llm_connect_timeout)
+
+    @staticmethod
+    def _limits() -> "httpx.Limits":
+        import httpx
+        return httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_connections,
+        )
+
+    @staticmethod
+    def _max_retries(provider: str) -> int:
+        # The fallback provider stands in for retries of the primary one
+        if provider == "anthropic" and settings.openai_api_key:
+            return 0
+        return settings.llm_max_retries
+
+    @staticmethod
+    def providers() -> list[str]:
+        """Configured providers in the order they are tried."""
+        providers = []
+        if settings.anthropic_api_key:
+            providers.append("anthropic")
+        if settings.openai_api_key:
+            providers.append("openai")
+        if not providers:
+            raise ValueError("Either ANTHROPIC_API_KEY or OPENAI_API_KEY must be set")
+        return providers
+
+    @property
+    def anthropic_client(self) -> "anthropic.Anthropic":
+        if self._anthropic is None:
+            import anthropic
+            self._anthropic = anthropic.Anthropic(
+                api_key=settings.anthropic_api_key,
+                timeout=self._timeout(),
+                max_retries=self._max_retries("anthropic"),
+                http_client=anthropic.DefaultHttpxClient(limits=self._limits()),
+            )
+        return self._anthropic
+
+    @property
+    def openai_client(self) -> "openai.OpenAI":
+        if self._openai is None:
+            import openai
+            self._openai = openai.OpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url,
+                timeout=self._timeout(),
+                max_retries=self._max_retries("openai"),
+                http_client=openai.DefaultHttpxClient(limits=self._limits()),
+            )
+        return self._openai
+
+    @property
+    def async_anthropic_client(self) -> "anthropic.AsyncAnthropic":
+        if self._async_anthropic is None:
+            import anthropic
+            self._async_anthropic = anthropic.AsyncAnthropic(
+                api_key=settings.anthropic_api_key,
+                timeout=self._timeout(),
+                max_retries=self._max_retries("anthropic"),
+                http_client=anthropic.DefaultAsyncHttpxClient(limits=self._limits()),
+            )
+        return self._async_anthropic
+
+    @property
+    def async_openai_client(self) -> "openai.AsyncOpenAI":
+        if self._async_openai is None:
+            import openai
+            self._async_openai = openai.AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url,
+                timeout=self._timeout(),
+                max_retries=self._max_retries("openai"),
+                http_client=openai.DefaultAsyncHttpxClient(limits=self._limits()),
+            )
+        return self._async_openai
+
+    def _openai_messages(self, user_content: str) -> list[dict]:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_content}
+        ]
+
+    def _stream_anthropic(self, user_content: str) -> Iterator[str]:
+        with self.anthropic_client.messages.stream(
+            model=settings.anthropic_model,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            system=SYSTEM_PROMPT,
+            messages=[{"role": "user", "content": user_content}],
+        ) as stream:
+            yield from stream.text_stream
+
+    def _stream_openai(self, user_content: str) -> Iterator[str]:
+        with self.openai_client.chat.completions.create(
+            model=settings.openai_model,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            messages=self._openai_messages(user_content),
+            stream=True,
+        ) as stream:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def _astream_anthropic(self, user_content: str) -> AsyncIterator[str]:
+        async with self.async_anthropic_client.messages.stream(
+            model=settings.anthropic_model,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            system=SYSTEM_PROMPT,
+            messages=[{"role": "user", "content": user_content}],
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+    async def _astream_openai(self, user_content: str) -> AsyncIterator[str]:
+        stream = await self.async_openai_client.chat.completions.create(
+            model=settings.openai_model,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            messages=self._openai_messages(user_content),
+            stream=True,
+        )
+        async with stream:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    @staticmethod
+    def _record(provider: str, user_content: str, parts: list[str]):
+        """Count prompt and completion tokens of a finished answer."""
+        if metrics.enabled:
+            metrics.inc("ragify_tokens_total", count_tokens(SYSTEM_PROMPT + user_content), stage="llm", kind="input")
+            metrics.inc("ragify_tokens_total", count_tokens("".join(parts)), stage="llm", kind="output")
+            metrics.items("llm", 1, provider=provider)
+
+    def stream(self, user_content: str) -> Iterator[str]:
+        """Yield answer text as it is generated, falling back before the first token."""
+        streams: dict[str, Callable[[str], Iterator[str]]] = {
+            "anthropic": self._stream_anthropic,
+            "openai": self._stream_openai,
+        }
+        providers = self.providers()
+        for i, provider in enumerate(providers):
+            emitted = False
+            started = time.perf_counter()
+            parts: list[str] = []
+            try:
+                with metrics.stage("llm", provider=provider):
+                    for text in streams[provider](user_content):
+                        if not emitted:
+                            metrics.observe(
+                                "ragify_llm_first_token_seconds", time.perf_counter() - started, provider=provider
+                            )
+                        emitted = True
+                        parts.append(text)
+                        yield text
+                self._record(provider, user_content, parts)
+                return
+            except Exception:
+                if emitted or i == len(providers) - 1:
+                    raise
+                logger.warning("%s generation failed, falling back to %s", provider, providers[i + 1], exc_info=True)
+
+    async def astream(self, user_content: str) -> AsyncIterator[str]:
+        """Async variant of ``stream``."""
+        streams: dict[str, Callable[[str], AsyncIterator[str]]] = {
+            "anthropic": self._astream_anthropic,
+            "openai": self._astream_openai,
+        }
+        providers = self.providers()
+        for i, provider in enumerate(providers):
+            emitted = False
+            started = time.perf_counter()
+            parts: list[str] = []
+            try:
+                with metrics.stage("llm", provider=provider):
+                    async for text in streams[provider](user_content):
+                        if not emitted:
+                            metrics.observe(
+                                "ragify_llm_first_token_seconds", time.perf_counter() - started, provider=provider
+                            )
+                        emitted = True
+                        parts.append(text)
+                        yield text
+                self._record(provider, user_content, parts)
+                return
+            except Exception:
+                if emitted or i == len(providers) - 1:
+                    raise
+                logger.warning("%s generation failed, falling back to %s", provider, providers[i + 1], exc_info=True)
+
+    def generate(self, user_content: str) -> str:
+        """Generate a complete answer."""
+        return "".join(self.stream(user_content)).strip()
+
+    async def agenerate(self, user_content: str) -> str:
+        """Generate a complete answer without blocking the event loop."""
+        return "".join([text async for text in self.astream(user_content)]).strip()
+
+    def close(self):
+        """Close the sync clients."""
+        for client in (self._anthropic, self._openai):
+            if client is not None:
+                client.close()
+        self._anthropic = self._openai = None
+
+    async def aclose(self):
+        """Close every pooled client."""
+        self.close()
+        for client in (self._async_anthropic, self._async_openai):
+            if client is not None:
+                await client.close()
+        self._async_anthropic = self._async_openai = None
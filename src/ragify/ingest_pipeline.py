@@ -0,0 +1,237 @@
+"""Streaming ingest pipeline with overlapped parse, embed and store stages."""
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from .config import settings
+
+# Marks the end of a stage's output on a queue
+_DONE = object()
+
+
+@dataclass
+class ChunkRecord:
+    """A chunk ready for embedding, with its vector-store id and payload."""
+    id: str
+    text: str
+    payload: dict
+
+
+@dataclass
+class IngestProgress:
+    """Counters reported while a document streams through the pipeline."""
+    source_id: str
+    pages_total: int | None = None
+    pages_done: int = 0
+    documents_total: int | None = None
+    documents_done: int = 0
+    documents_failed: int = 0
+    chunks_parsed: int = 0
+    chunks_embedded: int = 0
+    chunks_stored: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    done: bool = False
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+
+ProgressCallback = Callable[[IngestProgress], None]
+BatchCallback = Callable[[list[ChunkRecord]], None]
+BatchErrorCallback = Callable[[list[ChunkRecord], Exception], None]
+
+
+class IngestPipeline:
+    """Runs chunk records through embedding and vector-store upserts.
+
+    The parse stage (iterating ``records``) runs on its own thread, embedding
+    runs on ``embed_workers`` threads, and upserts run on the calling thread.
+    Stages are connected by queues holding at most ``queue_size`` batches, so
+    memory stays bounded no matter how large the document is. If any stage
+    fails the others stop and the first error is re-raised to the caller;
+    with ``on_error`` a batch that fails to embed or store is handed to it
+    instead and the run carries on with the next batch. With ``group_key``
+    a failed batch mixing several groups (e.g. source documents) is first
+    retried one group at a time, in the stage that failed, so only the
+    failing group reaches ``on_error``.
+
+    With ``wait=False`` upserts return before the store has applied them
+    (bulk loads); the caller flushes the store once the run is over.
+    """
+
+    def __init__(
+        self,
+        embedding_service,
+        vector_store,
+        batch_size: int | None = None,
+        queue_size: int | None = None,
+        embed_workers: int | None = None,
+        wait: bool = True,
+    ):
+        self.embedding_service = embedding_service
+        self.vector_store = vector_store
+        self.batch_size = batch_size or settings.ingest_batch_size
+        self.queue_size = queue_size or settings.ingest_queue_size
+        self.embed_workers = embed_workers or settings.embedding_max_concurrency
+        self.wait = wait
+
+    def run(
+        self,
+        records: Iterable[ChunkRecord],
+        progress: IngestProgress,
+        on_progress: ProgressCallback | None = None,
+        on_stored: BatchCallback | None = None,
+        on_error: BatchErrorCallback | None = None,
+        group_key: Callable[[ChunkRecord], str] | None = None,
+    ) -> int:
+        """Embed and store every record, returning the number stored.
+
+        ``on_stored`` is called with each batch once it is upserted; like
+        ``on_progress`` it runs on the calling thread. A ``records``
+        generator is closed on the parse thread once the run stops.
+        """
+        parsed: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        embedded: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors: list[BaseException] = []
+
+        def fail(error: BaseException):
+            errors.append(error)
+            stop.set()
+
+        def batch_failed(batch: list[ChunkRecord], error: Exception):
+            if on_error is None:
+                fail(error)
+                return
+            try:
+                on_error(batch, error)
+            except BaseException as e:
+                fail(e)
+
+        def groups(batch: list[ChunkRecord]) -> list[list[int]]:
+            """Positions of ``batch``'s records, grouped by ``group_key``."""
+            if group_key is None:
+                return [list(range(len(batch)))]
+            grouped: dict[str, list[int]] = {}
+            for i, record in enumerate(batch):
+                grouped.setdefault(group_key(record), []).append(i)
+            return list(grouped.values())
+
+        def embed(batch: list[ChunkRecord]):
+            try:
+                vectors = self.embedding_service.embed_texts([r.text for r in batch])
+            except Exception as e:
+                rows = groups(batch)
+                if len(rows) == 1:
+                    batch_failed(batch, e)
+                    return
+                for positions in rows:
+                    embed([batch[i] for i in positions])
+                return
+            embedded.put((batch, vectors))
+
+        def store(batch: list[ChunkRecord], vectors: list[list[float]]):
+            try:
+                self.vector_store.upsert(
+                    [r.id for r in batch],
+                    vectors,
+                    [r.payload for r in batch],
+                    wait=self.wait,
+                )
+            except Exception as e:
+                rows = groups(batch)
+                if len(rows) == 1:
+                    batch_failed(batch, e)
+                    return
+                for positions in rows:
+                    store([batch[i] for i in positions], [vectors[i] for i in positions])
+                return
+            progress.chunks_stored += len(batch)
+            if on_stored:
+                on_stored(batch)
+            if on_progress:
+                on_progress(progress)
+
+        def parse_stage():
+            iterator = iter(records)
+            try:
+                batch: list[ChunkRecord] = []
+                for record in iterator:
+                    if stop.is_set():
+                        return
+                    batch.append(record)
+                    progress.chunks_parsed += 1
+                    if len(batch) >= self.batch_size:
+                        parsed.put(batch)
+                        batch = []
+                if batch:
+                    parsed.put(batch)
+            except BaseException as e:
+                fail(e)
+            finally:
+                # Release the source's resources (e.g. a process pool) now, not when collected
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    try:
+                        close()
+                    except BaseException as e:
+                        fail(e)
+                for _ in range(self.embed_workers):
+                    parsed.put(_DONE)
+
+        def embed_stage():
+            try:
+                while (batch := parsed.get()) is not _DONE:
+                    # After a failure keep draining so upstream never blocks
+                    if stop.is_set():
+                        continue
+                    try:
+                        embed(batch)
+                    except BaseException as e:
+                        fail(e)
+            finally:
+                embedded.put(_DONE)
+
+        threads = [threading.Thread(target=parse_stage, name="ragify-ingest-parse", daemon=True)]
+        threads += [
+            threading.Thread(target=embed_stage, name=f"ragify-ingest-embed-{i}", daemon=True)
+            for i in range(self.embed_workers)
+        ]
+        for t in threads:
+            t.start()
+
+        # Store stage runs here so callbacks fire on the caller's thread
+        remaining = self.embed_workers
+        try:
+            while remaining:
+                item = embedded.get()
+                if item is _DONE:
+                    remaining -= 1
+                    continue
+                if stop.is_set():
+                    continue
+                batch, vectors = item
+                progress.chunks_embedded += len(batch)
+                store(batch, vectors)
+        except BaseException as e:
+            # e.g. the callback raised, or Streamlit stopped the script
+            fail(e)
+        finally:
+            # Drain ``embedded`` so embed workers never block on a full queue;
+            # they in turn drain ``parsed`` and the parse stage sees ``stop``
+            while remaining:
+                if embedded.get() is _DONE:
+                    remaining -= 1
+            for t in threads:
+                t.join()
+
+        if errors:
+            raise errors[0]
+
+        progress.done = True
+        if on_progress:
+            on_progress(progress)
+        return progress.chunks_stored
@@ -0,0 +1,171 @@
+"""Inverted-file (IVF) approximate nearest-neighbour index built on numpy."""
+from array import array
+
+import numpy as np
+
+# Rows are assigned to centroids in blocks to bound temporary memory
+_ASSIGN_BLOCK = 8192
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _nearest_centroid(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Return the index of the most similar centroid for each vector."""
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_BLOCK):
+        block = vectors[start:start + _ASSIGN_BLOCK]
+        assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+def spherical_kmeans(
+    data: np.ndarray,
+    k: int,
+    iterations: int = 10,
+    seed: int = 0,
+) -> np.ndarray:
+    """Cluster unit vectors into ``k`` normalized centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        assignment = _nearest_centroid(data, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=k)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+
+        sums = np.empty_like(centroids)
+        sums[filled] = np.add.reduceat(data[order], starts, axis=0)
+        # Re-seed empty clusters from random points so every list stays useful
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = data[rng.choice(len(data), size=len(empty), replace=False)]
+        centroids = _normalize_rows(sums).astype(np.float32)
+
+    return centroids
+
+
+class IVFIndex:
+    """Coarse quantizer mapping store rows to inverted lists.
+
+    The index only keeps row numbers; vectors stay in the owning store's
+    matrix. Queries probe the ``nprobe`` closest lists, trading recall for
+    latency.
+    """
+
+    def __init__(
+        self,
+        nlist: int | None = None,
+        nprobe: int = 16,
+        max_train_points: int = 256,
+        iterations: int = 10,
+        seed: int = 0,
+    ):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.max_train_points = max_train_points
+        self.iterations = iterations
+        self.seed = seed
+        self.reset()
+
+    @property
+    def trained(self) -> bool:
+        """Whether centroids have been fitted."""
+        return self.centroids is not None
+
+    def memory_bytes(self) -> int:
+        """Bytes held by centroids, inverted lists and row assignments."""
+        centroids = self.centroids.nbytes if self.centroids is not None else 0
+        return centroids + sum(len(ids) * ids.itemsize for ids in self._lists) + self._assignment.nbytes
+
+    def reset(self):
+        """Forget centroids and list assignments."""
+        self.centroids: np.ndarray | None = None
+        self.trained_size = 0
+        self._lists: list[array] = []
+        self._assignment = np.full(0, -1, dtype=np.int32)
+
+    def train(self, vectors: np.ndarray, rows: np.ndarray):
+        """Fit centroids on ``vectors`` and assign their ``rows`` to lists."""
+        n = len(rows)
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(n, nlist * self.max_train_points)
+        sample = rng.choice(n, size=sample_size, replace=False) if sample_size < n else np.arange(n)
+
+        self.reset()
+        self.centroids = spherical_kmeans(
+            np.asarray(vectors[np.sort(sample)], dtype=np.float32),
+            nlist,
+            iterations=self.iterations,
+            seed=self.seed,
+        )
+        self._lists = [array("q") for _ in range(nlist)]
+        self.trained_size = n
+        self.add(rows, vectors)
+
+    def _ensure_rows(self, max_row: int):
+        if max_row < len(self._assignment):
+            return
+        grown = np.full(max(max_row + 1, 2 * len(self._assignment)), -1, dtype=np.int32)
+        grown[:len(self._assignment)] = self._assignment
+        self._assignment = grown
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray):
+        """Assign (or re-assign) rows to their nearest list."""
+        if not self.trained or len(rows) == 0:
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        self._ensure_rows(int(rows.max()))
+        self.remove(rows)
+        assignment = _nearest_centroid(np.asarray(vectors, dtype=np.float32), self.centroids)
+        for row, list_id in zip(rows.tolist(), assignment.tolist()):
+            self._lists[list_id].append(row)
+        self._assignment[rows] = assignment
+
+    def remove(self, rows: np.ndarray):
+        """Drop rows from their inverted lists."""
+        if not self.trained:
+            return
+        for row in np.asarray(rows, dtype=np.int64).tolist():
+            if row >= len(self._assignment):
+                continue
+            list_id = self._assignment[row]
+            if list_id >= 0:
+                self._lists[list_id].remove(row)
+                self._assignment[row] = -1
+
+    def remap(self, new_rows: np.ndarray):
+        """Renumber rows after compaction; ``new_rows[old] == -1`` drops a row."""
+        if not self.trained:
+            return
+        for i, postings in enumerate(self._lists):
+            mapped = new_rows[np.frombuffer(postings, dtype=np.int64)] if postings else []
+            self._lists[i] = array("q", (r for r in mapped if r >= 0))
+        kept = new_rows >= 0
+        assignment = np.full(int(kept.sum()), -1, dtype=np.int32)
+        old_assignment = np.full(len(new_rows), -1, dtype=np.int32)
+        limit = min(len(new_rows), len(self._assignment))
+        old_assignment[:limit] = self._assignment[:limit]
+        assignment[new_rows[kept]] = old_assignment[kept]
+        self._assignment = assignment
+
+    def candidates(self, query: np.ndarray, nprobe: int | None = None) -> np.ndarray:
+        """Rows stored in the ``nprobe`` lists closest to ``query``."""
+        nprobe = min(nprobe or self.nprobe, len(self._lists))
+        centroid_scores = self.centroids @ query
+        if nprobe < len(self._lists):
+            probes = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+        else:
+            probes = np.arange(len(self._lists))
+        postings = [np.frombuffer(self._lists[p], dtype=np.int64) for p in probes if self._lists[p]]
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(postings)
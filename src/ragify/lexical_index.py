@@ -0,0 +1,215 @@
+"""BM25 inverted index and reciprocal-rank fusion for hybrid retrieval."""
+import math
+import re
+import sys
+import threading
+from array import array
+from typing import Hashable, Iterable
+
+import numpy as np
+
+# Words, numbers and identifiers such as "e-1042", "v2.3.1" or "src/main.py"
+_TOKEN_RE = re.compile(r"[0-9a-z]+(?:[._/:\-][0-9a-z]+)*")
+_SPLIT_RE = re.compile(r"[._/:\-]")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have if in into is it its of on or "
+    "that the their there these this to was were which will with".split()
+)
+
+# Term frequencies are stored as uint16
+_MAX_TF = 65535
+
+# Postings are rebuilt once removed documents outnumber live ones (and this many)
+_COMPACT_MIN_DEAD = 1024
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase terms of ``text``; compound identifiers also yield their parts."""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        if token not in _STOPWORDS:
+            tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(p for p in _SPLIT_RE.split(token) if p and p not in _STOPWORDS)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Iterable[list[Hashable]], k: int = 60) -> list[tuple[Hashable, float]]:
+    """Fuse best-first rankings by summing ``1 / (k + rank)``; returns ``(key, score)`` best first."""
+    scores: dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index.
+
+    Each term maps to two parallel typed arrays (``uint32`` document numbers
+    and ``uint16`` term frequencies), so postings cost 6 bytes per entry and
+    are scored as numpy views without copying. Removed documents are
+    tombstoned and dropped from the postings once they outnumber live ones.
+    Documents are addressed by caller-chosen keys such as vector ids or rows.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._live
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the postings and per-document bookkeeping.
+
+        Counts one posting (6 bytes) and one term-tuple slot (8 bytes) per
+        token, an upper bound since repeated terms share an entry.
+        """
+        return 14 * self._total_len + 72 * len(self._doc_keys) + 100 * len(self._postings)
+
+    def clear(self):
+        """Drop every document."""
+        self._key_to_doc: dict[Hashable, int] = {}
+        self._doc_keys: list[Hashable | None] = []
+        # Token count per document; 0 marks a removed document
+        self._doc_len = array("I")
+        self._postings: dict[str, tuple[array, array]] = {}
+        self._df: dict[str, int] = {}
+        self._doc_terms: list[tuple[str, ...] | None] = []
+        self._total_len = 0
+        self._live = 0
+        self._dead = 0
+
+    def add(self, key: Hashable, text: str):
+        """Index ``text`` under ``key``, replacing any previous text for that key."""
+        with self._lock:
+            self._remove(key)
+            counts: dict[str, int] = {}
+            for token in tokenize(text):
+                # Interned so per-document term tuples share the posting keys
+                token = sys.intern(token)
+                counts[token] = counts.get(token, 0) + 1
+            if not counts:
+                return
+            doc = len(self._doc_keys)
+            self._key_to_doc[key] = doc
+            self._doc_keys.append(key)
+            self._doc_terms.append(tuple(counts))
+            length = sum(counts.values())
+            self._doc_len.append(length)
+            self._total_len += length
+            self._live += 1
+            for term, tf in counts.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = (array("I"), array("H"))
+                posting[0].append(doc)
+                posting[1].append(min(tf, _MAX_TF))
+                self._df[term] = self._df.get(term, 0) + 1
+
+    def remove(self, key: Hashable) -> bool:
+        """Forget ``key``. Returns whether it was indexed."""
+        with self._lock:
+            return self._remove(key)
+
+    def _remove(self, key: Hashable) -> bool:
+        doc = self._key_to_doc.pop(key, None)
+        if doc is None:
+            return False
+        for term in self._doc_terms[doc]:
+            self._df[term] -= 1
+        self._total_len -= self._doc_len[doc]
+        self._doc_len[doc] = 0
+        self._doc_keys[doc] = None
+        self._doc_terms[doc] = None
+        self._live -= 1
+        self._dead += 1
+        if self._dead >= _COMPACT_MIN_DEAD and self._dead > self._live:
+            self._compact()
+        return True
+
+    def _compact(self):
+        """Renumber live documents and drop removed ones from every posting list."""
+        old_len = np.frombuffer(self._doc_len, dtype=np.uint32).copy()
+        new_doc = np.cumsum(old_len > 0, dtype=np.int64) - 1
+        postings = {}
+        for term, (docs, tfs) in self._postings.items():
+            if not self._df.get(term):
+                continue
+            doc_arr = np.frombuffer(docs, dtype=np.uint32)
+            keep = old_len[doc_arr] > 0
+            postings[term] = (
+                array("I", new_doc[doc_arr[keep]].astype(np.uint32).tobytes()),
+                array("H", np.frombuffer(tfs, dtype=np.uint16)[keep].tobytes()),
+            )
+        live = np.flatnonzero(old_len)
+        self._postings = postings
+        self._df = {term: df for term, df in self._df.items() if df}
+        self._doc_keys = [self._doc_keys[d] for d in live]
+        self._doc_terms = [self._doc_terms[d] for d in live]
+        self._doc_len = array("I", old_len[live].tobytes())
+        self._key_to_doc = {key: doc for doc, key in enumerate(self._doc_keys)}
+        self._dead = 0
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        keys: Iterable[Hashable] | None = None,
+    ) -> list[tuple[Hashable, float]]:
+        """Return up to ``top_k`` ``(key, score)`` pairs, best first, optionally only among ``keys``."""
+        terms = set(tokenize(query))
+        with self._lock:
+            # Scoring holds numpy views of the postings; they must be released
+            # before the lock is, since arrays cannot grow while viewed.
+            return self._search(terms, top_k, keys)
+
+    def _search(
+        self,
+        terms: set[str],
+        top_k: int,
+        keys: Iterable[Hashable] | None,
+    ) -> list[tuple[Hashable, float]]:
+        if not self._live or not terms or top_k <= 0:
+            return []
+        doc_len = np.frombuffer(self._doc_len, dtype=np.uint32)
+        if keys is not None:
+            # Zero the length of every document outside ``keys`` so it is skipped as removed
+            allowed = np.zeros(len(doc_len), dtype=np.uint32)
+            docs = np.fromiter(
+                (self._key_to_doc[k] for k in keys if k in self._key_to_doc), dtype=np.int64
+            )
+            allowed[docs] = doc_len[docs]
+            doc_len = allowed
+        avgdl = self._total_len / self._live
+        docs_parts, score_parts = [], []
+        for term in terms:
+            df = self._df.get(term)
+            if not df:
+                continue
+            docs_buf, tfs_buf = self._postings[term]
+            docs = np.frombuffer(docs_buf, dtype=np.uint32)
+            tf = np.frombuffer(tfs_buf, dtype=np.uint16).astype(np.float32)
+            lengths = doc_len[docs]
+            idf = math.log(1.0 + (self._live - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * lengths / avgdl)
+            score = idf * tf * (self.k1 + 1.0) / (tf + norm)
+            # Removed documents keep their postings until compaction
+            alive = lengths > 0
+            docs_parts.append(docs[alive])
+            score_parts.append(score[alive])
+        if not docs_parts:
+            return []
+
+        all_docs = np.concatenate(docs_parts)
+        unique_docs, inverse = np.unique(all_docs, return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(score_parts))
+        k = min(top_k, len(unique_docs))
+        top = np.argpartition(totals, -k)[-k:] if k < len(totals) else np.arange(len(totals))
+        top = top[np.argsort(totals[top])[::-1]]
+        return [(self._doc_keys[int(unique_docs[i])], float(totals[i])) for i in top]
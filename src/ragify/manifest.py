@@ -0,0 +1,70 @@
+"""Ingest manifest tracking document and chunk fingerprints."""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+# Read size when hashing files
+_HASH_BLOCK = 1 << 20
+
+
+def file_sha256(path: str | Path) -> str:
+    """Hex sha256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(_HASH_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_sha256(text: str) -> str:
+    """Hex sha256 of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """Maps each ingested source to its file hash and per-chunk content hashes.
+
+    ``chunks[i]`` is the hash of the text stored under the source's ``i``-th
+    chunk id, which lets re-ingestion skip unchanged documents, re-embed only
+    changed chunks and delete chunk ids that no longer exist. With a
+    ``path`` the manifest is loaded from and saved to a JSON file.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        if self.path is not None and self.path.exists():
+            self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def get(self, source_id: str) -> dict | None:
+        """Return ``{"file_hash", "chunks"}`` for a source, if recorded."""
+        return self._entries.get(source_id)
+
+    def sources(self) -> dict[str, str]:
+        """Map of every recorded source to its file hash."""
+        return {source: entry["file_hash"] for source, entry in self._entries.items()}
+
+    def set(self, source_id: str, file_hash: str, chunk_hashes: list[str]):
+        """Record a source's fingerprints and persist the manifest."""
+        with self._lock:
+            self._entries[source_id] = {"file_hash": file_hash, "chunks": chunk_hashes}
+            self._save()
+
+    def remove(self, source_id: str) -> dict | None:
+        """Forget a source, returning its previous entry."""
+        with self._lock:
+            entry = self._entries.pop(source_id, None)
+            if entry is not None:
+                self._save()
+            return entry
+
+    def _save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._entries), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -1,69 +1,1064 @@
 """In-memory vector store implementation - no external dependencies needed."""
+import heapq
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict
+
+from .config import settings
+from .dimensions import check_dim
+from .filters import NUMERIC_FIELDS, SearchFilter, validate_filter
+from .ivf_index import IVFIndex
+from .lexical_index import BM25Index, reciprocal_rank_fusion
+from .metrics import metrics
+from .quantization import QUANTIZATION_MODES, QuantizedCodes
+from .rwlock import ReadWriteLock
+
+# Retrain the IVF index once the store has grown this much since training
+_IVF_RETRAIN_GROWTH = 4
+
+# Rows copied per step when rewriting a memory-mapped snapshot
+_COPY_BLOCK = 65536
+
+# Scores held at once by a batched search (queries x rows, 64 MB of float32)
+_BATCH_SCORE_ELEMENTS = 1 << 24
+
+# Approximate bytes per stored id: the string, its list slot and dict entry
+_ID_BYTES = 160
+
+# Search thread pools shared by every store, keyed by thread count
+_search_pools: dict[int, ThreadPoolExecutor] = {}
+_search_pools_lock = threading.Lock()
+
+
+def _payload_bytes(payload: Dict | None) -> int:
+    """Approximate bytes held by a payload dict and its values."""
+    if payload is None:
+        return 0
+    return sys.getsizeof(payload) + sum(sys.getsizeof(value) for value in payload.values())
+
+
+def _snapshot_paths(directory: Path, generation: int) -> tuple[Path, Path]:
+    """Vector matrix and record log paths for a snapshot generation."""
+    return directory / f"vectors-{generation}.npy", directory / f"records-{generation}.jsonl"
+
+
+def _row_top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Column indices and values of the ``k`` best scores in each row, best first."""
+    if k < scores.shape[1]:
+        top = np.argpartition(scores, -k, axis=1)[:, -k:]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(top_scores, axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def _search_pool(threads: int) -> ThreadPoolExecutor:
+    """The process-wide pool of ``threads`` search threads, created on first use."""
+    with _search_pools_lock:
+        pool = _search_pools.get(threads)
+        if pool is None:
+            pool = _search_pools[threads] = ThreadPoolExecutor(
+                max_workers=threads,
+                thread_name_prefix=f"ragify-search-{threads}",
+            )
+        return pool
+
+
+def _resize_npy(path: Path, rows: int, dim: int):
+    """Grow an .npy matrix file to ``rows`` rows without rewriting its data.
+
+    numpy pads .npy headers so the shape can grow in place; the header is
+    rewritten with the new shape and the file extended with zero rows. Falls
+    back to copying into a new file if the header would change length.
+    """
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, {
+        "descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+        "fortran_order": False,
+        "shape": (rows, dim),
+    })
+    with open(path, "r+b") as f:
+        np.lib.format.read_magic(f)
+        np.lib.format.read_array_header_1_0(f)
+        data_offset = f.tell()
+        if header.tell() == data_offset:
+            f.seek(0)
+            f.write(header.getvalue())
+            f.truncate(data_offset + rows * dim * np.dtype(np.float32).itemsize)
+            return
+
+    # Header length would change: copy into a fresh file instead
+    old = np.load(path, mmap_mode="r")
+    tmp = path.with_suffix(".tmp")
+    new = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(rows, dim))
+    for start in range(0, old.shape[0], _COPY_BLOCK):
+        new[start:start + _COPY_BLOCK] = old[start:start + _COPY_BLOCK]
+    new.flush()
+    del old, new
+    os.replace(tmp, path)
 
 
 class InMemoryVectorStore:
-    """Simple in-memory vector storage using numpy for similarity search."""
-    
-    def __init__(self):
-        self.vectors: List[np.ndarray] = []
-        self.payloads: List[Dict] = []
-        self.ids: List[str] = []
-    
-    def upsert(self, ids: List[str], vectors: List[List[float]], payloads: List[Dict]):
-        """Insert or update vectors."""
+    """In-memory vector storage backed by a contiguous float32 matrix.
+
+    Vectors are L2-normalized on insert, so cosine similarity reduces to a
+    single matrix-vector product at query time. Rows are addressed through an
+    id -> row dict; deleted rows are tombstoned and reclaimed by ``compact``.
+
+    With ``index="ivf"`` searches only scan the rows in the ``nprobe`` inverted
+    lists closest to the query. The index trains itself once the store holds
+    ``min_train_size`` vectors and falls back to exact search until then.
+
+    With ``persist_dir`` the matrix lives in a memory-mapped ``.npy`` file and
+    ids/payloads in an append-only JSONL record log next to it. Reopening the
+    directory maps the vectors read-only, so a restarted process can serve
+    queries without re-embedding or reading the whole matrix into RAM.
+    Upserts write only the touched rows and log lines (an overwritten id gets
+    a fresh row and its old row is tombstoned); ``compact`` rewrites both
+    files as a new snapshot generation.
+
+    With ``lexical=True`` (the default when ``SEARCH_MODE=hybrid``) chunk
+    texts are also kept in a BM25 index, and searches given the question
+    text fuse the dense and lexical rankings with reciprocal-rank fusion.
+
+    With ``quantization="int8"`` or ``"binary"`` a compact code per vector is
+    kept in RAM and scanned first; only the best ``top_k * rescore_factor``
+    candidates are rescored against the float32 vectors. Those then live in
+    a memory-mapped file (the snapshot, or an unlinked temporary file when
+    not persisting), so the OS pages in just the rows being rescored.
+    ``prefix_dim`` likewise searches a truncated, renormalized prefix of each
+    vector first (two-stage Matryoshka search) and combines with either
+    quantization mode.
+
+    Searches accept a metadata ``filter`` (see ``ragify.filters``). Matching
+    rows are resolved up front from the per-source row index and numeric
+    payload columns, and only those rows are scored.
+
+    With ``search_threads > 1``, exact scans over more than ``shard_size``
+    rows are split into fixed-size shards of consecutive rows (or of a
+    filter's matches) scored in parallel on a thread pool shared by every
+    store in the process; NumPy releases the GIL during the products.
+    Per-shard top-k results are merged with a heap (a vectorized top-k for
+    batched searches).
+
+    Searches may run concurrently with each other and with writes: searches
+    share a reader/writer lock, while upserts, deletes, compaction and index
+    rebuilds hold it exclusively. Upserts normalize their batch before
+    taking the lock, so searches only wait for the row writes themselves.
+    """
+
+    def __init__(
+        self,
+        dim: int | None = None,
+        initial_capacity: int = 1024,
+        index: str | None = None,
+        nlist: int | None = None,
+        nprobe: int | None = None,
+        min_train_size: int | None = None,
+        persist_dir: str | Path | None = None,
+        lexical: bool | None = None,
+        quantization: str | None = None,
+        rescore_factor: int | None = None,
+        prefix_dim: int | None = None,
+        shard_size: int | None = None,
+        search_threads: int | None = None,
+    ):
+        self.dim = dim
+        self._initial_capacity = max(1, initial_capacity)
+        self.index_type = index or settings.vector_index
+        if self.index_type not in ("flat", "ivf"):
+            raise ValueError(f"Unknown vector index type: {self.index_type}")
+        self.min_train_size = min_train_size or settings.ivf_min_train_size
+        self._index = IVFIndex(
+            nlist=nlist or settings.ivf_nlist,
+            nprobe=nprobe or settings.ivf_nprobe,
+        ) if self.index_type == "ivf" else None
+        if lexical is None:
+            lexical = settings.search_mode == "hybrid"
+        self._lexical = BM25Index() if lexical else None
+        self.quantization = quantization or settings.vector_quantization
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {self.quantization}")
+        self.rescore_factor = rescore_factor or settings.rescore_factor
+        self.prefix_dim = prefix_dim or settings.search_prefix_dim
+        self.shard_size = max(1, shard_size or settings.search_shard_size)
+        self.search_threads = search_threads or settings.search_threads
+        self._lock = ReadWriteLock()
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self._log = None
+        self._generation = 0
+        self._reset_state()
+        if self.persist_dir is not None:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+            self._restore()
+
+    # -- persistence -------------------------------------------------------
+
+    @property
+    def _vectors_path(self) -> Path:
+        return _snapshot_paths(self.persist_dir, self._generation)[0]
+
+    @property
+    def _records_path(self) -> Path:
+        return _snapshot_paths(self.persist_dir, self._generation)[1]
+
+    def _restore(self):
+        """Map the current snapshot generation of ``persist_dir``, if any."""
+        current = self.persist_dir / "CURRENT"
+        if not current.exists():
+            return
+        self._generation = int(current.read_text().strip())
+        if not self._vectors_path.exists():
+            return
+
+        matrix = np.load(self._vectors_path, mmap_mode="r")
+        if self.dim is not None and matrix.shape[1] != self.dim:
+            check_dim(matrix.shape[1], self.dim, what="Snapshot")
+        self.dim = matrix.shape[1]
+        self._matrix = matrix
+        self._alive = np.zeros(matrix.shape[0], dtype=bool)
+        self._codes = self._new_codes()
+        if self._codes is not None:
+            self._codes.resize(matrix.shape[0])
+            for start in range(0, matrix.shape[0], _COPY_BLOCK):
+                rows = np.arange(start, min(start + _COPY_BLOCK, matrix.shape[0]))
+                self._codes.set(rows, matrix[rows])
+
+        with open(self._records_path, "r+b") as f:
+            offset = 0
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from an interrupted write: the rows it
+                    # referenced were never acknowledged, so drop it
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                if record["op"] == "put":
+                    self._apply_put(record["id"], record["row"], record["payload"])
+                else:
+                    self._apply_delete(record["id"])
+
+    def _apply_put(self, vec_id: str, row: int, payload: Dict):
+        while len(self.ids) <= row:
+            self.ids.append(None)
+            self.payloads.append(None)
+        previous = self._id_to_row.get(vec_id)
+        if previous is not None and previous != row:
+            self._apply_delete(vec_id)
+        self._id_to_row[vec_id] = row
+        self.ids[row] = vec_id
+        self._set_payload(row, payload)
+        self._alive[row] = True
+        self._size = max(self._size, row + 1)
+        self._deleted = self._size - len(self._id_to_row)
+
+    def _apply_delete(self, vec_id: str):
+        row = self._id_to_row.pop(vec_id, None)
+        if row is None:
+            return
+        self._alive[row] = False
+        self.ids[row] = None
+        self._set_payload(row, None)
+        self._deleted = self._size - len(self._id_to_row)
+
+    def _append_records(self, records: List[Dict]):
+        """Append records to the log; the log is the commit point for rows."""
+        if self.persist_dir is None or not records:
+            return
+        if self._log is None:
+            self._log = open(self._records_path, "a", encoding="utf-8")
+        self._log.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        self._log.flush()
+
+    def _writable_matrix(self):
+        """Re-map a read-only restored snapshot for writing."""
+        if isinstance(self._matrix, np.memmap) and self._matrix.mode == "r":
+            self._matrix = np.load(self._vectors_path, mmap_mode="r+")
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        """Return a zeroed matrix of ``capacity`` rows holding the current rows."""
+        if self.persist_dir is None:
+            if self._codes is not None:
+                return self._spill_matrix(self._matrix, np.arange(self._size), capacity)
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            matrix[:self._size] = self._matrix[:self._size]
+            return matrix
+
+        path = self._vectors_path
+        if isinstance(self._matrix, np.memmap):
+            self._matrix.flush()
+            self._matrix = None
+            _resize_npy(path, capacity, self.dim)
+        else:
+            np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(capacity, self.dim)).flush()
+            (self.persist_dir / "CURRENT").write_text(str(self._generation))
+        return np.load(path, mmap_mode="r+")
+
+    def _spill_matrix(self, source: np.ndarray, rows: np.ndarray, capacity: int) -> np.memmap:
+        """Copy ``rows`` of ``source`` into a file-backed matrix of ``capacity`` rows.
+
+        Quantized stores without ``persist_dir`` keep full-precision vectors
+        here; the file is unlinked on creation and freed with the mapping.
+        """
+        with tempfile.TemporaryFile(dir=settings.vector_store_dir) as f:
+            matrix = np.memmap(f, dtype=np.float32, mode="w+", shape=(max(capacity, 1), self.dim))
+        for start in range(0, len(rows), _COPY_BLOCK):
+            block = rows[start:start + _COPY_BLOCK]
+            matrix[start:start + len(block)] = source[block]
+        return matrix
+
+    def _write_snapshot(self, directory: Path, generation: int, rows: np.ndarray):
+        """Write ``rows`` as a compacted snapshot generation in ``directory``."""
+        vectors_path, records_path = _snapshot_paths(directory, generation)
+        matrix = np.lib.format.open_memmap(
+            vectors_path, mode="w+", dtype=np.float32, shape=(len(rows), self.dim or 0)
+        )
+        for start in range(0, len(rows), _COPY_BLOCK):
+            block = rows[start:start + _COPY_BLOCK]
+            matrix[start:start + len(block)] = self._matrix[block]
+        matrix.flush()
+        del matrix
+        with open(records_path, "w", encoding="utf-8") as f:
+            for new_row, row in enumerate(rows.tolist()):
+                record = {"op": "put", "id": self.ids[row], "row": new_row, "payload": self.payloads[row]}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # Switching CURRENT is the atomic commit of the new generation
+        tmp = directory / "CURRENT.tmp"
+        tmp.write_text(str(generation))
+        os.replace(tmp, directory / "CURRENT")
+
+    def snapshot(self, directory: str | Path):
+        """Write a compacted copy of the store that ``persist_dir`` can reopen."""
+        directory = Path(directory)
+        if self.persist_dir is not None and directory.resolve() == self.persist_dir.resolve():
+            raise ValueError("Cannot snapshot a persistent store into its own persist_dir")
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock.read():
+            self._write_snapshot(directory, 0, np.flatnonzero(self._alive[:self._size]))
+
+    def flush(self):
+        """Flush pending vector and record writes to disk."""
+        if isinstance(self._matrix, np.memmap):
+            self._matrix.flush()
+        if self._log is not None:
+            self._log.flush()
+
+    def close(self):
+        """Flush and release file handles held by a persistent store."""
+        self.flush()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    # -- storage -----------------------------------------------------------
+
+    def _grow(self, min_rows: int):
+        """Ensure the matrix can hold at least ``min_rows`` rows."""
+        capacity = self._matrix.shape[0]
+        if min_rows <= capacity:
+            return
+        new_capacity = max(min_rows, capacity * 2, self._initial_capacity)
+        matrix = self._allocate(new_capacity)
+        if self._codes is not None:
+            self._codes.resize(new_capacity)
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._matrix = matrix
+        self._alive = alive
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalize rows, leaving zero vectors untouched."""
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @metrics.timed("vector_upsert", store="memory")
+    def upsert(self, ids: List[str], vectors: List[List[float]], payloads: List[Dict], wait: bool = True):
+        """Insert or update vectors.
+
+        Writes are visible on return. For persistent stores ``wait=True``
+        flushes the written rows to disk before the record log commits them;
+        with ``wait=False`` (bulk loads) that is left to ``flush``.
+        """
+        if not ids:
+            return
+        metrics.items("vector_upsert", len(ids), store="memory")
+        batch = np.asarray(vectors, dtype=np.float32)
+        if batch.ndim != 2 or batch.shape[0] != len(ids):
+            raise ValueError("Expected one vector per id")
+        batch = self._normalize(batch)
+        with self._lock.write():
+            self._upsert(ids, batch, payloads, wait)
+
+    def _upsert(self, ids: List[str], batch: np.ndarray, payloads: List[Dict], wait: bool = True):
+        if self.dim is None:
+            self.dim = batch.shape[1]
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            self._codes = self._new_codes()
+        check_dim(batch.shape[1], self.dim)
+
+        # Resolve target rows. Persistent stores write overwrites of existing
+        # ids to fresh rows and tombstone the old ones once the log commits,
+        # so a crash before the commit leaves the old vector intact
+        rows = np.empty(len(ids), dtype=np.int64)
+        replaced = []
+        new_rows = 0
         for i, vec_id in enumerate(ids):
-            vector = np.array(vectors[i])
-            
-            # Check if ID exists and update
-            if vec_id in self.ids:
-                idx = self.ids.index(vec_id)
-                self.vectors[idx] = vector
-                self.payloads[idx] = payloads[i]
-            else:
-                # Add new
+            row = self._id_to_row.get(vec_id)
+            if row is not None and row < self._size and self.persist_dir is not None:
+                replaced.append(row)
+                self._id_to_row.pop(vec_id)
+                row = None
+            if row is None:
+                row = self._size + new_rows
+                self._id_to_row[vec_id] = row
                 self.ids.append(vec_id)
-                self.vectors.append(vector)
-                self.payloads.append(payloads[i])
-    
-    def search(self, query_vector: List[float], top_k: int = 5) -> Dict[str, List]:
-        """Search for most similar vectors using cosine similarity."""
-        if not self.vectors:
-            return {"contexts": [], "sources": []}
-        
-        query = np.array(query_vector)
-        
-        # Calculate cosine similarities
-        similarities = []
-        for vec in self.vectors:
-            # Cosine similarity = dot product / (norm1 * norm2)
-            similarity = np.dot(query, vec) / (np.linalg.norm(query) * np.linalg.norm(vec))
-            similarities.append(similarity)
-        
-        # Get top-k indices
-        top_indices = np.argsort(similarities)[::-1][:top_k]
-        
-        # Extract results
+                self.payloads.append(None)
+                new_rows += 1
+            self._set_payload(row, payloads[i])
+            rows[i] = row
+
+        self._grow(self._size + new_rows)
+        self._writable_matrix()
+        self._size += new_rows
+        self._matrix[rows] = batch
+        if self._codes is not None:
+            self._codes.set(rows, batch)
+        self._alive[rows] = True
+        if self.persist_dir is not None:
+            if wait:
+                self._matrix.flush()
+            self._append_records([
+                {"op": "put", "id": vec_id, "row": int(row), "payload": self.payloads[row]}
+                for vec_id, row in zip(ids, rows.tolist())
+            ])
+        for row in replaced:
+            self._alive[row] = False
+            self.ids[row] = None
+            self._set_payload(row, None)
+        self._deleted += len(replaced)
+        if replaced and self._index is not None:
+            self._index.remove(replaced)
+
+        if self._index is not None:
+            if self._index.trained and self.count() < _IVF_RETRAIN_GROWTH * self._index.trained_size:
+                self._index.add(rows, batch)
+            elif self.count() >= self.min_train_size:
+                self._rebuild_index()
+
+    def rebuild_index(self):
+        """(Re)train the IVF index on the vectors currently stored."""
+        if self._index is None:
+            raise ValueError("rebuild_index requires index='ivf'")
+        with self._lock.write():
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        rows = np.flatnonzero(self._alive[:self._size])
+        if len(rows) == 0:
+            self._index.reset()
+            return
+        self._index.train(self._matrix[rows], rows)
+
+    def delete(self, ids: List[str]) -> int:
+        """Remove vectors by id. Returns the number of vectors deleted."""
+        with self._lock.write():
+            return self._delete(ids)
+
+    def _delete(self, ids: List[str]) -> int:
+        deleted = 0
+        records = []
+        for vec_id in ids:
+            row = self._id_to_row.pop(vec_id, None)
+            if row is None:
+                continue
+            records.append({"op": "delete", "id": vec_id})
+            self._alive[row] = False
+            self.ids[row] = None
+            self._set_payload(row, None)
+            if self._index is not None:
+                self._index.remove([row])
+            deleted += 1
+        self._deleted += deleted
+        self._append_records(records)
+        return deleted
+
+    def count_source(self, source: str) -> int:
+        """Number of vectors whose payload ``source`` matches."""
+        with self._lock.read():
+            return len(self._source_rows.get(source, ()))
+
+    def delete_by_source(self, source: str, keep_ids: List[str] | None = None) -> int:
+        """Remove every vector whose payload ``source`` matches, except ``keep_ids``."""
+        keep = set(keep_ids or ())
+        with self._lock.write():
+            ids = [self.ids[row] for row in self._source_rows.get(source, ())]
+            return self._delete([vec_id for vec_id in ids if vec_id not in keep])
+
+    def _set_columns(self, row: int, payload: Dict | None):
+        """Copy a row's numeric payload fields into the filter columns (NaN when absent)."""
+        capacity = len(self._columns[NUMERIC_FIELDS[0]])
+        if row >= capacity:
+            new_capacity = max(row + 1, capacity * 2, self._initial_capacity)
+            for field, column in self._columns.items():
+                grown = np.full(new_capacity, np.nan)
+                grown[:capacity] = column
+                self._columns[field] = grown
+        for field, column in self._columns.items():
+            value = payload.get(field) if payload is not None else None
+            column[row] = np.nan if value is None else value
+
+    def _set_payload(self, row: int, payload: Dict | None):
+        """Store a row's payload, keeping the per-source row, filter and lexical indexes in sync."""
+        previous = self.payloads[row]
+        if previous is not None:
+            rows = self._source_rows.get(previous.get("source"))
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self._source_rows[previous.get("source")]
+            if self._lexical is not None:
+                self._lexical.remove(row)
+        if payload is not None:
+            self._source_rows.setdefault(payload.get("source"), set()).add(row)
+            if self._lexical is not None:
+                self._lexical.add(row, payload.get("text", ""))
+        self._set_columns(row, payload)
+        self._payload_bytes += _payload_bytes(payload) - _payload_bytes(previous)
+        self.payloads[row] = payload
+
+    def compact(self):
+        """Drop tombstoned rows and shrink the matrix to fit.
+
+        Persistent stores write the surviving rows as a new snapshot
+        generation and remove the previous one.
+        """
+        with self._lock.write():
+            self._compact()
+
+    def _compact(self):
+        if self._deleted == 0:
+            return
+        if self.count() == 0:
+            self._clear()
+            return
+        keep = np.flatnonzero(self._alive[:self._size])
+        if self._index is not None:
+            new_rows = np.full(self._size, -1, dtype=np.int64)
+            new_rows[keep] = np.arange(len(keep))
+            self._index.remap(new_rows)
+        if self._codes is not None:
+            self._codes.take(keep)
+        if self.persist_dir is not None:
+            old_paths = (self._vectors_path, self._records_path)
+            self.close()
+            self._write_snapshot(self.persist_dir, self._generation + 1, keep)
+            self._matrix = None
+            self._generation += 1
+            for path in old_paths:
+                path.unlink(missing_ok=True)
+            self._matrix = np.load(self._vectors_path, mmap_mode="r+")
+        else:
+            if self._codes is not None:
+                self._matrix = self._spill_matrix(self._matrix, keep, len(keep))
+            else:
+                self._matrix = np.ascontiguousarray(self._matrix[keep])
+        self._alive = np.ones(len(keep), dtype=bool)
+        self.ids = [self.ids[r] for r in keep]
+        self.payloads = [self.payloads[r] for r in keep]
+        self._id_to_row = {vec_id: row for row, vec_id in enumerate(self.ids)}
+        self._source_rows = {}
+        self._columns = {field: column[keep] for field, column in self._columns.items()}
+        if self._lexical is not None:
+            # The lexical index is keyed by row, so it is rebuilt for the new rows
+            self._lexical.clear()
+        for row, payload in enumerate(self.payloads):
+            self._source_rows.setdefault(payload.get("source"), set()).add(row)
+            if self._lexical is not None:
+                self._lexical.add(row, payload.get("text", ""))
+        self._size = len(keep)
+        self._deleted = 0
+
+    def _top_rows(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        nprobe: int | None = None,
+        exact: bool = False,
+        rows: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return rows and scores of the ``top_k`` most similar vectors, best first.
+
+        ``rows`` restricts the search to those live rows (a filter's matches).
+        """
+        if self.count() == 0 or top_k <= 0 or (rows is not None and len(rows) == 0):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.ndim != 1:
+            raise ValueError("Expected a single query vector")
+        check_dim(query.shape[0], self.dim, what="Query")
+        query = self._normalize(query)
+
+        candidates = rows
+        if rows is None and not exact and self._index is not None and self._index.trained:
+            # Approximate: only score rows in the probed inverted lists
+            candidates = self._index.candidates(query, nprobe)
+        if not exact and self._codes is not None:
+            # Coarse pass over the quantized codes, rescored at full precision below
+            candidates = self._coarse_candidates(query, candidates, top_k)
+
+        if self._sharded(len(candidates) if candidates is not None else self._size):
+            return self._sharded_top_rows(query, top_k, candidates)
+        if candidates is not None:
+            scores = self._matrix[candidates] @ query
+        else:
+            scores = self._matrix[:self._size] @ query
+            if self._deleted:
+                scores[~self._alive[:self._size]] = -np.inf
+
+        k = min(top_k, self.count(), len(scores))
+        if k < len(scores):
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(scores[top])[::-1]]
+        return (top if candidates is None else candidates[top]), scores[top]
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool scoring shards, shared with every store using as many threads."""
+        return _search_pool(self.search_threads)
+
+    def _sharded(self, rows: int) -> bool:
+        """Whether an exact scan over ``rows`` rows is split into parallel shards."""
+        return self.search_threads > 1 and rows > self.shard_size
+
+    def _shard_top_rows(
+        self,
+        query: np.ndarray,
+        k: int,
+        start: int,
+        stop: int,
+        candidates: np.ndarray | None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Top ``k`` of rows ``start:stop`` (or of ``candidates[start:stop]``), best first."""
+        if candidates is None:
+            scores = self._matrix[start:stop] @ query
+            if self._deleted:
+                scores[~self._alive[start:stop]] = -np.inf
+            rows = np.arange(start, stop)
+        else:
+            rows = candidates[start:stop]
+            scores = self._matrix[rows] @ query
+        if k < len(scores):
+            top = np.argpartition(scores, -k)[-k:]
+            top = top[np.argsort(scores[top])[::-1]]
+        else:
+            top = np.argsort(scores)[::-1]
+        return rows[top], scores[top]
+
+    def _sharded_top_rows(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        candidates: np.ndarray | None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """``_top_rows`` exact scan with shards scored on the thread pool and merged with a heap."""
+        size = len(candidates) if candidates is not None else self._size
+        k = min(top_k, self.count(), size)
+        shards = self.executor.map(
+            lambda start: self._shard_top_rows(query, k, start, min(start + self.shard_size, size), candidates),
+            range(0, size, self.shard_size),
+        )
+        best = heapq.nlargest(
+            k,
+            itertools.chain.from_iterable(zip(scores.tolist(), rows.tolist()) for rows, scores in shards),
+        )
+        return (
+            np.fromiter((row for _, row in best), dtype=np.int64, count=len(best)),
+            np.fromiter((score for score, _ in best), dtype=np.float32, count=len(best)),
+        )
+
+    def _block_top_rows(
+        self,
+        queries: np.ndarray,
+        k: int,
+        start: int,
+        stop: int,
+        rows: np.ndarray | None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Per-query top ``k`` rows and scores among rows ``start:stop`` (or ``rows[start:stop]``)."""
+        if rows is None:
+            scores = queries @ self._matrix[start:stop].T
+            if self._deleted:
+                scores[:, ~self._alive[start:stop]] = -np.inf
+            top, top_scores = _row_top_k(scores, k)
+            return top + start, top_scores
+        shard_rows = rows[start:stop]
+        top, top_scores = _row_top_k(queries @ self._matrix[shard_rows].T, k)
+        return shard_rows[top], top_scores
+
+    def _top_rows_many(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        rows: np.ndarray | None = None,
+    ) -> List[tuple[np.ndarray, np.ndarray]]:
+        """``_top_rows`` for a matrix of queries via one matrix-matrix product per block.
+
+        Exact over ``rows`` (default: all live rows); callers only use it when
+        no trained IVF index or quantized codes would narrow the scan.
+        """
+        if self.count() == 0 or top_k <= 0 or (rows is not None and len(rows) == 0):
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+            return [empty] * len(queries)
+        check_dim(queries.shape[1], self.dim, what="Query")
+        queries = self._normalize(queries)
+        size = len(rows) if rows is not None else self._size
+        k = min(top_k, self.count(), size)
+        # Bound the (queries x rows) scores held at once, across all shards
+        block = max(1, _BATCH_SCORE_ELEMENTS // size)
+        results = []
+        for start in range(0, len(queries), block):
+            batch = queries[start:start + block]
+            if self._sharded(size):
+                shards = list(self.executor.map(
+                    lambda lo: self._block_top_rows(batch, k, lo, min(lo + self.shard_size, size), rows),
+                    range(0, size, self.shard_size),
+                ))
+                candidates = np.concatenate([shard_rows for shard_rows, _ in shards], axis=1)
+                top, top_scores = _row_top_k(np.concatenate([scores for _, scores in shards], axis=1), k)
+                top = np.take_along_axis(candidates, top, axis=1)
+            else:
+                top, top_scores = self._block_top_rows(batch, k, 0, size, rows)
+            results.extend(zip(top, top_scores))
+        return results
+
+    def _coarse_candidates(self, query: np.ndarray, rows: np.ndarray | None, top_k: int) -> np.ndarray:
+        """Best ``top_k * rescore_factor`` of ``rows`` (default: all live rows) by quantized score."""
+        scores = self._codes.scores(query, rows=rows, size=self._size)
+        if rows is None and self._deleted:
+            scores[~self._alive[:self._size]] = -np.inf
+        depth = min(top_k * self.rescore_factor, len(scores) if rows is not None else self.count())
+        if depth < len(scores):
+            top = np.argpartition(scores, -depth)[-depth:]
+        else:
+            top = np.flatnonzero(np.isfinite(scores))
+        top = top if rows is None else rows[top]
+        # Sorted rows read the memory-mapped matrix in file order
+        return np.sort(top)
+
+    def _filter_rows(self, filter: SearchFilter) -> np.ndarray:
+        """Sorted live rows whose payload matches ``filter``."""
+        sources = filter.get("source")
+        if sources is not None:
+            sources = sources if isinstance(sources, list) else [sources]
+            matched = set().union(*(self._source_rows.get(source, ()) for source in sources))
+            rows = np.fromiter(sorted(matched), dtype=np.int64, count=len(matched))
+        else:
+            rows = np.flatnonzero(self._alive[:self._size])
+        for field, condition in filter.items():
+            if field == "source" or len(rows) == 0:
+                continue
+            values = self._columns[field][rows]
+            if isinstance(condition, dict):
+                mask = np.ones(len(rows), dtype=bool)
+                if "gt" in condition:
+                    mask &= values > condition["gt"]
+                if "gte" in condition:
+                    mask &= values >= condition["gte"]
+                if "lt" in condition:
+                    mask &= values < condition["lt"]
+                if "lte" in condition:
+                    mask &= values <= condition["lte"]
+            elif isinstance(condition, list):
+                mask = np.isin(values, condition)
+            else:
+                mask = values == condition
+            rows = rows[mask]
+        return rows
+
+    def _hybrid_rows(
+        self,
+        query_vector: List[float],
+        query_text: str,
+        top_k: int,
+        nprobe: int | None = None,
+        exact: bool = False,
+        rows: np.ndarray | None = None,
+    ) -> tuple[List[int], List[float]]:
+        """Fuse dense and BM25 candidate rankings with reciprocal-rank fusion."""
+        depth = max(top_k, settings.hybrid_candidates)
+        dense_rows, _ = self._top_rows(query_vector, depth, nprobe=nprobe, exact=exact, rows=rows)
+        return self._fuse_rows(dense_rows, query_text, top_k, rows)
+
+    def _fuse_rows(
+        self,
+        dense_rows: np.ndarray,
+        query_text: str,
+        top_k: int,
+        rows: np.ndarray | None = None,
+    ) -> tuple[List[int], List[float]]:
+        """Fuse a dense ranking with the BM25 ranking for ``query_text`` (within ``rows``)."""
+        depth = max(top_k, settings.hybrid_candidates)
+        keys = rows.tolist() if rows is not None else None
+        lexical_rows = [row for row, _ in self._lexical.search(query_text, depth, keys=keys)]
+        fused = reciprocal_rank_fusion([dense_rows.tolist(), lexical_rows], k=settings.rrf_k)[:top_k]
+        return [row for row, _ in fused], [score for _, score in fused]
+
+    @metrics.timed("vector_search", store="memory")
+    def search_hits(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        nprobe: int | None = None,
+        exact: bool = False,
+        query_text: str | None = None,
+        filter: SearchFilter | None = None,
+        with_vectors: bool = False,
+    ) -> List[Dict]:
+        """Return the ``top_k`` nearest vectors as ``{id, score, payload}`` dicts.
+
+        ``nprobe`` overrides the IVF probe count for this query; ``exact``
+        forces a full scan even when an index is trained. With ``query_text``
+        and a lexical index, hits are ranked by fused RRF score instead.
+        ``filter`` limits the search to rows whose payload matches it.
+        ``with_vectors`` adds each hit's normalized ``vector``.
+        """
+        filter = validate_filter(filter)
+        self._ensure_index_trained()
+        with self._lock.read():
+            return self._search_hits(query_vector, top_k, nprobe, exact, query_text, filter, with_vectors)
+
+    def _ensure_index_trained(self):
+        """Train the IVF index on first search once enough vectors are stored (restored snapshots)."""
+        if self._index is None or self._index.trained or self.count() < self.min_train_size:
+            return
+        with self._lock.write():
+            if not self._index.trained and self.count() >= self.min_train_size:
+                self._rebuild_index()
+
+    def _search_hits(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        nprobe: int | None,
+        exact: bool,
+        query_text: str | None,
+        filter: SearchFilter,
+        with_vectors: bool = False,
+    ) -> List[Dict]:
+        allowed = self._filter_rows(filter) if filter else None
+        if query_text and self._lexical is not None:
+            rows, scores = self._hybrid_rows(
+                query_vector, query_text, top_k, nprobe=nprobe, exact=exact, rows=allowed
+            )
+        else:
+            rows, scores = self._top_rows(query_vector, top_k, nprobe=nprobe, exact=exact, rows=allowed)
+            rows, scores = rows.tolist(), scores.tolist()
+        hits = [
+            {"id": self.ids[row], "score": float(score), "payload": self.payloads[row]}
+            for row, score in zip(rows, scores)
+        ]
+        if with_vectors:
+            for hit, vector in zip(hits, np.array(self._matrix[rows])):
+                hit["vector"] = vector
+        return hits
+
+    @metrics.timed("vector_search_batch", store="memory")
+    def search_hits_many(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int = 5,
+        query_texts: List[str] | None = None,
+        filter: SearchFilter | None = None,
+    ) -> List[List[Dict]]:
+        """``search_hits`` for many queries at once, one hit list per query.
+
+        Exact searches score every query in one matrix-matrix product with a
+        row-wise ``argpartition``; with a trained IVF index or quantized codes
+        each query goes through ``search_hits``.
+        """
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if len(queries) == 0:
+            return []
+        if queries.ndim != 2:
+            raise ValueError("Expected a matrix of query vectors")
+        texts = query_texts or [None] * len(queries)
+        filter = validate_filter(filter)
+        self._ensure_index_trained()
+        with self._lock.read():
+            if self._codes is not None or (self._index is not None and self._index.trained):
+                return [
+                    self._search_hits(query, top_k, None, False, text, filter)
+                    for query, text in zip(queries, texts)
+                ]
+            hybrid = query_texts is not None and self._lexical is not None
+            return self._search_hits_many(queries, top_k, texts, hybrid, filter)
+
+    def _search_hits_many(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        texts: List[str | None],
+        hybrid: bool,
+        filter: SearchFilter,
+    ) -> List[List[Dict]]:
+        allowed = self._filter_rows(filter) if filter else None
+        depth = max(top_k, settings.hybrid_candidates) if hybrid else top_k
+        hits = []
+        for (rows, scores), text in zip(self._top_rows_many(queries, depth, rows=allowed), texts):
+            if hybrid and text:
+                rows, scores = self._fuse_rows(rows, text, top_k, allowed)
+            else:
+                rows, scores = rows[:top_k].tolist(), scores[:top_k].tolist()
+            hits.append([
+                {"id": self.ids[row], "score": float(score), "payload": self.payloads[row]}
+                for row, score in zip(rows, scores)
+            ])
+        return hits
+
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        query_text: str | None = None,
+        filter: SearchFilter | None = None,
+        with_vectors: bool = False,
+    ) -> Dict[str, List]:
+        """Search for most similar vectors using cosine similarity (fused with BM25 given ``query_text``).
+
+        ``with_vectors`` adds the chunks' ``vectors`` (for diversity re-ranking).
+        """
+        return self._format_hits(self.search_hits(
+            query_vector, top_k, query_text=query_text, filter=filter, with_vectors=with_vectors
+        ))
+
+    def search_many(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int = 5,
+        query_texts: List[str] | None = None,
+        filter: SearchFilter | None = None,
+    ) -> List[Dict[str, List]]:
+        """``search`` for many queries at once (see ``search_hits_many``)."""
+        return [
+            self._format_hits(hits)
+            for hits in self.search_hits_many(query_vectors, top_k, query_texts=query_texts, filter=filter)
+        ]
+
+    @staticmethod
+    def _format_hits(hits: List[Dict]) -> Dict[str, List]:
+        """Collect texts, distinct sources and chunk payloads (for context packing) from hits.
+
+        Hits carrying a ``vector`` also yield ``vectors``, aligned with ``chunks``.
+        """
         contexts = []
         sources = set()
-        
-        for idx in top_indices:
-            payload = self.payloads[idx]
+        chunks = []
+        vectors = []
+
+        for hit in hits:
+            payload = hit["payload"]
             text = payload.get("text", "")
             source = payload.get("source", "")
             if text:
                 contexts.append(text)
                 sources.add(source)
-        
-        return {"contexts": contexts, "sources": list(sources)}
-    
+                chunks.append(payload)
+                if "vector" in hit:
+                    vectors.append(hit["vector"])
+
+        found = {"contexts": contexts, "sources": list(sources), "chunks": chunks}
+        if vectors:
+            found["vectors"] = vectors
+        return found
+
     def clear(self):
         """Clear all stored vectors."""
-        self.vectors = []
-        self.payloads = []
-        self.ids = []
-    
+        with self._lock.write():
+            self._clear()
+
+    def _clear(self):
+        if self.persist_dir is not None:
+            old_paths = (self._vectors_path, self._records_path)
+            self.close()
+            self._matrix = None
+            for path in old_paths:
+                path.unlink(missing_ok=True)
+            self._generation += 1
+            (self.persist_dir / "CURRENT").write_text(str(self._generation))
+            self._records_path.touch()
+        self._reset_state()
+
+    def _new_codes(self) -> QuantizedCodes | None:
+        if (self.quantization == "none" and not self.prefix_dim) or self.dim is None:
+            return None
+        mode = "float32" if self.quantization == "none" else self.quantization
+        return QuantizedCodes(mode, self.dim, prefix_dim=self.prefix_dim)
+
+    def memory_stats(self) -> Dict[str, float]:
+        """Bytes per vector held in RAM for search versus float32 storage."""
+        float32_bytes = (self.dim or 0) * 4
+        resident = self._codes.bytes_per_vector if self._codes is not None else float32_bytes
+        return {
+            "vectors": self.count(),
+            "quantization": self.quantization,
+            "bytes_per_vector": resident,
+            "float32_bytes_per_vector": float32_bytes,
+            "compression": float32_bytes / resident if resident else 1.0,
+            "resident_bytes": resident * self.count(),
+        }
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes of RAM held by the store.
+
+        Counts the float32 matrix unless it is memory-mapped (persistent and
+        quantized stores), search codes, filter columns, ids, payloads and the
+        IVF and BM25 indexes.
+        """
+        total = 0 if isinstance(self._matrix, np.memmap) else self._matrix.nbytes
+        if self._codes is not None:
+            total += self._codes.codes.nbytes + self._codes.scales.nbytes
+        total += self._alive.nbytes + sum(column.nbytes for column in self._columns.values())
+        total += _ID_BYTES * len(self.ids) + self._payload_bytes
+        if self._index is not None:
+            total += self._index.memory_bytes()
+        if self._lexical is not None:
+            total += self._lexical.memory_bytes()
+        return total
+
+    def _reset_state(self):
+        self._matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+        self._codes = self._new_codes()
+        self._alive = np.zeros(0, dtype=bool)
+        self._id_to_row: Dict[str, int] = {}
+        self.ids: List[str | None] = []
+        self.payloads: List[Dict | None] = []
+        self._source_rows: Dict[str, set[int]] = {}
+        # Numeric payload fields by row, for filtered search
+        self._columns: Dict[str, np.ndarray] = {field: np.zeros(0) for field in NUMERIC_FIELDS}
+        self._payload_bytes = 0
+        self._size = 0
+        self._deleted = 0
+        if self._index is not None:
+            self._index.reset()
+        if self._lexical is not None:
+            self._lexical.clear()
+
     def count(self) -> int:
         """Return number of stored vectors."""
-        return len(self.vectors)
+        return self._size - self._deleted
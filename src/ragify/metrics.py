@@ -0,0 +1,217 @@
+"""Per-stage timings, counters and optional tracing spans.
+
+Every pipeline stage (PDF parsing, splitting, embedding, vector upserts and
+searches, context packing, LLM generation) is wrapped in ``metrics.stage``,
+which records a duration histogram and, with ``TRACING_ENABLED`` and
+OpenTelemetry installed, a span. Counters track items, tokens and cache
+lookups. ``render`` produces the Prometheus text format served on
+``/metrics``. With ``METRICS_ENABLED=false`` and tracing off, ``stage``
+returns a shared no-op context and the counters return immediately.
+"""
+import bisect
+import contextlib
+import functools
+import inspect
+import logging
+import math
+import threading
+import time
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Histogram upper bounds in seconds, from sub-millisecond searches to slow LLM calls
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_HELP = {
+    "ragify_stage_duration_seconds": ("histogram", "Time spent in each pipeline stage."),
+    "ragify_stage_errors_total": ("counter", "Stage executions that raised."),
+    "ragify_stage_items_total": ("counter", "Items processed per stage (pages, chunks, texts, points, queries)."),
+    "ragify_tokens_total": ("counter", "Tokens sent to or produced by models."),
+    "ragify_cache_requests_total": ("counter", "Cache lookups by cache and result (hit or miss)."),
+    "ragify_llm_first_token_seconds": ("histogram", "Time from LLM request to the first streamed token."),
+}
+
+_NOOP = contextlib.nullcontext()
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        # One slot per bound plus an overflow slot for values above the last
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(DURATION_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _StageTimer:
+    """Context manager recording one stage execution (and its span, if tracing)."""
+
+    __slots__ = ("_metrics", "_stage", "_labels", "_span", "_start")
+
+    def __init__(self, metrics: "Metrics", stage: str, labels: dict):
+        self._metrics = metrics
+        self._stage = stage
+        self._labels = labels
+        self._span = None
+
+    def __enter__(self):
+        if self._metrics.tracer is not None:
+            self._span = self._metrics.tracer.start_as_current_span(
+                f"ragify.{self._stage}", attributes=self._labels
+            )
+            self._span.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        labels = {"stage": self._stage, **self._labels}
+        self._metrics.observe("ragify_stage_duration_seconds", elapsed, **labels)
+        # GeneratorExit from an abandoned stream is not a failure
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self._metrics.inc("ragify_stage_errors_total", **labels)
+        if self._span is not None:
+            self._span.__exit__(exc_type, exc, tb)
+        return False
+
+
+class Metrics:
+    """Thread-safe registry of stage histograms and counters."""
+
+    def __init__(self, enabled: bool = True, tracing: bool = False):
+        self.enabled = enabled
+        self.tracer = None
+        if tracing:
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                logger.warning("TRACING_ENABLED is set but opentelemetry is not installed; spans are disabled")
+            else:
+                self.tracer = trace.get_tracer("ragify")
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop every recorded value."""
+        with self._lock:
+            self._histograms: dict[tuple[str, Labels], _Histogram] = {}
+            self._counters: dict[tuple[str, Labels], float] = {}
+
+    def stage(self, stage: str, **labels):
+        """Time a block as ``stage`` (``with metrics.stage("embed"): ...``)."""
+        if not self.enabled and self.tracer is None:
+            return _NOOP
+        return _StageTimer(self, stage, labels)
+
+    def timed(self, stage: str, **labels):
+        """Decorator form of ``stage`` for sync and async functions."""
+        def decorate(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.stage(stage, **labels):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Add a duration to histogram ``name``."""
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add ``value`` to counter ``name``."""
+        if not self.enabled or not value:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def items(self, stage: str, count: int, **labels):
+        """Count ``count`` items processed by ``stage``."""
+        self.inc("ragify_stage_items_total", count, stage=stage, **labels)
+
+    def cache_lookups(self, cache: str, hits: int, misses: int):
+        """Count hits and misses of ``cache``."""
+        self.inc("ragify_cache_requests_total", hits, cache=cache, result="hit")
+        self.inc("ragify_cache_requests_total", misses, cache=cache, result="miss")
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = {k: (list(h.buckets), h.sum, h.count) for k, h in self._histograms.items()}
+            counters = dict(self._counters)
+        lines = []
+        for name, (kind, help_text) in _HELP.items():
+            series = histograms if kind == "histogram" else counters
+            keys = sorted(k for k in series if k[0] == name)
+            if not keys:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key in keys:
+                labels = key[1]
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {series[key]}")
+                    continue
+                buckets, total, count = series[key]
+                cumulative = 0
+                for bound, n in zip(DURATION_BUCKETS, buckets):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Count, total and mean seconds per stage, for logs and ad-hoc inspection."""
+        stages: dict[str, tuple[int, float]] = {}
+        with self._lock:
+            for (name, labels), h in self._histograms.items():
+                if name == "ragify_stage_duration_seconds":
+                    stage = dict(labels).get("stage", "")
+                    count, total = stages.get(stage, (0, 0.0))
+                    stages[stage] = (count + h.count, total + h.sum)
+        return {
+            stage: {"count": count, "seconds": total, "mean_ms": 1000 * total / count if count else math.nan}
+            for stage, (count, total) in sorted(stages.items())
+        }
+
+
+# Process-wide registry used by every instrumented component
+metrics = Metrics(enabled=settings.metrics_enabled, tracing=settings.tracing_enabled)
@@ -0,0 +1,65 @@
+"""Maximal-marginal-relevance (MMR) re-ranking for diverse search results."""
+import numpy as np
+
+
+def mmr_select(candidates, relevance, top_k: int, lambda_mult: float = 0.5) -> list[int]:
+    """Indices of ``top_k`` candidates picked by maximal marginal relevance, in pick order.
+
+    Each pick maximizes ``lambda_mult * relevance[c] - (1 - lambda_mult) *
+    max(sim(c, picked))``, with ``relevance`` in [0, 1] and cosine
+    similarities between candidates. All candidate pairs are scored in one
+    matrix product up front; the greedy loop then only keeps a running
+    maximum per candidate.
+    """
+    vectors = np.asarray(candidates, dtype=np.float32)
+    if len(vectors) == 0 or top_k <= 0:
+        return []
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors = vectors / norms
+
+    relevance = lambda_mult * np.asarray(relevance, dtype=np.float32)
+    redundancy = (1 - lambda_mult) * (vectors @ vectors.T)
+    picked = [int(np.argmax(relevance))]
+    max_redundancy = redundancy[picked[0]].copy()
+    available = np.ones(len(vectors), dtype=bool)
+    available[picked[0]] = False
+    for _ in range(min(top_k, len(vectors)) - 1):
+        scores = np.where(available, relevance - max_redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(max_redundancy, redundancy[best], out=max_redundancy)
+    return picked
+
+
+def rank_relevance(n: int) -> np.ndarray:
+    """Relevance of ``n`` ranked hits, from 1.0 for the best down to 0.0 for the last."""
+    if n <= 1:
+        return np.ones(n, dtype=np.float32)
+    return 1.0 - np.arange(n, dtype=np.float32) / (n - 1)
+
+
+def mmr_rerank(found: dict[str, list], top_k: int, lambda_mult: float = 0.5) -> dict[str, list]:
+    """Keep the ``top_k`` most relevant yet mutually diverse chunks of a store result.
+
+    Relevance is the store's own ranking (see ``rank_relevance``), so hybrid
+    stores keep their fused dense and BM25 order and lexical-only hits are
+    not penalized for a low cosine. ``found`` must come from a search with
+    ``with_vectors=True``; results without ``vectors`` are cut to their
+    first ``top_k`` chunks.
+    """
+    chunks = found.get("chunks", [])
+    vectors = found.get("vectors")
+    if vectors is not None and len(vectors) == len(chunks):
+        picked = mmr_select(vectors, rank_relevance(len(chunks)), top_k, lambda_mult)
+    else:
+        picked = list(range(min(top_k, len(chunks))))
+    if not chunks:
+        return {"contexts": found["contexts"][:top_k], "sources": found["sources"], "chunks": []}
+    chunks = [chunks[i] for i in picked]
+    return {
+        "contexts": [chunk.get("text", "") for chunk in chunks],
+        "sources": list({chunk.get("source", "") for chunk in chunks}),
+        "chunks": chunks,
+    }
@@ -1,5 +1,9 @@
 """Pydantic models for RAGify."""
-from pydantic import BaseModel
+from typing import Any
+
+from pydantic import BaseModel, Field, field_validator
+
+from .filters import validate_filter
 
 
 class RAGChunkAndSrc(BaseModel):
@@ -11,6 +15,26 @@ class RAGChunkAndSrc(BaseModel):
 class RAGUpsertResult(BaseModel):
     """Result of upserting documents to vector store."""
     ingested: int
+    unchanged: int = 0
+    deleted: int = 0
+    skipped: bool = False
+
+
+class RAGIngestFailure(BaseModel):
+    """A document that could not be ingested."""
+    path: str
+    error: str
+
+
+class RAGBulkIngestResult(BaseModel):
+    """Result of ingesting many documents at once."""
+    documents: int
+    chunks: int
+    skipped: int = 0
+    failed: list[RAGIngestFailure]
+    seconds: float
+    docs_per_sec: float
+    chunks_per_sec: float
 
 
 class RAGSearchResult(BaseModel):
@@ -19,8 +43,43 @@ class RAGSearchResult(BaseModel):
     sources: list[str]
 
 
+class RAGQueryRequest(BaseModel):
+    """Question submitted to the direct query endpoints."""
+    question: str = Field(min_length=1)
+    top_k: int = Field(default=5, ge=1, le=50)
+    # Chunk metadata filter, e.g. {"source": "manual.pdf", "page": {"gte": 3}}
+    filter: dict[str, Any] | None = None
+    
+    @field_validator("filter")
+    @classmethod
+    def _check_filter(cls, value: dict[str, Any] | None) -> dict[str, Any] | None:
+        return validate_filter(value)
+
+
+class RAGBatchSearchRequest(BaseModel):
+    """Questions submitted to the bulk retrieval endpoint."""
+    questions: list[str] = Field(min_length=1, max_length=1000)
+    top_k: int = Field(default=5, ge=1, le=50)
+    filter: dict[str, Any] | None = None
+    
+    @field_validator("filter")
+    @classmethod
+    def _check_filter(cls, value: dict[str, Any] | None) -> dict[str, Any] | None:
+        return validate_filter(value)
+
+
+class RAGBatchSearchResult(BaseModel):
+    """Search results for each question of a batch, in order."""
+    results: list[RAGSearchResult]
+
+
 class RAGQueryResult(BaseModel):
     """Query result with answer and sources."""
     answer: str
     sources: list[str]
     num_contexts: int
+
+
+class RAGCachedAnswer(BaseModel):
+    """Answer-cache lookup result; ``result`` is None on a miss."""
+    result: RAGQueryResult | None = None
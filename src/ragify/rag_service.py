@@ -1,11 +1,40 @@
 """RAG service orchestrating document processing and querying."""
+import glob
+import multiprocessing
+import os
+import threading
+import time
 import uuid
-from typing import Protocol
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Protocol
 
+from .answer_cache import SemanticAnswerCache, corpus_scope
 from .config import settings
-from .models import RAGChunkAndSrc, RAGUpsertResult, RAGSearchResult
-from .document_processor import DocumentLoader, EmbeddingService
-from .vector_store import VectorStore
+from .context_packing import pack_chunks
+from .models import (
+    RAGBulkIngestResult,
+    RAGChunkAndSrc,
+    RAGIngestFailure,
+    RAGQueryResult,
+    RAGSearchResult,
+    RAGUpsertResult,
+)
+from .document_processor import DocumentLoader, chunk_pdf_file, init_chunk_worker
+from .embedding_backends import EmbeddingBackend, create_embedding_service
+from .filters import SearchFilter
+from .ingest_pipeline import ChunkRecord, IngestPipeline, IngestProgress, ProgressCallback
+from .manifest import IngestManifest, chunk_sha256, file_sha256
+from .metrics import metrics
+from .mmr import mmr_rerank
+
+if TYPE_CHECKING:
+    from .vector_store import VectorStore
+
+
+# Number of recent question embeddings kept by RAGService.embed_query
+_QUERY_VECTOR_MEMO = 256
 
 
 class LLMAdapter(Protocol):
@@ -21,51 +50,452 @@ class RAGService:
     def __init__(
         self,
         document_loader: DocumentLoader | None = None,
-        embedding_service: EmbeddingService | None = None,
-        vector_store: VectorStore | None = None
+        embedding_service: EmbeddingBackend | None = None,
+        vector_store: "VectorStore | None" = None,
+        manifest: IngestManifest | None = None,
+        answer_cache: SemanticAnswerCache | None = None
     ):
         self.document_loader = document_loader or DocumentLoader()
-        self.embedding_service = embedding_service or EmbeddingService()
-        self.vector_store = vector_store or VectorStore()
+        self.embedding_service = embedding_service or create_embedding_service()
+        if vector_store is None:
+            # qdrant_client is imported only when the Qdrant store is used
+            from .vector_store import VectorStore
+            vector_store = VectorStore()
+        self.vector_store = vector_store
+        self.manifest = manifest or IngestManifest(settings.manifest_path)
+        if answer_cache is None and settings.answer_cache_enabled:
+            answer_cache = SemanticAnswerCache(
+                threshold=settings.answer_cache_threshold,
+                ttl_seconds=settings.answer_cache_ttl_seconds,
+                max_entries=settings.answer_cache_max_entries,
+            )
+        self.answer_cache = answer_cache
+        # Recent question -> embedding, so a question is embedded once per lookup/store
+        self._query_vectors: OrderedDict[str, list[float]] = OrderedDict()
+        self._query_vectors_lock = threading.Lock()
     
-    def ingest_document(self, pdf_path: str, source_id: str | None = None) -> RAGUpsertResult:
-        """Load, chunk, embed, and store a PDF document."""
+    @staticmethod
+    def chunk_id(source_id: str, index: int) -> str:
+        """Deterministic vector-store id for a document's ``index``-th chunk."""
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source_id}:{index}"))
+    
+    def _changed_records(
+        self,
+        source_id: str,
+        chunks: Iterable[tuple[int, str]],
+        chunk_hashes: list[str],
+    ) -> Iterator[ChunkRecord]:
+        """Yield records for chunks whose content differs from the manifest.
+        
+        Every chunk's hash is appended to ``chunk_hashes`` as it streams past.
+        Payloads carry the page, chunk index and ingest time for filtering.
+        """
+        entry = self.manifest.get(source_id)
+        previous = entry["chunks"] if entry else []
+        ingested_at = time.time()
+        for i, (page, text) in enumerate(chunks):
+            content_hash = chunk_sha256(text)
+            chunk_hashes.append(content_hash)
+            if i < len(previous) and previous[i] == content_hash:
+                continue
+            yield ChunkRecord(
+                id=self.chunk_id(source_id, i),
+                text=text,
+                payload={
+                    "source": source_id,
+                    "text": text,
+                    "page": page,
+                    "chunk_index": i,
+                    "ingested_at": ingested_at,
+                },
+            )
+    
+    def _stored_entry(self, source_id: str) -> dict | None:
+        """The manifest entry for ``source_id`` if the store still holds its chunks.
+        
+        An entry whose chunks are missing (a non-persistent store restarted
+        under a persistent manifest, or chunks deleted behind its back) is
+        forgotten, so the document is re-ingested in full.
+        """
+        entry = self.manifest.get(source_id)
+        if entry is None or self.vector_store.count_source(source_id) >= len(entry["chunks"]):
+            return entry
+        self.manifest.remove(source_id)
+        return None
+    
+    def _finish_document(self, source_id: str, file_hash: str, chunk_hashes: list[str]) -> int:
+        """Delete chunk ids that no longer exist and record the new fingerprints."""
+        entry = self.manifest.get(source_id)
+        if entry is None:
+            # Unknown to the manifest: clear anything left from earlier runs
+            keep = [self.chunk_id(source_id, i) for i in range(len(chunk_hashes))]
+            deleted = self.vector_store.delete_by_source(source_id, keep_ids=keep)
+        else:
+            stale = [
+                self.chunk_id(source_id, i)
+                for i in range(len(chunk_hashes), len(entry["chunks"]))
+            ]
+            deleted = self.vector_store.delete(stale)
+        self.manifest.set(source_id, file_hash, chunk_hashes)
+        return deleted
+    
+    @metrics.timed("ingest")
+    def ingest_document(
+        self,
+        pdf_path: str,
+        source_id: str | None = None,
+        on_progress: ProgressCallback | None = None,
+    ) -> RAGUpsertResult:
+        """Load, chunk, embed, and store a PDF document.
+        
+        Pages stream through parsing, embedding and upserts concurrently, so
+        early chunks become searchable while later pages are still parsed.
+        Documents whose file hash matches the manifest (and whose chunks the
+        store still holds) are skipped; otherwise only chunks with changed
+        content are re-embedded and chunks past the new end of the document
+        are deleted.
+        """
         source_id = source_id or pdf_path
+        file_hash = file_sha256(pdf_path)
+        entry = self._stored_entry(source_id)
+        if entry is not None and entry["file_hash"] == file_hash:
+            return RAGUpsertResult(ingested=0, unchanged=len(entry["chunks"]), skipped=True)
         
-        # Load and chunk
-        chunks = self.document_loader.load_and_chunk_pdf(pdf_path)
+        progress = IngestProgress(
+            source_id=source_id,
+            pages_total=self.document_loader.page_count(pdf_path),
+        )
+        
+        def pages() -> Iterator[tuple[int, str]]:
+            for page, text in self.document_loader.iter_chunks(pdf_path):
+                progress.pages_done = page
+                yield page, text
+            progress.pages_done = progress.pages_total or progress.pages_done
+        
+        chunk_hashes: list[str] = []
+        pipeline = IngestPipeline(self.embedding_service, self.vector_store)
+        ingested = pipeline.run(
+            self._changed_records(source_id, pages(), chunk_hashes),
+            progress,
+            on_progress,
+        )
+        deleted = self._finish_document(source_id, file_hash, chunk_hashes)
+        return RAGUpsertResult(
+            ingested=ingested,
+            unchanged=len(chunk_hashes) - ingested,
+            deleted=deleted,
+        )
+    
+    def delete_source(self, source_id: str) -> int:
+        """Remove a document's vectors and manifest entry. Returns vectors deleted."""
+        deleted = self.vector_store.delete_by_source(source_id)
+        self.manifest.remove(source_id)
+        return deleted
+    
+    @staticmethod
+    def _resolve_pdfs(path_or_glob: str) -> list[tuple[Path, str]]:
+        """Expand a directory or glob into ``(path, source_id)`` pairs."""
+        root = Path(path_or_glob)
+        if root.is_dir():
+            files = sorted(p for p in root.rglob("*") if p.suffix.lower() == ".pdf")
+            return [(p, p.relative_to(root).as_posix()) for p in files]
+        files = sorted(Path(p) for p in glob.glob(path_or_glob, recursive=True))
+        return [(p, p.as_posix()) for p in files if p.is_file()]
+    
+    def _parsed_documents(
+        self,
+        files: list[tuple[Path, str]],
+        workers: int,
+    ) -> Iterator[tuple[str, tuple[str, list[tuple[int, str]] | None] | BaseException]]:
+        """Parse PDFs in a process pool, yielding results as they complete.
+        
+        Each result is ``(file_hash, chunks)``; ``chunks`` is None when the
+        file is unchanged since its manifest entry. At most ``2 * workers`` files are in flight so parsed chunks never
+        pile up faster than the embedding stage drains them.
+        """
+        # spawn: the pool is started from a pipeline thread, where fork is unsafe
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_chunk_worker,
+            initargs=(self.document_loader.chunk_size, self.document_loader.chunk_overlap),
+        ) as pool:
+            queued = iter(files)
+            pending: dict[Future, str] = {}
+            
+            def submit_next():
+                item = next(queued, None)
+                if item is not None:
+                    path, source_id = item
+                    entry = self._stored_entry(source_id)
+                    known_hash = entry["file_hash"] if entry else None
+                    pending[pool.submit(chunk_pdf_file, str(path), known_hash)] = source_id
+            
+            for _ in range(2 * workers):
+                submit_next()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source_id = pending.pop(future)
+                    submit_next()
+                    error = future.exception()
+                    yield source_id, error if error is not None else future.result()
+    
+    @metrics.timed("ingest_directory")
+    def ingest_directory(
+        self,
+        path_or_glob: str,
+        workers: int | None = None,
+        on_progress: ProgressCallback | None = None,
+    ) -> RAGBulkIngestResult:
+        """Ingest every PDF under a directory (recursively) or matching a glob.
         
-        # Generate embeddings
-        vectors = self.embedding_service.embed_texts(chunks)
+        CPU-bound parsing and sentence splitting run in a process pool while
+        chunks from all documents share one batched embedding and upsert
+        pipeline. Files that fail to parse, embed or store are reported and
+        skipped (a failed batch is retried one document at a time), as are
+        files unchanged since they were last ingested. Manifest entries
+        are written for every document whose chunks were all stored, even
+        when the run is interrupted, so those are not re-embedded next time.
+        """
+        files = self._resolve_pdfs(path_or_glob)
+        workers = workers or os.cpu_count() or 1
+        progress = IngestProgress(source_id=path_or_glob, documents_total=len(files))
+        failures: dict[str, str] = {}
+        finished: list[tuple[str, str, list[str]]] = []
+        # Chunks of each document yielded to the pipeline but not yet stored
+        outstanding: dict[str, int] = {}
+        lock = threading.Lock()
+        skipped = 0
         
-        # Create IDs and payloads
-        ids = [
-            str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source_id}:{i}"))
-            for i in range(len(chunks))
-        ]
-        payloads = [
-            {"source": source_id, "text": chunks[i]}
-            for i in range(len(chunks))
-        ]
+        def record_failure(source_id: str, error: BaseException):
+            with lock:
+                if source_id in failures:
+                    return
+                failures[source_id] = f"{type(error).__name__}: {error}"
+                progress.documents_failed += 1
         
-        # Upsert to vector store
-        self.vector_store.upsert(ids, vectors, payloads)
+        def records() -> Iterator[ChunkRecord]:
+            nonlocal skipped
+            documents = self._parsed_documents(files, workers)
+            try:
+                for source_id, parsed in documents:
+                    if isinstance(parsed, BaseException):
+                        record_failure(source_id, parsed)
+                        continue
+                    file_hash, chunks = parsed
+                    if chunks is not None:
+                        chunk_hashes: list[str] = []
+                        for record in self._changed_records(source_id, chunks, chunk_hashes):
+                            with lock:
+                                outstanding[source_id] = outstanding.get(source_id, 0) + 1
+                            yield record
+                        finished.append((source_id, file_hash, chunk_hashes))
+                    else:
+                        skipped += 1
+                    progress.documents_done += 1
+            finally:
+                # Shuts the process pool down even when the run stops early
+                documents.close()
         
-        return RAGUpsertResult(ingested=len(chunks))
+        def on_stored(batch: list[ChunkRecord]):
+            with lock:
+                for record in batch:
+                    outstanding[record.payload["source"]] -= 1
+        
+        def on_error(batch: list[ChunkRecord], error: Exception):
+            # Batches are retried per document first, so this is one document's chunks
+            for source_id in {record.payload["source"] for record in batch}:
+                record_failure(source_id, error)
+        
+        start = time.perf_counter()
+        # Bulk load: upserts are not waited on individually, only flushed at the end
+        pipeline = IngestPipeline(self.embedding_service, self.vector_store, wait=False)
+        chunks = 0
+        try:
+            if files:
+                chunks = pipeline.run(
+                    records(), progress, on_progress, on_stored, on_error,
+                    group_key=lambda record: record.payload["source"],
+                )
+        finally:
+            self.vector_store.flush()
+            # Manifest entries are only written once every chunk of the file is stored
+            ingested = [
+                item for item in finished
+                if item[0] not in failures and not outstanding.get(item[0])
+            ]
+            for source_id, file_hash, chunk_hashes in ingested:
+                self._finish_document(source_id, file_hash, chunk_hashes)
+        seconds = time.perf_counter() - start
+        return RAGBulkIngestResult(
+            documents=len(ingested),
+            chunks=chunks,
+            skipped=skipped,
+            failed=[RAGIngestFailure(path=path, error=error) for path, error in failures.items()],
+            seconds=seconds,
+            docs_per_sec=len(ingested) / seconds if seconds else 0.0,
+            chunks_per_sec=chunks / seconds if seconds else 0.0,
+        )
+    
+    def embed_query(self, question: str) -> list[float]:
+        """Embed a question, reusing the vector for recently seen questions."""
+        with self._query_vectors_lock:
+            vector = self._query_vectors.get(question)
+            if vector is not None:
+                self._query_vectors.move_to_end(question)
+                metrics.cache_lookups("query_vector", 1, 0)
+                return vector
+        metrics.cache_lookups("query_vector", 0, 1)
+        vector = self.embedding_service.embed_texts([question])[0]
+        with self._query_vectors_lock:
+            self._query_vectors[question] = vector
+            if len(self._query_vectors) > _QUERY_VECTOR_MEMO:
+                self._query_vectors.popitem(last=False)
+        return vector
     
-    def search_context(self, question: str, top_k: int = 5) -> RAGSearchResult:
-        """Search for relevant context given a question."""
-        # Embed the question
-        query_vector = self.embedding_service.embed_texts([question])[0]
+    def search_context(
+        self,
+        question: str,
+        top_k: int = 5,
+        filter: SearchFilter | None = None,
+        mmr: bool | None = None,
+    ) -> RAGSearchResult:
+        """Search for relevant context given a question.
         
-        # Search vector store
-        found = self.vector_store.search(query_vector, top_k)
+        ``filter`` restricts the search to chunks whose metadata matches,
+        e.g. ``{"source": "manual.pdf", "page": {"gte": 10}}`` (see ``ragify.filters``).
+        ``mmr`` (default ``MMR_ENABLED``) re-ranks over-fetched candidates for
+        diversity, so near-duplicate chunks do not crowd out other passages.
+        """
+        return self.search_by_vector(
+            self.embed_query(question), top_k, query_text=question, filter=filter, mmr=mmr
+        )
+    
+    @metrics.timed("retrieve_batch")
+    def search_context_batch(
+        self,
+        questions: list[str],
+        top_k: int = 5,
+        filter: SearchFilter | None = None,
+    ) -> list[RAGSearchResult]:
+        """Search for context for many questions, one result per question.
         
-        return RAGSearchResult(
-            contexts=found["contexts"],
-            sources=found["sources"]
+        Questions not embedded recently are embedded together in batched
+        requests, and the store searches them all in one pass.
+        """
+        with self._query_vectors_lock:
+            vectors = {q: self._query_vectors[q] for q in questions if q in self._query_vectors}
+        missing = list(dict.fromkeys(q for q in questions if q not in vectors))
+        if missing:
+            vectors.update(zip(missing, self.embedding_service.embed_texts(missing)))
+            with self._query_vectors_lock:
+                for question in missing[-_QUERY_VECTOR_MEMO:]:
+                    self._query_vectors[question] = vectors[question]
+                while len(self._query_vectors) > _QUERY_VECTOR_MEMO:
+                    self._query_vectors.popitem(last=False)
+        return self.search_many_by_vector(
+            [vectors[q] for q in questions], top_k, query_texts=questions, filter=filter
         )
     
+    @metrics.timed("retrieve")
+    def search_by_vector(
+        self,
+        query_vector: list[float],
+        top_k: int = 5,
+        query_text: str | None = None,
+        filter: SearchFilter | None = None,
+        mmr: bool | None = None,
+    ) -> RAGSearchResult:
+        """Search for relevant context given an embedded question.
+        
+        Stores with a lexical index fuse BM25 ranks for ``query_text``. With
+        ``mmr`` (default ``MMR_ENABLED``) ``top_k * MMR_CANDIDATE_FACTOR``
+        candidates are fetched with their vectors and ``top_k`` of them kept
+        by maximal marginal relevance (see ``ragify.mmr``).
+        """
+        if settings.mmr_enabled if mmr is None else mmr:
+            found = self.vector_store.search(
+                query_vector, top_k * settings.mmr_candidate_factor,
+                query_text=query_text, filter=filter, with_vectors=True,
+            )
+            return self.search_result(self.diversify(found, top_k))
+        found = self.vector_store.search(query_vector, top_k, query_text=query_text, filter=filter)
+        return self.search_result(found)
+    
+    @staticmethod
+    def diversify(found: dict[str, list], top_k: int) -> dict[str, list]:
+        """MMR re-ranking of a store result fetched with ``with_vectors=True``."""
+        with metrics.stage("mmr"):
+            diverse = mmr_rerank(found, top_k, settings.mmr_lambda)
+        metrics.items("mmr", len(found.get("chunks", [])))
+        return diverse
+    
+    def search_many_by_vector(
+        self,
+        query_vectors: list[list[float]],
+        top_k: int = 5,
+        query_texts: list[str] | None = None,
+        filter: SearchFilter | None = None,
+    ) -> list[RAGSearchResult]:
+        """Search for several embedded questions at once, one result per question.
+        
+        Stores with ``search_many`` answer every question in one request.
+        """
+        if hasattr(self.vector_store, "search_many"):
+            found = self.vector_store.search_many(query_vectors, top_k, query_texts=query_texts, filter=filter)
+        else:
+            found = [
+                self.vector_store.search(
+                    query_vector, top_k, query_text=query_texts[i] if query_texts else None, filter=filter
+                )
+                for i, query_vector in enumerate(query_vectors)
+            ]
+        return [self.search_result(f) for f in found]
+    
+    @staticmethod
+    def search_result(found: dict[str, list]) -> RAGSearchResult:
+        """Build a search result from a store's hits, packing chunks into the context budget.
+        
+        Overlapping and adjacent chunks of a source are merged and duplicates
+        dropped (see ``ragify.context_packing``); stores that do not return
+        chunk payloads keep their contexts as they are. Sources are those of
+        the chunks that made it into the contexts.
+        """
+        contexts, sources = found["contexts"], found["sources"]
+        if settings.context_packing and found.get("chunks"):
+            with metrics.stage("context_pack"):
+                contexts, sources = pack_chunks(found["chunks"], settings.context_max_tokens)
+            metrics.items("context_pack", len(found["chunks"]))
+        return RAGSearchResult(contexts=contexts, sources=sources)
+    
+    def answer_scope(self, top_k: int, filter: SearchFilter | None = None) -> str:
+        """Answer-cache scope for the current set of ingested document versions."""
+        return corpus_scope(self.manifest.sources(), top_k=top_k, filter=filter or None)
+    
+    def lookup_answer(
+        self,
+        query_vector: list[float],
+        top_k: int,
+        filter: SearchFilter | None = None,
+    ) -> RAGQueryResult | None:
+        """Return a cached answer for a near-duplicate question, if any."""
+        if self.answer_cache is None:
+            return None
+        cached = self.answer_cache.lookup(query_vector, self.answer_scope(top_k, filter))
+        return RAGQueryResult(**cached) if cached is not None else None
+    
+    def store_answer(
+        self,
+        query_vector: list[float],
+        top_k: int,
+        result: RAGQueryResult,
+        filter: SearchFilter | None = None,
+    ):
+        """Cache a generated answer for later near-duplicate questions."""
+        if self.answer_cache is not None:
+            self.answer_cache.store(query_vector, self.answer_scope(top_k, filter), result.model_dump())
+    
     @staticmethod
     def build_prompt(question: str, contexts: list[str]) -> str:
         """Build a prompt for the LLM given question and contexts."""
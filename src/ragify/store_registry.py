@@ -0,0 +1,265 @@
+"""Per-session (or per-tenant) vector stores under a shared memory budget."""
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator
+
+from .config import settings
+from .manifest import IngestManifest
+from .memory_vector_store import InMemoryVectorStore
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between sweeps for expired stores
+_SWEEP_INTERVAL = 600.0
+
+# Suffix of store directories renamed for deletion
+_DELETED = ".deleted"
+
+
+@dataclass
+class TenantStore:
+    """One key's vector store and the manifest of documents ingested into it."""
+
+    store: InMemoryVectorStore
+    manifest: IngestManifest
+    # RAM measured when the entry was last released
+    nbytes: int = 0
+    # Callers currently inside ``StoreRegistry.use``; pinned entries are never evicted
+    pins: int = 0
+    last_used: float = field(default_factory=time.time)
+
+
+class StoreRegistry:
+    """Isolated ``InMemoryVectorStore`` per key, evicted least-recently-used first.
+
+    Each key (a tenant, a user, a browser session) gets its own store and
+    manifest, so documents never leak between keys. With ``store_dir`` the
+    store is persistent (``persist_dir``) in a per-key directory with its
+    manifest next to it, so documents survive eviction and restarts;
+    without it evicted documents are dropped and must be uploaded again.
+
+    Entries are measured with ``InMemoryVectorStore.memory_bytes`` when
+    released by ``use``; while the total exceeds ``budget_bytes`` the least
+    recently used unpinned entries are closed, except the most recent one.
+    Opening and closing stores happens outside the registry lock, so other
+    keys are never stalled by disk I/O; a key being opened or closed is
+    marked busy and its callers wait for that to finish.
+
+    With ``ttl_seconds`` keys unused for that long are deleted, in RAM and
+    on disk, by ``expire`` (run from ``use`` at most every ten minutes).
+    """
+
+    def __init__(
+        self,
+        budget_bytes: int | None = None,
+        store_dir: str | Path | None = None,
+        ttl_seconds: float | None = None,
+        store_factory: Callable[..., InMemoryVectorStore] = InMemoryVectorStore,
+    ):
+        self.budget_bytes = budget_bytes or settings.store_memory_budget_mb * 1024 * 1024
+        if store_dir is None:
+            store_dir = settings.store_dir or (
+                Path(settings.vector_store_dir) / "sessions" if settings.vector_store_dir else None
+            )
+        self.store_dir = Path(store_dir) if store_dir else None
+        if ttl_seconds is None:
+            ttl_seconds = settings.store_ttl_hours * 3600
+        self.ttl_seconds = ttl_seconds
+        self.store_factory = store_factory
+        self._entries: OrderedDict[str, TenantStore] = OrderedDict()
+        # Keys whose store is being opened, closed or deleted outside the lock
+        self._busy: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.time() + min(_SWEEP_INTERVAL, ttl_seconds or _SWEEP_INTERVAL)
+        self.evictions = 0
+        self.reloads = 0
+        self.expired = 0
+
+    def _store_path(self, key: str) -> Path | None:
+        if self.store_dir is None:
+            return None
+        return self.store_dir / hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+    def _open(self, key: str) -> TenantStore:
+        """Open ``key``'s persistent store (creating it), or an empty in-memory one."""
+        path = self._store_path(key)
+        if path is None:
+            return TenantStore(self.store_factory(), IngestManifest())
+        if (path / "CURRENT").exists():
+            self.reloads += 1
+        return TenantStore(self.store_factory(persist_dir=path), IngestManifest(path / "manifest.json"))
+
+    def _acquire(self, key: str) -> TenantStore:
+        """Pin ``key``'s entry, opening its store outside the lock if it is not resident."""
+        while True:
+            with self._lock:
+                busy = self._busy.get(key)
+                if busy is None:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        self._entries.move_to_end(key)
+                        entry.pins += 1
+                        return entry
+                    busy = self._busy[key] = threading.Event()
+                    break
+            # Another caller is opening or closing this key's store
+            busy.wait()
+        try:
+            entry = self._open(key)
+            entry.pins = 1
+            with self._lock:
+                self._entries[key] = entry
+            return entry
+        finally:
+            with self._lock:
+                del self._busy[key]
+            busy.set()
+
+    @contextmanager
+    def use(self, key: str) -> Iterator[TenantStore]:
+        """Pin ``key``'s store (opening or creating it) for the duration of the block.
+
+        On exit the store is re-measured and the budget enforced, so writes
+        made inside the block count towards it.
+        """
+        if self.ttl_seconds and time.time() >= self._next_sweep:
+            self.expire()
+        entry = self._acquire(key)
+        try:
+            yield entry
+        finally:
+            nbytes = entry.store.memory_bytes()
+            path = self._store_path(key)
+            if path is not None and path.exists():
+                # Directory mtime records the last use, for expiry after restarts
+                os.utime(path)
+            with self._lock:
+                entry.pins -= 1
+                entry.nbytes = nbytes
+                entry.last_used = time.time()
+                victims = self._over_budget()
+            self._close(victims)
+
+    def _take(self, key: str) -> tuple[str, TenantStore, threading.Event]:
+        """Remove a resident entry and mark its key busy; the caller holds the lock."""
+        busy = self._busy[key] = threading.Event()
+        return key, self._entries.pop(key), busy
+
+    def _over_budget(self) -> list[tuple[str, TenantStore, threading.Event]]:
+        """Take the least recently used unpinned entries until the budget holds."""
+        used = sum(entry.nbytes for entry in self._entries.values())
+        victims = []
+        # The most recent entry is kept even when it alone exceeds the budget
+        for key in list(self._entries)[:-1]:
+            if used <= self.budget_bytes:
+                break
+            entry = self._entries[key]
+            if entry.pins:
+                continue
+            used -= entry.nbytes
+            victims.append(self._take(key))
+        if used > self.budget_bytes:
+            logger.warning(
+                "Vector stores use %d bytes, over the %d byte budget, with nothing left to evict",
+                used, self.budget_bytes,
+            )
+        return victims
+
+    def _close(self, victims: list[tuple[str, TenantStore, threading.Event]], delete: bool = False):
+        """Close taken entries (and with ``delete`` remove their files), then clear their busy marks."""
+        for key, entry, busy in victims:
+            try:
+                entry.store.close()
+                path = self._store_path(key)
+                if delete:
+                    if path is not None:
+                        shutil.rmtree(path, ignore_errors=True)
+                else:
+                    self.evictions += 1
+                    logger.info("Evicted vector store %s (%d bytes)", key, entry.nbytes)
+            except Exception:
+                # Keep going: every taken key must be released below
+                logger.exception("Failed to close vector store %s", key)
+            finally:
+                with self._lock:
+                    del self._busy[key]
+                busy.set()
+
+    def _trash(self, path: Path) -> Path:
+        """Rename a store directory out of the way; the caller holds the lock.
+
+        A concurrent ``use`` of the key then starts a fresh store while the
+        renamed directory is deleted outside the lock.
+        """
+        return path.rename(path.with_name(f"{path.name}.{uuid.uuid4().hex}{_DELETED}"))
+
+    def drop(self, key: str):
+        """Forget ``key``'s store, including its files on disk."""
+        victims, trash = [], []
+        while True:
+            with self._lock:
+                busy = self._busy.get(key)
+                if busy is None:
+                    path = self._store_path(key)
+                    if key in self._entries:
+                        victims.append(self._take(key))
+                    elif path is not None and path.exists():
+                        trash.append(self._trash(path))
+                    break
+            busy.wait()
+        self._close(victims, delete=True)
+        for path in trash:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def expire(self) -> int:
+        """Delete stores unused for ``ttl_seconds``, resident or on disk. Returns how many."""
+        if not self.ttl_seconds:
+            return 0
+        now = time.time()
+        cutoff = now - self.ttl_seconds
+        trash, leftovers = [], []
+        with self._lock:
+            self._next_sweep = now + min(_SWEEP_INTERVAL, self.ttl_seconds)
+            victims = [
+                self._take(key)
+                for key, entry in list(self._entries.items())
+                if not entry.pins and entry.last_used < cutoff
+            ]
+            if self.store_dir is not None and self.store_dir.exists():
+                live = {self._store_path(key).name for key in [*self._entries, *self._busy]}
+                for path in self.store_dir.iterdir():
+                    if path.name.endswith(_DELETED):
+                        # Left behind by an interrupted delete
+                        leftovers.append(path)
+                    elif path.is_dir() and path.name not in live and path.stat().st_mtime < cutoff:
+                        trash.append(self._trash(path))
+        self._close(victims, delete=True)
+        for path in trash + leftovers:
+            shutil.rmtree(path, ignore_errors=True)
+        expired = len(victims) + len(trash)
+        self.expired += expired
+        if expired:
+            logger.info("Expired %d vector stores unused for %.0f s", expired, self.ttl_seconds)
+        return expired
+
+    def stats(self) -> dict:
+        """Budget, bytes per resident store and eviction counters."""
+        with self._lock:
+            stores = {key: entry.nbytes for key, entry in self._entries.items()}
+        return {
+            "budget_bytes": self.budget_bytes,
+            "used_bytes": sum(stores.values()),
+            "stores": stores,
+            "evictions": self.evictions,
+            "reloads": self.reloads,
+            "expired": self.expired,
+        }
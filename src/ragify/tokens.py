@@ -0,0 +1,27 @@
+"""Token counting helpers."""
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    """Return a tiktoken encoding for ``model``, or None when unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # Encodings are downloaded on first use; offline hosts fall back
+            return None
+
+
+def count_tokens(text: str, model: str = "text-embedding-3-large") -> int:
+    """Count tokens in ``text``, estimating ~3 characters per token without tiktoken."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 3 + 1
+    return len(encoding.encode(text, disallowed_special=()))
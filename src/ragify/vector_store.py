@@ -1,66 +1,566 @@
 """Vector database operations using Qdrant."""
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HasIdCondition,
+    MatchAny,
+    MatchValue,
+    PayloadSchemaType,
+    PointIdsList,
+    PointStruct,
+    Prefetch,
+    QueryRequest,
+    Range,
+    VectorParams,
+)
 
 from .config import settings
+from .dimensions import check_dim, truncate
+from .filters import NUMERIC_FIELDS, SearchFilter, payload_matches, validate_filter
+from .lexical_index import BM25Index, reciprocal_rank_fusion
+from .metrics import metrics
+
+# Points fetched per page when scrolling the collection
+_SCROLL_PAGE = 1024
+
+# Matches no point: flush deletes by it as an update barrier on every shard
+_FLUSH_BARRIER = Filter(must=[FieldCondition(key="__ragify_flush__", match=MatchValue(value=True))])
+
+# Payload indexes created with the collection, so filters never scan payloads
+_PAYLOAD_INDEXES = {
+    "source": PayloadSchemaType.KEYWORD,
+    "page": PayloadSchemaType.INTEGER,
+    "chunk_index": PayloadSchemaType.INTEGER,
+    "ingested_at": PayloadSchemaType.FLOAT,
+}
+
+# Extra BM25 hits fetched per wanted hit when a filter may discard some
+_FILTERED_LEXICAL_OVERSAMPLE = 4
+
+
+def _check_prefix_dim(prefix_dim: int | None, dim: int):
+    if prefix_dim is not None and not 0 < prefix_dim < dim:
+        raise ValueError(f"Prefix dimension {prefix_dim} must be between 1 and {dim - 1}")
+
+
+def qdrant_filter(filter: SearchFilter | None) -> Filter | None:
+    """Translate a ``ragify.filters`` filter into a Qdrant ``Filter``."""
+    filter = validate_filter(filter)
+    if filter is None:
+        return None
+    must = []
+    for field, condition in filter.items():
+        if isinstance(condition, dict):
+            must.append(FieldCondition(key=field, range=Range(**condition)))
+        elif field in NUMERIC_FIELDS:
+            # Qdrant matches only strings and integers; numbers (e.g. 2.0 from a
+            # JSON client, float timestamps) are compared as closed ranges instead
+            values = condition if isinstance(condition, list) else [condition]
+            points = [FieldCondition(key=field, range=Range(gte=v, lte=v)) for v in values]
+            must.append(points[0] if len(points) == 1 else Filter(should=points))
+        elif isinstance(condition, list):
+            must.append(FieldCondition(key=field, match=MatchAny(any=condition)))
+        else:
+            must.append(FieldCondition(key=field, match=MatchValue(value=condition)))
+    return Filter(must=must)
+
+
+def _dense_query(
+    query_vector: list[float],
+    limit: int,
+    prefix_dim: int | None,
+    query_filter: Filter | None = None,
+) -> dict:
+    """``query_points`` arguments for a dense search.
+    
+    With ``prefix_dim`` the collection has named "prefix" and "full"
+    vectors: Qdrant prefetches ``limit * RESCORE_FACTOR`` candidates on the
+    short prefix and reranks them on the full vector in one request.
+    """
+    if prefix_dim is None:
+        return {"query": query_vector, "limit": limit, "query_filter": query_filter}
+    return {
+        "prefetch": Prefetch(
+            query=truncate(query_vector, prefix_dim).tolist(),
+            using="prefix",
+            limit=limit * settings.rescore_factor,
+            filter=query_filter,
+        ),
+        "query": query_vector,
+        "using": "full",
+        "limit": limit,
+        "query_filter": query_filter,
+    }
+
+
+def _dense_request(
+    query_vector: list[float],
+    limit: int,
+    prefix_dim: int | None,
+    query_filter: Filter | None = None,
+) -> QueryRequest:
+    """``_dense_query`` as a ``QueryRequest`` for ``query_batch_points``."""
+    args = _dense_query(query_vector, limit, prefix_dim, query_filter)
+    args["filter"] = args.pop("query_filter")
+    return QueryRequest(with_payload=True, **args)
+
+
+def _vectors_selector(prefix_dim: int | None, with_vectors: bool) -> bool | list[str]:
+    """``with_vectors`` argument returning each point's full vector, if requested."""
+    if not with_vectors:
+        return False
+    return ["full"] if prefix_dim is not None else True
+
+
+def _format_results(results) -> dict[str, list]:
+    """Collect texts, distinct sources and chunk payloads (for context packing) from scored points.
+    
+    Points fetched with their vectors also yield ``vectors``, aligned with ``chunks``.
+    """
+    contexts = []
+    sources = set()
+    chunks = []
+    vectors = []
+    
+    for r in results:
+        payload = getattr(r, "payload", None) or {}
+        text = payload.get("text", "")
+        source = payload.get("source", "")
+        if text:
+            contexts.append(text)
+            sources.add(source)
+            chunks.append(payload)
+            vector = getattr(r, "vector", None)
+            if vector is not None:
+                vectors.append(vector["full"] if isinstance(vector, dict) else vector)
+    
+    found = {"contexts": contexts, "sources": list(sources), "chunks": chunks}
+    if vectors and len(vectors) == len(chunks):
+        found["vectors"] = vectors
+    return found
 
 
 class VectorStore:
-    """Manages vector storage and retrieval using Qdrant."""
+    """Manages vector storage and retrieval using Qdrant.
+    
+    With ``lexical=True`` (the default when ``SEARCH_MODE=hybrid``) an
+    in-process BM25 index over chunk texts is kept alongside the collection.
+    It is loaded from the collection's payloads on first use and updated on
+    every write through this store.
+    
+    With ``prefix_dim`` (``SEARCH_PREFIX_DIM``) each point also stores a
+    truncated, renormalized prefix of its vector, and searches run
+    prefix-first and rerank on the full vector.
+    
+    Upserts are split into ``batch_size`` point requests sent from
+    ``parallel`` threads. With ``wait=False`` Qdrant acknowledges each
+    request once it is logged rather than applied; ``flush`` then waits
+    until every earlier write, on every shard, is searchable.
+    """
     
     def __init__(
         self,
         url: str | None = None,
         collection: str | None = None,
-        dim: int | None = None
+        dim: int | None = None,
+        lexical: bool | None = None,
+        prefix_dim: int | None = None,
+        batch_size: int | None = None,
+        parallel: int | None = None,
+        prefer_grpc: bool | None = None
     ):
         self.url = url or settings.qdrant_url
         self.collection = collection or settings.qdrant_collection
         self.dim = dim or settings.embedding_dim
+        self.prefix_dim = prefix_dim or settings.search_prefix_dim
+        _check_prefix_dim(self.prefix_dim, self.dim)
+        if lexical is None:
+            lexical = settings.search_mode == "hybrid"
+        self.lexical = lexical
+        self.batch_size = batch_size or settings.qdrant_upsert_batch_size
+        self.parallel = parallel or settings.qdrant_upsert_parallel
+        self.prefer_grpc = settings.qdrant_prefer_grpc if prefer_grpc is None else prefer_grpc
+        self._lexical_index: BM25Index | None = None
         self._client = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        # Whether upserts were sent with wait=False since the last flush
+        self._unconfirmed = False
     
     @property
     def client(self) -> QdrantClient:
         """Lazy-load Qdrant client."""
         if self._client is None:
-            self._client = QdrantClient(url=self.url, timeout=30)
+            self._client = QdrantClient(
+                url=self.url,
+                timeout=settings.qdrant_timeout,
+                prefer_grpc=self.prefer_grpc,
+                grpc_port=settings.qdrant_grpc_port,
+            )
             self._ensure_collection()
         return self._client
     
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Threads that send upsert batches concurrently."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix="ragify-qdrant")
+            return self._executor
+    
+    def _vectors_config(self) -> VectorParams | dict[str, VectorParams]:
+        if self.prefix_dim is None:
+            return VectorParams(size=self.dim, distance=Distance.COSINE)
+        return {
+            "full": VectorParams(size=self.dim, distance=Distance.COSINE),
+            "prefix": VectorParams(size=self.prefix_dim, distance=Distance.COSINE),
+        }
+    
     def _ensure_collection(self):
-        """Create collection if it doesn't exist."""
-        if not self._client.collection_exists(self.collection):
+        """Create collection if it doesn't exist, or check an existing one's vector sizes."""
+        if self._client.collection_exists(self.collection):
+            existing = self._client.get_collection(self.collection).config.params.vectors
+            expected = self._vectors_config()
+            if isinstance(expected, dict) != isinstance(existing, dict) or (
+                isinstance(expected, dict) and set(expected) != set(existing)
+            ):
+                raise ValueError(
+                    f"Collection {self.collection!r} vector layout does not match "
+                    f"SEARCH_PREFIX_DIM={self.prefix_dim}; use a new collection"
+                )
+            if isinstance(expected, dict):
+                for name, params in expected.items():
+                    check_dim(existing[name].size, params.size, what=f"Collection {name!r}")
+            else:
+                check_dim(existing.size, expected.size, what="Collection")
+        else:
             self._client.create_collection(
                 collection_name=self.collection,
-                vectors_config=VectorParams(size=self.dim, distance=Distance.COSINE),
+                vectors_config=self._vectors_config(),
             )
+        # Payload indexes so per-source deletes and filtered searches avoid full
+        # scans; collections created before a field was indexed get it added
+        existing_indexes = self._client.get_collection(self.collection).payload_schema or {}
+        for field, schema in _PAYLOAD_INDEXES.items():
+            if field not in existing_indexes:
+                self._client.create_payload_index(
+                    collection_name=self.collection,
+                    field_name=field,
+                    field_schema=schema,
+                )
+    
+    def _scroll(self, scroll_filter: Filter | None = None, with_payload: bool = True):
+        """Yield every point matching ``scroll_filter``, one page at a time."""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                self.collection,
+                scroll_filter=scroll_filter,
+                limit=_SCROLL_PAGE,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=False,
+            )
+            yield from points
+            if offset is None:
+                break
+    
+    @property
+    def lexical_index(self) -> BM25Index | None:
+        """BM25 index over the collection's chunk texts, loaded on first use."""
+        if self.lexical and self._lexical_index is None:
+            index = BM25Index()
+            for point in self._scroll():
+                index.add(str(point.id), (point.payload or {}).get("text", ""))
+            self._lexical_index = index
+        return self._lexical_index
     
-    def upsert(self, ids: list[str], vectors: list[list[float]], payloads: list[dict]):
-        """Insert or update vectors in the collection."""
+    @metrics.timed("vector_upsert", store="qdrant")
+    def upsert(self, ids: list[str], vectors: list[list[float]], payloads: list[dict], wait: bool = True):
+        """Insert or update vectors in the collection.
+        
+        With ``wait=False`` this returns once Qdrant has accepted every batch;
+        call ``flush`` before relying on the points being searchable.
+        """
+        for vector in vectors:
+            check_dim(len(vector), self.dim)
+        metrics.items("vector_upsert", len(ids), store="qdrant")
+        if self.prefix_dim is not None:
+            prefixes = truncate(vectors, self.prefix_dim).tolist()
+            vectors = [
+                {"full": list(vector), "prefix": prefix}
+                for vector, prefix in zip(vectors, prefixes)
+            ]
         points = [
             PointStruct(id=ids[i], vector=vectors[i], payload=payloads[i])
             for i in range(len(ids))
         ]
-        self.client.upsert(self.collection, points=points)
+        batches = [points[i:i + self.batch_size] for i in range(0, len(points), self.batch_size)]
+        client = self.client
+        if len(batches) == 1:
+            client.upsert(self.collection, points=batches[0], wait=wait)
+        elif batches:
+            futures = [
+                self.executor.submit(client.upsert, self.collection, points=batch, wait=wait)
+                for batch in batches
+            ]
+            for future in futures:
+                future.result()
+        if batches and not wait:
+            self._unconfirmed = True
+        if self.lexical_index is not None:
+            for vec_id, payload in zip(ids, payloads):
+                self.lexical_index.add(str(vec_id), payload.get("text", ""))
+    
+    def flush(self):
+        """Wait until every upsert sent with ``wait=False`` has been applied.
+        
+        Sends a delete whose filter matches no point with ``wait=True``.
+        Filter operations go to every shard, and each shard applies updates
+        in the order it accepted them, so this returns only once every
+        write accepted before the call, on every shard, is searchable.
+        Writes still in flight from other threads when ``flush`` starts are
+        not covered.
+        """
+        if self._unconfirmed:
+            self.client.delete(self.collection, points_selector=FilterSelector(filter=_FLUSH_BARRIER), wait=True)
+            self._unconfirmed = False
+    
+    def close(self):
+        """Shut down the upsert threads and close the client's connections."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+    
+    def delete(self, ids: list[str]) -> int:
+        """Delete points by id. Returns the number of ids requested."""
+        if not ids:
+            return 0
+        self.client.delete(self.collection, points_selector=PointIdsList(points=ids))
+        if self.lexical_index is not None:
+            for vec_id in ids:
+                self.lexical_index.remove(str(vec_id))
+        return len(ids)
+    
+    def count_source(self, source: str) -> int:
+        """Number of points whose payload ``source`` matches."""
+        condition = Filter(must=[FieldCondition(key="source", match=MatchValue(value=source))])
+        return self.client.count(self.collection, count_filter=condition, exact=True).count
+    
+    def delete_by_source(self, source: str, keep_ids: list[str] | None = None) -> int:
+        """Delete every point whose payload ``source`` matches, except ``keep_ids``.
+        
+        Returns the number of points deleted.
+        """
+        condition = Filter(
+            must=[FieldCondition(key="source", match=MatchValue(value=source))],
+            must_not=[HasIdCondition(has_id=keep_ids)] if keep_ids else None,
+        )
+        deleted = self.client.count(self.collection, count_filter=condition, exact=True).count
+        if deleted:
+            if self.lexical_index is not None:
+                for point in self._scroll(condition, with_payload=False):
+                    self.lexical_index.remove(str(point.id))
+            self.client.delete(self.collection, points_selector=FilterSelector(filter=condition))
+        return deleted
     
-    def search(self, query_vector: list[float], top_k: int = 5) -> dict[str, list]:
-        """Search for similar vectors."""
-        results = self.client.search(
+    @metrics.timed("vector_search", store="qdrant")
+    def search(
+        self,
+        query_vector: list[float],
+        top_k: int = 5,
+        query_text: str | None = None,
+        filter: SearchFilter | None = None,
+        with_vectors: bool = False
+    ) -> dict[str, list]:
+        """Search for similar vectors, fused with BM25 ranks when ``query_text`` is given.
+        
+        ``filter`` is evaluated by Qdrant against the collection's payload indexes.
+        ``with_vectors`` adds the chunks' ``vectors`` (for diversity re-ranking).
+        """
+        check_dim(len(query_vector), self.dim, what="Query")
+        if query_text and self.lexical_index is not None:
+            return _format_results(self._hybrid_points(query_vector, query_text, top_k, filter, with_vectors))
+        response = self.client.query_points(
             collection_name=self.collection,
-            query_vector=query_vector,
             with_payload=True,
-            limit=top_k
+            with_vectors=_vectors_selector(self.prefix_dim, with_vectors),
+            **_dense_query(query_vector, top_k, self.prefix_dim, qdrant_filter(filter))
         )
+        return _format_results(response.points)
+    
+    @metrics.timed("vector_search_batch", store="qdrant")
+    def search_many(
+        self,
+        query_vectors: list[list[float]],
+        top_k: int = 5,
+        query_texts: list[str] | None = None,
+        filter: SearchFilter | None = None
+    ) -> list[dict[str, list]]:
+        """Search for several query vectors in one ``query_batch_points`` round-trip.
         
-        contexts = []
-        sources = set()
+        Returns one ``search`` result per query, in order. With ``query_texts``
+        each query's dense hits are fused with its BM25 hits as in ``search``.
+        """
+        for query_vector in query_vectors:
+            check_dim(len(query_vector), self.dim, what="Query")
+        if not query_vectors:
+            return []
+        hybrid = query_texts is not None and self.lexical_index is not None
+        depth = max(top_k, settings.hybrid_candidates) if hybrid else top_k
+        query_filter = qdrant_filter(filter)
+        responses = self.client.query_batch_points(
+            collection_name=self.collection,
+            requests=[_dense_request(v, depth, self.prefix_dim, query_filter) for v in query_vectors],
+        )
+        results = []
+        for i, response in enumerate(responses):
+            if hybrid and query_texts[i]:
+                results.append(_format_results(self._fuse(response.points, query_texts[i], top_k, filter)))
+            else:
+                results.append(_format_results(response.points[:top_k]))
+        return results
+    
+    def _hybrid_points(
+        self,
+        query_vector: list[float],
+        query_text: str,
+        top_k: int,
+        filter: SearchFilter | None = None,
+        with_vectors: bool = False
+    ) -> list:
+        """Dense and BM25 candidates fused with reciprocal-rank fusion, best first."""
+        depth = max(top_k, settings.hybrid_candidates)
+        dense = self.client.query_points(
+            collection_name=self.collection,
+            with_payload=True,
+            with_vectors=_vectors_selector(self.prefix_dim, with_vectors),
+            **_dense_query(query_vector, depth, self.prefix_dim, qdrant_filter(filter))
+        ).points
+        return self._fuse(dense, query_text, top_k, filter, with_vectors)
+    
+    def _fuse(
+        self,
+        dense: list,
+        query_text: str,
+        top_k: int,
+        filter: SearchFilter | None = None,
+        with_vectors: bool = False
+    ) -> list:
+        """Fuse dense hits with BM25 hits for ``query_text``, best first."""
+        vectors = _vectors_selector(self.prefix_dim, with_vectors)
+        depth = max(top_k, settings.hybrid_candidates)
+        points = {str(p.id): p for p in dense}
+        if filter:
+            # BM25 ranks every chunk; keep the hits whose payload passes the filter
+            hits = self.lexical_index.search(query_text, depth * _FILTERED_LEXICAL_OVERSAMPLE)
+            retrieved = self.client.retrieve(
+                self.collection, ids=[vec_id for vec_id, _ in hits], with_payload=True, with_vectors=vectors
+            )
+            for p in retrieved:
+                points.setdefault(str(p.id), p)
+            lexical_ids = [
+                vec_id for vec_id, _ in hits
+                if vec_id in points and payload_matches(points[vec_id].payload or {}, filter)
+            ][:depth]
+        else:
+            lexical_ids = [vec_id for vec_id, _ in self.lexical_index.search(query_text, depth)]
+        fused = reciprocal_rank_fusion([[str(p.id) for p in dense], lexical_ids], k=settings.rrf_k)[:top_k]
         
-        for r in results:
-            payload = getattr(r, "payload", None) or {}
-            text = payload.get("text", "")
-            source = payload.get("source", "")
-            if text:
-                contexts.append(text)
-                sources.add(source)
+        missing = [vec_id for vec_id, _ in fused if vec_id not in points]
+        if missing:
+            for p in self.client.retrieve(self.collection, ids=missing, with_payload=True, with_vectors=vectors):
+                points[str(p.id)] = p
+        return [points[vec_id] for vec_id, _ in fused if vec_id in points]
+
+
+class AsyncVectorStore:
+    """Read-side Qdrant access over ``AsyncQdrantClient`` for async services.
+    
+    One client (and its HTTP connection pool) is shared by every request.
+    """
+    
+    def __init__(
+        self,
+        url: str | None = None,
+        collection: str | None = None,
+        dim: int | None = None,
+        prefix_dim: int | None = None,
+    ):
+        self.url = url or settings.qdrant_url
+        self.collection = collection or settings.qdrant_collection
+        self.dim = dim or settings.embedding_dim
+        self.prefix_dim = prefix_dim or settings.search_prefix_dim
+        _check_prefix_dim(self.prefix_dim, self.dim)
+        self._client: AsyncQdrantClient | None = None
+    
+    @property
+    def client(self) -> AsyncQdrantClient:
+        """Lazy-load the async Qdrant client."""
+        if self._client is None:
+            self._client = AsyncQdrantClient(
+                url=self.url,
+                timeout=settings.qdrant_timeout,
+                prefer_grpc=settings.qdrant_prefer_grpc,
+                grpc_port=settings.qdrant_grpc_port,
+            )
+        return self._client
+    
+    @metrics.timed("vector_search", store="qdrant")
+    async def search(
+        self,
+        query_vector: list[float],
+        top_k: int = 5,
+        query_text: str | None = None,
+        filter: SearchFilter | None = None,
+        with_vectors: bool = False,
+    ) -> dict[str, list]:
+        """Search for similar vectors, optionally restricted by a metadata ``filter``.
         
-        return {"contexts": contexts, "sources": list(sources)}
+        Dense only: the BM25 index for hybrid search lives with the writing
+        ``VectorStore``, so ``query_text`` is accepted for interface parity.
+        ``with_vectors`` adds the chunks' ``vectors`` (for diversity re-ranking).
+        """
+        check_dim(len(query_vector), self.dim, what="Query")
+        response = await self.client.query_points(
+            collection_name=self.collection,
+            with_payload=True,
+            with_vectors=_vectors_selector(self.prefix_dim, with_vectors),
+            **_dense_query(query_vector, top_k, self.prefix_dim, qdrant_filter(filter)),
+        )
+        return _format_results(response.points)
+    
+    @metrics.timed("vector_search_batch", store="qdrant")
+    async def search_many(
+        self,
+        query_vectors: list[list[float]],
+        top_k: int = 5,
+        query_texts: list[str] | None = None,
+        filter: SearchFilter | None = None,
+    ) -> list[dict[str, list]]:
+        """Search for several query vectors in one ``query_batch_points`` round-trip (dense only)."""
+        for query_vector in query_vectors:
+            check_dim(len(query_vector), self.dim, what="Query")
+        if not query_vectors:
+            return []
+        query_filter = qdrant_filter(filter)
+        responses = await self.client.query_batch_points(
+            collection_name=self.collection,
+            requests=[_dense_request(v, top_k, self.prefix_dim, query_filter) for v in query_vectors],
+        )
+        return [_format_results(response.points) for response in responses]
+    
+    async def aclose(self):
+        """Close the client's connections."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
@@ -1,114 +1,169 @@
 """Standalone Streamlit UI for RAGify - No external servers needed!"""
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
 import streamlit as st
 import atexit
+import hashlib
 import shutil
+import uuid
 
+from ragify.answer_cache import SemanticAnswerCache
 from ragify.config import settings
-from ragify.document_processor import DocumentLoader, EmbeddingService
-from ragify.memory_vector_store import InMemoryVectorStore
+from ragify.embedding_backends import EmbeddingBackend, create_embedding_service
+from ragify.generation import AnswerGenerator
+from ragify.ingest_pipeline import IngestProgress, ProgressCallback
 from ragify.rag_service import RAGService
-from ragify.models import RAGQueryResult
+from ragify.models import RAGQueryResult, RAGUpsertResult
+from ragify.store_registry import StoreRegistry
 
 
 st.set_page_config(page_title="RAGify - Upload & Query PDFs", page_icon="📄", layout="centered")
 
 
+@st.cache_resource
+def get_upload_dirs() -> set[Path]:
+    """Upload directories created by this process, removed when it exits."""
+    dirs: set[Path] = set()
+    
+    def remove_all():
+        for path in dirs:
+            shutil.rmtree(path, ignore_errors=True)
+    
+    atexit.register(remove_all)
+    return dirs
+
+
+def tenant_upload_dir() -> Path:
+    """This user's own upload directory, so users never read each other's files."""
+    path = Path(settings.upload_dir) / hashlib.sha256(tenant_id().encode("utf-8")).hexdigest()[:32]
+    get_upload_dirs().add(path)
+    return path
+
+
 def cleanup_uploads():
-    """Clean up uploaded files when the session ends."""
-    uploads_dir = Path(settings.upload_dir)
+    """Delete this user's uploaded files (other users' uploads are left alone)."""
+    uploads_dir = tenant_upload_dir()
     if uploads_dir.exists():
         shutil.rmtree(uploads_dir)
-        st.write("🧹 Cleaned up uploaded files")
 
 
-# Register cleanup to run when Python exits
-atexit.register(cleanup_uploads)
+@st.cache_resource
+def get_store_registry() -> StoreRegistry:
+    """Get the registry of per-user vector stores (shared memory budget, LRU eviction, expiry)."""
+    return StoreRegistry()
+
+
+@st.cache_resource
+def get_embedding_service() -> EmbeddingBackend:
+    """Get the shared embedding service (and its cache)."""
+    return create_embedding_service()
+
+
+@st.cache_resource
+def get_answer_cache() -> SemanticAnswerCache | None:
+    """Get the shared answer cache; answers are scoped to each session's documents."""
+    if not settings.answer_cache_enabled:
+        return None
+    return SemanticAnswerCache(
+        threshold=settings.answer_cache_threshold,
+        ttl_seconds=settings.answer_cache_ttl_seconds,
+        max_entries=settings.answer_cache_max_entries,
+    )
+
+
+def tenant_id() -> str:
+    """Stable key of this user's documents in the store registry.
+    
+    Signed-in users (Streamlit authentication) are keyed by their account.
+    Anonymous visitors get a random token kept in the page URL
+    (``?tenant=...``), so reloading or bookmarking the page returns to the
+    same documents, also after a restart. Anyone with that URL sees them.
+    """
+    if "tenant_id" not in st.session_state:
+        if getattr(st.user, "is_logged_in", False):
+            key = f"user:{st.user.get('email') or st.user.get('sub')}"
+        else:
+            token = st.query_params.get("tenant")
+            if not token:
+                token = st.query_params["tenant"] = uuid.uuid4().hex
+            key = f"anon:{token}"
+        st.session_state["tenant_id"] = key
+    return st.session_state["tenant_id"]
+
+
+@contextmanager
+def session_rag_service() -> Iterator[RAGService]:
+    """RAG service over this user's own vector store.
+    
+    Users never see each other's documents. The store stays pinned in
+    memory while the block runs; afterwards it may be closed when the
+    stores together exceed the memory budget. With ``VECTOR_STORE_DIR`` (or
+    ``STORE_DIR``) it persists on disk and reopens on next use.
+    """
+    with get_store_registry().use(tenant_id()) as tenant:
+        yield RAGService(
+            embedding_service=get_embedding_service(),
+            vector_store=tenant.store,
+            manifest=tenant.manifest,
+            answer_cache=get_answer_cache(),
+        )
 
 
 @st.cache_resource
-def get_rag_service() -> RAGService:
-    """Get cached RAG service instance with in-memory vector store."""
-    memory_store = InMemoryVectorStore()
-    return RAGService(vector_store=memory_store)
+def get_answer_generator() -> AnswerGenerator:
+    """Get the shared answer generator (its LLM clients keep their connection pools)."""
+    return AnswerGenerator()
 
 
 def save_uploaded_pdf(file) -> Path:
-    """Save uploaded file to disk."""
-    uploads_dir = Path(settings.upload_dir)
+    """Save an uploaded file to this user's upload directory."""
+    uploads_dir = tenant_upload_dir()
     uploads_dir.mkdir(parents=True, exist_ok=True)
-    file_path = uploads_dir / file.name
+    file_path = uploads_dir / Path(file.name).name
     file_bytes = file.getbuffer()
     file_path.write_bytes(file_bytes)
     return file_path
 
 
-def ingest_pdf(pdf_path: Path) -> int:
-    """Ingest a PDF into the RAG system."""
-    rag_service = get_rag_service()
-    result = rag_service.ingest_document(str(pdf_path), source_id=pdf_path.name)
-    return result.ingested
+def ingest_pdf(pdf_path: Path, on_progress: ProgressCallback | None = None) -> RAGUpsertResult:
+    """Ingest a PDF into the RAG system (a no-op if it is already indexed)."""
+    with session_rag_service() as rag_service:
+        return rag_service.ingest_document(str(pdf_path), source_id=pdf_path.name, on_progress=on_progress)
 
 
-def query_rag(question: str, top_k: int = 5) -> dict:
-    """Query the RAG system and get an answer."""
-    rag_service = get_rag_service()
+def query_rag(question: str, top_k: int = 5, sources: list[str] | None = None) -> tuple[dict, Iterator[str]]:
+    """Query the RAG system, optionally limited to chunks from ``sources``.
     
-    # Search for relevant context
-    search_result = rag_service.search_context(question, top_k)
+    Returns the sources/number of contexts and an iterator over the answer
+    text, which streams from the LLM and is cached once complete.
+    """
+    search_filter = {"source": sources} if sources else None
+    with session_rag_service() as rag_service:
+        # Near-duplicate questions over unchanged documents reuse the cached answer
+        query_vector = rag_service.embed_query(question)
+        cached = rag_service.lookup_answer(query_vector, top_k, search_filter)
+        if cached is not None:
+            return {"sources": cached.sources, "num_contexts": cached.num_contexts}, iter([cached.answer])
+        
+        # Search for relevant context
+        search_result = rag_service.search_by_vector(query_vector, top_k, query_text=question, filter=search_filter)
     
     # Build prompt
     user_content = rag_service.build_prompt(question, search_result.contexts)
     
-    # Generate answer using LLM
-    import openai
-    from anthropic import Anthropic
+    def answer_stream() -> Iterator[str]:
+        parts = []
+        for text in get_answer_generator().stream(user_content):
+            parts.append(text)
+            yield text
+        rag_service.store_answer(query_vector, top_k, RAGQueryResult(
+            answer="".join(parts).strip(),
+            sources=search_result.sources,
+            num_contexts=len(search_result.contexts)
+        ), search_filter)
     
-    # Try Anthropic first if configured
-    if settings.anthropic_api_key:
-        try:
-            client = Anthropic(api_key=settings.anthropic_api_key)
-            response = client.messages.create(
-                model=settings.anthropic_model,
-                max_tokens=1024,
-                temperature=0.2,
-                messages=[
-                    {"role": "user", "content": user_content}
-                ]
-            )
-            answer = response.content[0].text.strip()
-        except Exception:
-            # Fallback to OpenAI
-            client = openai.OpenAI(api_key=settings.openai_api_key)
-            response = client.chat.completions.create(
-                model=settings.openai_model,
-                max_tokens=1024,
-                temperature=0.2,
-                messages=[
-                    {"role": "system", "content": "You answer questions using only the provided context."},
-                    {"role": "user", "content": user_content}
-                ]
-            )
-            answer = response.choices[0].message.content.strip()
-    else:
-        # Use OpenAI
-        client = openai.OpenAI(api_key=settings.openai_api_key)
-        response = client.chat.completions.create(
-            model=settings.openai_model,
-            max_tokens=1024,
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": "You answer questions using only the provided context."},
-                {"role": "user", "content": user_content}
-            ]
-        )
-        answer = response.choices[0].message.content.strip()
-    
-    return {
-        "answer": answer,
-        "sources": search_result.sources,
-        "num_contexts": len(search_result.contexts)
-    }
+    return {"sources": search_result.sources, "num_contexts": len(search_result.contexts)}, answer_stream()
 
 
 # UI Layout
@@ -120,25 +175,35 @@ with st.sidebar:
     st.header("ℹ️ About")
     st.write("RAGify uses:")
     st.write("- 🤖 Claude Sonnet (or OpenAI fallback)")
-    st.write("- 🔍 OpenAI embeddings")
+    st.write("- 🔍 OpenAI embeddings" if settings.embedding_backend == "openai" else "- 🔍 Local CPU embeddings")
     st.write("- � In-memory vector storage")
     
     st.divider()
     
     st.header("⚙️ Configuration")
     st.write(f"**LLM**: {settings.anthropic_model if settings.anthropic_api_key else settings.openai_model}")
-    st.write(f"**Embeddings**: {settings.embedding_model}")
+    st.write(f"**Embeddings**: {get_embedding_service().model}")
     
-    # Show vector store stats
-    rag_service = get_rag_service()
-    vector_count = rag_service.vector_store.count()
+    # Show this session's vector store stats
+    with session_rag_service() as rag_service:
+        vector_count = rag_service.vector_store.count()
+        document_sources = sorted(rag_service.manifest.sources())
     st.write(f"**Vectors stored**: {vector_count}")
+    registry_stats = get_store_registry().stats()
+    st.write(
+        f"**Store memory**: {registry_stats['used_bytes'] / 2**20:.1f} / "
+        f"{registry_stats['budget_bytes'] / 2**20:.0f} MB ({len(registry_stats['stores'])} users)"
+    )
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        cache_stats = answer_cache.stats()
+        st.write(f"**Answer cache hit rate**: {cache_stats['hit_rate']:.0%} ({cache_stats['hits']} hits)")
     
     # Add cleanup button
     st.divider()
-    if st.button("🧹 Clear All Files", type="secondary"):
+    if st.button("🧹 Clear My Files", type="secondary"):
         cleanup_uploads()
-        st.success("Uploaded files cleared!")
+        st.success("Your uploaded files were cleared!")
         st.rerun()
     
     if not settings.anthropic_api_key and not settings.openai_api_key:
@@ -152,8 +217,21 @@ if uploaded is not None:
     with st.spinner("Processing PDF..."):
         try:
             path = save_uploaded_pdf(uploaded)
-            num_chunks = ingest_pdf(path)
-            st.success(f"✅ Successfully ingested **{path.name}** ({num_chunks} chunks)")
+            progress_bar = st.progress(0.0, text="Parsing pages...")
+
+            def show_progress(progress: IngestProgress):
+                fraction = progress.pages_done / progress.pages_total if progress.pages_total else 0.0
+                progress_bar.progress(
+                    min(fraction, 1.0),
+                    text=f"Page {progress.pages_done}/{progress.pages_total} · {progress.chunks_stored} chunks stored",
+                )
+
+            result = ingest_pdf(path, show_progress)
+            progress_bar.empty()
+            if result.skipped:
+                st.success(f"✅ **{path.name}** is already indexed ({result.unchanged} chunks)")
+            else:
+                st.success(f"✅ Successfully ingested **{path.name}** ({result.ingested} chunks)")
             st.caption("You can now ask questions about this document below.")
         except Exception as e:
             st.error(f"❌ Failed to process PDF: {e}")
@@ -166,24 +244,28 @@ st.header("💬 Ask Questions")
 with st.form("rag_query_form"):
     question = st.text_input("Your question", placeholder="What is this document about?")
     top_k = st.number_input("Number of chunks to retrieve", min_value=1, max_value=20, value=5, step=1)
+    selected_sources = st.multiselect(
+        "Limit to documents", document_sources, placeholder="All documents"
+    )
     submitted = st.form_submit_button("Ask", type="primary")
 
     if submitted and question.strip():
-        with st.spinner("🤔 Thinking..."):
-            try:
-                result = query_rag(question.strip(), int(top_k))
-                
-                st.subheader("💡 Answer")
-                st.write(result["answer"] or "(No answer generated)")
-                
-                if result["sources"]:
-                    st.caption(f"📚 Sources ({len(result['sources'])} documents)")
-                    for s in result["sources"]:
-                        st.write(f"- {s}")
-                
-                st.caption(f"🔍 Retrieved {result['num_contexts']} relevant chunks")
-                
-            except Exception as e:
-                st.error(f"❌ Query failed: {e}")
-                if "api_key" in str(e).lower():
-                    st.info("💡 Set your API keys in the .env file (ANTHROPIC_API_KEY or OPENAI_API_KEY)")
+        try:
+            with st.spinner("🤔 Thinking..."):
+                result, answer_stream = query_rag(question.strip(), int(top_k), selected_sources)
+            
+            st.subheader("💡 Answer")
+            if not st.write_stream(answer_stream):
+                st.write("(No answer generated)")
+            
+            if result["sources"]:
+                st.caption(f"📚 Sources ({len(result['sources'])} documents)")
+                for s in result["sources"]:
+                    st.write(f"- {s}")
+            
+            st.caption(f"🔍 Retrieved {result['num_contexts']} relevant chunks")
+            
+        except Exception as e:
+            st.error(f"❌ Query failed: {e}")
+            if "api_key" in str(e).lower():
+                st.info("💡 Set your API keys in the .env file (ANTHROPIC_API_KEY or OPENAI_API_KEY)")
@@ -0,0 +1,49 @@
+from ragify.context_packing import overlap_length, pack_chunks, pack_contexts
+from ragify.tokens import count_tokens
+
+FIRST = "The quick brown fox jumps over the lazy dog."
+SECOND = "over the lazy dog. Then it ran into the forest."
+
+
+def chunk(text, source="a.pdf", index=None):
+    payload = {"text": text, "source": source}
+    if index is not None:
+        payload["chunk_index"] = index
+    return payload
+
+
+def test_overlap_length():
+    assert overlap_length(FIRST, SECOND) == len("over the lazy dog.")
+    # Shared text shorter than the minimum is coincidence, not overlap
+    assert overlap_length("ends with dog.", "dog. starts") == 0
+
+
+def test_adjacent_chunks_merge_in_document_order():
+    # Ranked second chunk first; the passage still reads in document order
+    packed = pack_contexts([chunk(SECOND, index=1), chunk(FIRST, index=0)])
+    assert packed == ["The quick brown fox jumps over the lazy dog. Then it ran into the forest."]
+
+
+def test_chunks_of_other_sources_or_far_apart_stay_separate():
+    packed = pack_contexts([chunk(FIRST, index=0), chunk(SECOND, index=2), chunk(SECOND + " Again.", "b.pdf", index=1)])
+    assert packed == [FIRST, SECOND, SECOND + " Again."]
+
+
+def test_duplicates_are_dropped():
+    chunks = [chunk(FIRST, index=0), chunk(FIRST, index=0), chunk(SECOND), chunk(SECOND, "b.pdf")]
+    assert pack_contexts(chunks) == [FIRST, SECOND]
+
+
+def test_budget_cuts_lower_ranked_chunks():
+    other = "An unrelated passage about quarterly revenue figures."
+    chunks = [chunk(FIRST, index=0), chunk(other, "b.pdf", index=5), chunk(SECOND, "c.pdf")]
+    budget = count_tokens(FIRST) + count_tokens(other)
+    assert pack_contexts(chunks, budget) == [FIRST, other]
+    # The best chunk is kept even when it alone exceeds the budget
+    assert pack_contexts(chunks, 1) == [FIRST]
+
+
+def test_sources_follow_the_kept_chunks():
+    chunks = [chunk(FIRST, "b.pdf", index=0), chunk(SECOND, "a.pdf"), chunk(FIRST, "c.pdf")]
+    assert pack_chunks(chunks) == ([FIRST, SECOND], ["b.pdf", "a.pdf"])
+    assert pack_chunks(chunks, 1) == ([FIRST], ["b.pdf"])
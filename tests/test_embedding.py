@@ -0,0 +1,115 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ragify.document_processor import EmbeddingService
+
+
+def rate_limited(retry_after):
+    return SimpleNamespace(response=SimpleNamespace(headers={"retry-after": retry_after}))
+
+
+@pytest.mark.parametrize("header, expected", [("2", 2.0), ("0.5", 0.5), ("3600", 30.0), ("-1", 0.0)])
+def test_backoff_honors_and_clamps_retry_after(header, expected):
+    assert EmbeddingService._backoff(0, rate_limited(header)) == expected
+
+
+def test_backoff_without_retry_after_is_bounded():
+    for attempt in range(12):
+        assert 0 < EmbeddingService._backoff(attempt, rate_limited("soon")) <= 30.0
+
+
+def test_local_embedding_service_is_abstract():
+    from ragify.embedding_backends import LocalEmbeddingService
+
+    with pytest.raises(TypeError):
+        LocalEmbeddingService(dim=8)
+
+
+def test_hashing_embeddings_are_normalized_and_deterministic():
+    import numpy as np
+
+    from ragify.embedding_backends import HashingEmbeddingService
+
+    service = HashingEmbeddingService(dim=256)
+    texts = ["the quick brown fox", "the quick brown fox", "an unrelated sentence", ""]
+    vectors = np.asarray(service.embed_texts(texts))
+    assert vectors.shape == (4, 256)
+    np.testing.assert_allclose(np.linalg.norm(vectors[:3], axis=1), 1.0, rtol=1e-5)
+    assert not vectors[3].any()
+    assert vectors[0] @ vectors[1] == pytest.approx(1.0)
+    assert vectors[0] @ vectors[2] < 0.5
+
+
+def test_hashing_signs_are_independent_of_buckets():
+    import numpy as np
+
+    from ragify.embedding_backends import HashingEmbeddingService
+
+    dim = 64
+    service = HashingEmbeddingService(dim=dim)
+    # One feature per text: each vector is +-1 in a single bucket
+    vectors = np.asarray(service.embed_texts([f"w{i}" for i in range(4000)]))
+    hot = np.abs(vectors).argmax(axis=1)
+    signs = np.sign(vectors[np.arange(len(vectors)), hot])
+    # Every bucket sees both signs about equally often
+    for bucket in range(dim):
+        in_bucket = signs[hot == bucket]
+        assert len(in_bucket) > 20
+        assert abs(in_bucket.mean()) < 0.5
+
+
+def test_concurrency_limit_spans_callers(monkeypatch):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from ragify.config import settings
+
+    monkeypatch.setattr(settings, "openai_api_key", "test")
+    monkeypatch.setattr(settings, "embedding_cache_path", None)
+    service = EmbeddingService(max_concurrency=2)
+    service.dimensions = None
+    in_flight, peak, lock = 0, 0, threading.Lock()
+
+    def create(input, **params):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight -= 1
+        data = [SimpleNamespace(index=i, embedding=[0.0] * service.dim) for i in range(len(input))]
+        return SimpleNamespace(data=data)
+
+    service.client = SimpleNamespace(embeddings=SimpleNamespace(create=create))
+    # Every call fits in one batch, so none of them goes through the executor
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(service.embed_texts, [[f"text {i}"] for i in range(16)]))
+    assert all(len(r) == 1 for r in results)
+    assert peak == 2
+
+
+def test_cached_embed_embeds_each_miss_once(tmp_path):
+    import asyncio
+
+    from ragify.embedding_cache import EmbeddingCache, acached_embed, cached_embed
+
+    cache = EmbeddingCache(tmp_path / "cache.db")
+    calls = []
+
+    def embed(texts):
+        calls.append(texts)
+        return [[float(len(t)), 0.0] for t in texts]
+
+    assert cached_embed(cache, "m", 2, ["a", "bb", "a"], embed) == [[1.0, 0.0], [2.0, 0.0], [1.0, 0.0]]
+    assert cached_embed(cache, "m", 2, ["bb", "ccc"], embed) == [[2.0, 0.0], [3.0, 0.0]]
+    assert calls == [["a", "bb"], ["ccc"]]
+
+    async def aembed(texts):
+        return embed(texts)
+
+    assert asyncio.run(acached_embed(cache, "m", 2, ["ccc", "dddd"], aembed)) == [[3.0, 0.0], [4.0, 0.0]]
+    assert calls[-1] == ["dddd"]
+    cache.close()
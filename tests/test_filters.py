@@ -0,0 +1,54 @@
+import pytest
+from pydantic import ValidationError
+
+from ragify.filters import payload_matches, validate_filter
+from ragify.models import RAGQueryRequest
+
+
+@pytest.mark.parametrize("filter", [
+    {"source": "a.pdf"},
+    {"source": ["a.pdf", "b.pdf"]},
+    {"page": 3},
+    {"page": [1, 2]},
+    {"page": {"gte": 3, "lte": 5.5}},
+    {"ingested_at": {"gt": 1735689600}},
+])
+def test_valid_filters_are_returned_unchanged(filter):
+    assert validate_filter(filter) is filter
+
+
+def test_empty_filter_is_none():
+    assert validate_filter({}) is None
+    assert validate_filter(None) is None
+
+
+@pytest.mark.parametrize("filter", [
+    {"author": "x"},
+    {"source": {"gt": "a"}},
+    {"page": {"near": 3}},
+    {"page": {}},
+    {"source": []},
+    {"page": "3"},
+    {"page": True},
+    {"page": [1, "2"]},
+    {"page": {"gte": "3"}},
+    {"ingested_at": {"lt": None}},
+    {"source": 3},
+    {"source": ["a.pdf", 1]},
+])
+def test_invalid_filters_raise_value_error(filter):
+    with pytest.raises(ValueError):
+        validate_filter(filter)
+
+
+def test_request_model_rejects_bad_filter():
+    # FastAPI turns the ValidationError into a 422 response
+    with pytest.raises(ValidationError):
+        RAGQueryRequest(question="q", filter={"page": {"gte": "three"}})
+
+
+def test_payload_matches():
+    payload = {"source": "a.pdf", "page": 4}
+    assert payload_matches(payload, {"source": ["a.pdf"], "page": {"gte": 3, "lt": 5}})
+    assert not payload_matches(payload, {"page": {"gt": 4}})
+    assert not payload_matches(payload, {"ingested_at": {"gt": 0}})
@@ -0,0 +1,124 @@
+import threading
+
+import pytest
+
+from ragify.ingest_pipeline import ChunkRecord, IngestPipeline, IngestProgress
+
+
+class FakeEmbeddings:
+    def embed_texts(self, texts):
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+class FakeStore:
+    def __init__(self):
+        self.ids = []
+
+    def upsert(self, ids, vectors, payloads, wait=True):
+        self.ids.extend(ids)
+
+
+class StopScript(BaseException):
+    """Stands in for Streamlit's StopException, which is not an Exception."""
+
+
+def records(n):
+    return (ChunkRecord(f"c{i}", f"chunk {i}", {"i": i}) for i in range(n))
+
+
+def ingest_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("ragify-ingest")]
+
+
+def test_run_stores_every_record():
+    store = FakeStore()
+    progress = IngestProgress("doc")
+    seen = []
+    pipeline = IngestPipeline(FakeEmbeddings(), store, batch_size=4, queue_size=2, embed_workers=3)
+    assert pipeline.run(records(50), progress, seen.append) == 50
+    assert sorted(store.ids) == sorted(f"c{i}" for i in range(50))
+    assert progress.done and seen[-1].done
+    assert not ingest_threads()
+
+
+@pytest.mark.parametrize("error", [StopScript, RuntimeError])
+def test_raising_callback_stops_and_joins_stages(error):
+    def on_progress(progress):
+        if not progress.done:
+            raise error("stop")
+
+    # Small queues so producers would block for good if nothing drained them
+    pipeline = IngestPipeline(FakeEmbeddings(), FakeStore(), batch_size=1, queue_size=1, embed_workers=2)
+    with pytest.raises(error):
+        pipeline.run(records(1000), IngestProgress("doc"), on_progress)
+    assert not ingest_threads()
+
+
+def test_embed_error_is_reraised():
+    class Failing(FakeEmbeddings):
+        def embed_texts(self, texts):
+            raise ValueError("embedding failed")
+
+    pipeline = IngestPipeline(Failing(), FakeStore(), batch_size=2, queue_size=1, embed_workers=2)
+    with pytest.raises(ValueError, match="embedding failed"):
+        pipeline.run(records(100), IngestProgress("doc"))
+    assert not ingest_threads()
+
+
+def test_failed_batch_is_retried_per_group_in_its_stage():
+    class FailingOnBad(FakeEmbeddings):
+        def embed_texts(self, texts):
+            if any("bad" in t for t in texts):
+                raise ValueError("embedding failed")
+            return super().embed_texts(texts)
+
+    class CallerThreadStore(FakeStore):
+        def __init__(self):
+            super().__init__()
+            self.threads = set()
+
+        def upsert(self, ids, vectors, payloads, wait=True):
+            self.threads.add(threading.current_thread())
+            if any(p["doc"] == "locked" for p in payloads):
+                raise OSError("store failed")
+            super().upsert(ids, vectors, payloads, wait)
+
+    batch = [
+        ChunkRecord("a0", "good chunk", {"doc": "a"}),
+        ChunkRecord("b0", "bad chunk", {"doc": "b"}),
+        ChunkRecord("a1", "good chunk again", {"doc": "a"}),
+        ChunkRecord("c0", "fine chunk", {"doc": "locked"}),
+        ChunkRecord("d0", "other chunk", {"doc": "d"}),
+    ]
+    failed = []
+    store = CallerThreadStore()
+    progress = IngestProgress("docs")
+    pipeline = IngestPipeline(FailingOnBad(), store, batch_size=5, queue_size=1, embed_workers=2)
+    stored = pipeline.run(
+        iter(batch), progress,
+        on_error=lambda records, error: failed.append(({r.payload["doc"] for r in records}, type(error))),
+        group_key=lambda record: record.payload["doc"],
+    )
+    assert sorted(store.ids) == ["a0", "a1", "d0"]
+    assert stored == progress.chunks_stored == 3
+    assert sorted(failed, key=str) == [({"b"}, ValueError), ({"locked"}, OSError)]
+    assert store.threads == {threading.current_thread()}
+
+
+def test_records_generator_is_closed_when_run_stops():
+    closed = threading.Event()
+
+    def source():
+        try:
+            yield from records(1000)
+        finally:
+            closed.set()
+
+    class Failing(FakeEmbeddings):
+        def embed_texts(self, texts):
+            raise ValueError("embedding failed")
+
+    pipeline = IngestPipeline(Failing(), FakeStore(), batch_size=1, queue_size=1, embed_workers=1)
+    with pytest.raises(ValueError):
+        pipeline.run(source(), IngestProgress("doc"))
+    assert closed.is_set()
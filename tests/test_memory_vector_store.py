@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from ragify.memory_vector_store import InMemoryVectorStore, _resize_npy
+
+
+def unit(*values):
+    v = np.asarray(values, dtype=np.float32)
+    return (v / np.linalg.norm(v)).tolist()
+
+
+def make_store(path=None, **kwargs):
+    return InMemoryVectorStore(persist_dir=path, index="flat", lexical=False, quantization="none", **kwargs)
+
+
+def test_resize_npy_keeps_rows(tmp_path):
+    path = tmp_path / "m.npy"
+    data = np.arange(12, dtype=np.float32).reshape(3, 4)
+    np.save(path, data)
+    _resize_npy(path, 1000, 4)
+    grown = np.load(path)
+    assert grown.shape == (1000, 4)
+    np.testing.assert_array_equal(grown[:3], data)
+    assert not grown[3:].any()
+
+
+def test_reopen_restores_vectors_and_payloads(tmp_path):
+    store = make_store(tmp_path, initial_capacity=2)
+    store.upsert([f"c{i}" for i in range(5)], [unit(1, i, 0) for i in range(5)],
+                 [{"source": "a.pdf", "page": i, "text": f"t{i}"} for i in range(5)])
+    store.close()
+
+    reopened = make_store(tmp_path)
+    assert reopened.count() == 5
+    hits = reopened.search_hits(unit(1, 3, 0), top_k=1)
+    assert hits[0]["id"] == "c3" and hits[0]["payload"]["page"] == 3
+
+
+def test_overwrite_uses_fresh_row_and_survives_reopen(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert(["a", "b"], [unit(1, 0), unit(0, 1)], [{"source": "x", "v": 1}, {"source": "x"}])
+    old_row = store._id_to_row["a"]
+    store.upsert(["a"], [unit(0, 1)], [{"source": "x", "v": 2}])
+    assert store._id_to_row["a"] != old_row
+    assert not store._alive[old_row]
+    assert store.count() == 2
+    store.close()
+
+    reopened = make_store(tmp_path)
+    assert reopened.count() == 2
+    row = reopened._id_to_row["a"]
+    assert reopened.payloads[row]["v"] == 2
+    np.testing.assert_allclose(reopened._matrix[row], unit(0, 1), atol=1e-6)
+
+
+def test_uncommitted_overwrite_leaves_old_vector(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert(["a"], [unit(1, 0)], [{"source": "x"}])
+    # Simulate a crash after the row write but before the log commit
+    store._append_records = lambda records: None
+    store.upsert(["a"], [unit(0, 1)], [{"source": "x"}])
+    store._log.close()
+
+    reopened = make_store(tmp_path)
+    np.testing.assert_allclose(reopened._matrix[reopened._id_to_row["a"]], unit(1, 0), atol=1e-6)
+
+
+def test_compact_after_overwrites(tmp_path):
+    store = make_store(tmp_path)
+    for _ in range(3):
+        store.upsert(["a", "b"], [unit(1, 0), unit(0, 1)], [{"source": "x"}, {"source": "y"}])
+    store.compact()
+    assert store._size == 2 and store.count() == 2
+    store.close()
+    assert make_store(tmp_path).count() == 2
+
+
+def test_overwrite_in_memory_store_is_in_place():
+    store = make_store()
+    store.upsert(["a"], [unit(1, 0)], [{"source": "x"}])
+    store.upsert(["a"], [unit(0, 1)], [{"source": "x"}])
+    assert store._size == 1
+    assert store.search_hits(unit(0, 1), top_k=1)[0]["score"] == pytest.approx(1.0)
+
+
+def test_stores_share_search_pool_and_shard_exactly():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(500, 8)).astype(np.float32)
+    flat = make_store()
+    sharded = [make_store(shard_size=64, search_threads=3) for _ in range(2)]
+    for store in (flat, *sharded):
+        store.upsert([f"v{i}" for i in range(len(data))], data, [{"source": "s"} for _ in data])
+    assert sharded[0].executor is sharded[1].executor
+    query = data[7].tolist()
+    expected = [h["id"] for h in flat.search_hits(query, top_k=10)]
+    assert [h["id"] for h in sharded[0].search_hits(query, top_k=10)] == expected
+    sharded[0].close()
+    # Closing one store leaves the shared pool usable by the other
+    assert [h["id"] for h in sharded[1].search_hits(query, top_k=10)] == expected
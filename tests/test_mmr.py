@@ -0,0 +1,51 @@
+import numpy as np
+
+from ragify.mmr import mmr_rerank, mmr_select, rank_relevance
+
+
+def found_from(chunks, vectors):
+    return {
+        "contexts": [chunk["text"] for chunk in chunks],
+        "sources": sorted({chunk["source"] for chunk in chunks}),
+        "chunks": chunks,
+        "vectors": vectors,
+    }
+
+
+def test_rank_relevance_spans_unit_interval():
+    assert rank_relevance(0).tolist() == []
+    assert rank_relevance(1).tolist() == [1.0]
+    assert np.allclose(rank_relevance(3), [1.0, 0.5, 0.0])
+
+
+def test_mmr_select_skips_near_duplicates():
+    vectors = [[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]]
+    assert mmr_select(vectors, rank_relevance(3), top_k=2) == [0, 2]
+    # Relevance only
+    assert mmr_select(vectors, rank_relevance(3), top_k=2, lambda_mult=1.0) == [0, 1]
+
+
+def test_mmr_select_empty_and_top_k_bounds():
+    assert mmr_select([], [], top_k=3) == []
+    assert mmr_select([[1.0, 0.0]], [1.0], top_k=0) == []
+    assert mmr_select([[1.0, 0.0], [0.0, 1.0]], rank_relevance(2), top_k=5) == [0, 1]
+
+
+def test_mmr_rerank_keeps_store_order_for_lexical_hits():
+    # The store ranked a BM25-only hit first; its vector is far from the others
+    chunks = [
+        {"text": "lexical", "source": "a.pdf"},
+        {"text": "dense one", "source": "b.pdf"},
+        {"text": "dense two", "source": "b.pdf"},
+    ]
+    vectors = [[0.0, 1.0], [1.0, 0.0], [0.98, 0.02]]
+    diverse = mmr_rerank(found_from(chunks, vectors), top_k=2)
+    assert diverse["contexts"] == ["lexical", "dense one"]
+    assert sorted(diverse["sources"]) == ["a.pdf", "b.pdf"]
+
+
+def test_mmr_rerank_without_vectors_truncates():
+    chunks = [{"text": f"t{i}", "source": "a.pdf"} for i in range(4)]
+    found = found_from(chunks, None)
+    del found["vectors"]
+    assert mmr_rerank(found, top_k=2)["contexts"] == ["t0", "t1"]
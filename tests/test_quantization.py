@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from ragify import quantization
+from ragify.quantization import QuantizedCodes
+
+
+@pytest.fixture
+def vectors():
+    data = np.random.default_rng(0).normal(size=(1000, 48)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("buffer_elements", [48, 48 * 7, 1 << 17])
+def test_int8_scores_match_dequantized_product(vectors, monkeypatch, buffer_elements):
+    monkeypatch.setattr(quantization, "_INT8_BUFFER_ELEMENTS", buffer_elements)
+    codes = QuantizedCodes("int8", 48)
+    codes.resize(len(vectors))
+    codes.set(np.arange(len(vectors)), vectors)
+    query = vectors[3]
+    expected = (codes.codes.astype(np.float32) * codes.scales[:, None]) @ query
+    np.testing.assert_allclose(codes.scores(query, size=len(vectors)), expected, rtol=1e-5, atol=1e-6)
+    rows = np.array([999, 5, 3, 500])
+    np.testing.assert_allclose(codes.scores(query, rows=rows), expected[rows], rtol=1e-5, atol=1e-6)
+    assert codes.scores(query, size=len(vectors)).argmax() == 3
+
+
+def test_binary_scores_rank_the_query_first(vectors):
+    codes = QuantizedCodes("binary", 48)
+    codes.resize(len(vectors))
+    codes.set(np.arange(len(vectors)), vectors)
+    scores = codes.scores(vectors[7], size=len(vectors))
+    assert scores[7] == 0 and scores.max() == 0
@@ -0,0 +1,154 @@
+import pytest
+
+from ragify.embedding_backends import HashingEmbeddingService
+from ragify.manifest import IngestManifest
+from ragify.memory_vector_store import InMemoryVectorStore
+from ragify.rag_service import RAGService
+
+
+class FailingEmbeddings(HashingEmbeddingService):
+    """Fails any batch containing a chunk with ``poison`` in it."""
+
+    def embed_texts(self, texts):
+        if any("poison" in t for t in texts):
+            raise RuntimeError("rate limited")
+        return super().embed_texts(texts)
+
+
+class FakeLoader:
+    """Stands in for DocumentLoader: a "PDF" is a text file with one chunk per line."""
+
+    chunk_size, chunk_overlap = 1024, 0
+
+    @staticmethod
+    def page_count(path):
+        return 1
+
+    @staticmethod
+    def iter_chunks(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                yield 1, line.strip()
+
+
+def make_service(embedding_service=None, manifest=None, vector_store=None):
+    return RAGService(
+        document_loader=FakeLoader(),
+        embedding_service=embedding_service or HashingEmbeddingService(dim=256),
+        vector_store=vector_store or InMemoryVectorStore(index="flat", lexical=False, quantization="none"),
+        manifest=manifest or IngestManifest(),
+    )
+
+
+def fake_parse(service, documents):
+    """Bypass the PDF process pool: ``documents`` maps source id -> chunk texts."""
+    def parsed(files, workers):
+        for source_id, texts in documents.items():
+            entry = service.manifest.get(source_id)
+            if isinstance(texts, BaseException):
+                yield source_id, texts
+            elif entry and entry["file_hash"] == f"hash-{source_id}":
+                yield source_id, (entry["file_hash"], None)
+            else:
+                yield source_id, (f"hash-{source_id}", [(1, t) for t in texts])
+    service._resolve_pdfs = lambda path: [(source_id, source_id) for source_id in documents]
+    service._parsed_documents = parsed
+
+
+def test_ingest_directory_reports_embed_failures_per_document():
+    service = make_service(FailingEmbeddings(dim=256))
+    fake_parse(service, {
+        "good.pdf": ["alpha beta", "gamma delta"],
+        "bad.pdf": ["poison pill"],
+        "broken.pdf": ValueError("not a pdf"),
+    })
+    service.ingest_directory("docs", workers=1)
+    result = service.ingest_directory("docs", workers=1)
+    failed = {f.path for f in result.failed}
+    assert failed == {"bad.pdf", "broken.pdf"}
+    # good.pdf was recorded by the first run, so the second skips it
+    assert service.manifest.get("good.pdf") is not None
+    assert service.manifest.get("bad.pdf") is None
+    assert result.skipped == 1
+    assert result.documents == 0 and result.docs_per_sec == 0.0
+
+
+def test_ingest_directory_counts_only_ingested_documents():
+    service = make_service(FailingEmbeddings(dim=256))
+    fake_parse(service, {"a.pdf": ["one"], "b.pdf": ["two"], "c.pdf": ["poison"]})
+    result = service.ingest_directory("docs", workers=1)
+    assert result.documents == 2
+    assert result.chunks == 2
+    assert service.vector_store.count() == 2
+
+
+def test_manifest_written_for_finished_documents_when_run_is_interrupted():
+    service = make_service()
+    fake_parse(service, {"a.pdf": ["one", "two"], "b.pdf": ["three"]})
+
+    class Interrupt(BaseException):
+        pass
+
+    def on_progress(progress):
+        if progress.chunks_stored and not progress.done:
+            raise Interrupt
+
+    with pytest.raises(Interrupt):
+        service.ingest_directory("docs", workers=1, on_progress=on_progress)
+    # Every chunk made it into the store before the interrupt, so both are recorded
+    assert service.vector_store.count() == 3
+    assert service.manifest.get("a.pdf") and service.manifest.get("b.pdf")
+
+
+def write_doc(path, *chunks):
+    path.write_text("\n".join(chunks), encoding="utf-8")
+    return str(path)
+
+
+def test_ingest_document_skips_unchanged_file(tmp_path):
+    service = make_service(manifest=IngestManifest(tmp_path / "manifest.json"))
+    doc = write_doc(tmp_path / "a.pdf", "alpha", "beta")
+    assert service.ingest_document(doc, "a.pdf").ingested == 2
+    result = service.ingest_document(doc, "a.pdf")
+    assert result.skipped and result.unchanged == 2
+
+
+def test_ingest_document_reingests_when_store_lost_chunks(tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    doc = write_doc(tmp_path / "a.pdf", "solar panels convert light", "wind turbines spin blades")
+    make_service(manifest=IngestManifest(manifest_path)).ingest_document(doc, "a.pdf")
+
+    # A restarted process: persistent manifest, empty in-memory store
+    service = make_service(manifest=IngestManifest(manifest_path))
+    result = service.ingest_document(doc, "a.pdf")
+    assert not result.skipped and result.ingested == 2
+    assert service.vector_store.count_source("a.pdf") == 2
+    assert service.search_context("solar light", top_k=1).contexts == ["solar panels convert light"]
+
+
+def test_ingest_document_reembeds_only_changed_chunks(tmp_path):
+    service = make_service()
+    doc = write_doc(tmp_path / "a.pdf", "alpha", "beta", "gamma")
+    service.ingest_document(doc, "a.pdf")
+    result = service.ingest_document(write_doc(tmp_path / "a.pdf", "alpha", "BETA"), "a.pdf")
+    assert (result.ingested, result.unchanged, result.deleted) == (1, 1, 1)
+    assert service.vector_store.count_source("a.pdf") == 2
+
+
+def test_search_result_sources_match_packed_contexts(monkeypatch):
+    from ragify.config import settings
+    from ragify.rag_service import RAGService
+
+    monkeypatch.setattr(settings, "context_packing", True)
+    monkeypatch.setattr(settings, "context_max_tokens", 1)
+    found = {
+        "contexts": ["first passage of text", "second passage of text"],
+        "sources": ["b.pdf", "a.pdf"],
+        "chunks": [
+            {"text": "first passage of text", "source": "a.pdf", "chunk_index": 0},
+            {"text": "second passage of text", "source": "b.pdf", "chunk_index": 4},
+        ],
+    }
+    result = RAGService.search_result(found)
+    assert result.contexts == ["first passage of text"]
+    assert result.sources == ["a.pdf"]
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from ragify.memory_vector_store import InMemoryVectorStore
+from ragify.store_registry import StoreRegistry
+
+
+def factory(**kwargs):
+    return InMemoryVectorStore(index="flat", lexical=False, quantization="none", **kwargs)
+
+
+def add(tenant, prefix, n=50, dim=16):
+    vectors = np.random.default_rng(len(prefix)).normal(size=(n, dim))
+    tenant.store.upsert([f"{prefix}{i}" for i in range(n)], vectors, [{"source": prefix, "text": "x" * 200}] * n)
+
+
+def test_keys_are_isolated():
+    registry = StoreRegistry(budget_bytes=1 << 30, store_factory=factory)
+    with registry.use("alice") as tenant:
+        add(tenant, "a")
+    with registry.use("bob") as tenant:
+        assert tenant.store.count() == 0
+    with registry.use("alice") as tenant:
+        assert tenant.store.count() == 50
+
+
+def test_stores_persist_across_restarts(tmp_path):
+    registry = StoreRegistry(budget_bytes=1 << 30, store_dir=tmp_path, store_factory=factory)
+    with registry.use("alice") as tenant:
+        add(tenant, "a")
+        tenant.manifest.set("a.pdf", "hash", ["c"] * 50)
+    registry.drop("nobody")
+
+    restarted = StoreRegistry(budget_bytes=1 << 30, store_dir=tmp_path, store_factory=factory)
+    with restarted.use("alice") as tenant:
+        assert tenant.store.count() == 50
+        assert tenant.manifest.get("a.pdf")["file_hash"] == "hash"
+    assert restarted.reloads == 1
+
+
+def test_over_budget_evicts_least_recently_used(tmp_path):
+    registry = StoreRegistry(budget_bytes=1, store_dir=tmp_path, store_factory=factory)
+    for key in ("a", "b", "c"):
+        with registry.use(key) as tenant:
+            add(tenant, key)
+    # Only the most recent store stays resident
+    assert list(registry.stats()["stores"]) == ["c"]
+    assert registry.evictions == 2
+    with registry.use("a") as tenant:
+        assert tenant.store.count() == 50
+
+
+def test_without_store_dir_evicted_documents_are_dropped():
+    registry = StoreRegistry(budget_bytes=1, store_factory=factory)
+    for key in ("a", "b"):
+        with registry.use(key) as tenant:
+            add(tenant, key)
+    with registry.use("a") as tenant:
+        assert tenant.store.count() == 0
+
+
+def test_pinned_stores_are_not_evicted():
+    registry = StoreRegistry(budget_bytes=1, store_factory=factory)
+    with registry.use("a") as a:
+        add(a, "a")
+        with registry.use("b") as b:
+            add(b, "b")
+        with registry.use("c") as c:
+            add(c, "c")
+        assert "a" in registry.stats()["stores"]
+    assert a.store.count() == 50
+
+
+def test_slow_close_runs_outside_the_registry_lock(tmp_path):
+    closing = threading.Event()
+    release = threading.Event()
+
+    class SlowStore(InMemoryVectorStore):
+        def close(self):
+            closing.set()
+            release.wait(5)
+            super().close()
+
+    def slow_factory(**kwargs):
+        return SlowStore(index="flat", lexical=False, quantization="none", **kwargs)
+
+    registry = StoreRegistry(budget_bytes=1, store_dir=tmp_path, store_factory=slow_factory)
+    with registry.use("a") as tenant:
+        add(tenant, "a")
+
+    def evict_a():
+        with registry.use("b") as tenant:
+            add(tenant, "b")
+
+    evictor = threading.Thread(target=evict_a)
+    evictor.start()
+    assert closing.wait(5)
+    # Another key is served while "a" is still being closed
+    with registry.use("c") as tenant:
+        assert tenant.store.count() == 0
+
+    # "a" itself waits for its close to finish, then reopens every row
+    seen = []
+    reader = threading.Thread(target=lambda: seen.append(registry.use("a").__enter__().store.count()))
+    reader.start()
+    time.sleep(0.1)
+    assert not seen
+    release.set()
+    evictor.join(5)
+    reader.join(5)
+    assert seen == [50]
+
+
+def test_expire_removes_idle_stores_in_memory_and_on_disk(tmp_path):
+    registry = StoreRegistry(budget_bytes=1 << 30, store_dir=tmp_path, ttl_seconds=3600, store_factory=factory)
+    for key in ("old", "new"):
+        with registry.use(key) as tenant:
+            add(tenant, key)
+    registry._entries["old"].last_used -= 7200
+    # A store left on disk by an earlier process, idle for two hours
+    with StoreRegistry(budget_bytes=1 << 30, store_dir=tmp_path, store_factory=factory).use("gone") as tenant:
+        add(tenant, "gone")
+    gone = registry._store_path("gone")
+    os.utime(gone, (time.time() - 7200, time.time() - 7200))
+
+    assert registry.expire() == 2
+    assert list(registry.stats()["stores"]) == ["new"]
+    assert not registry._store_path("old").exists() and not gone.exists()
+    assert sorted(os.listdir(tmp_path)) == [registry._store_path("new").name]
+    with registry.use("old") as tenant:
+        assert tenant.store.count() == 0
+
+
+def test_drop_deletes_store_files(tmp_path):
+    registry = StoreRegistry(budget_bytes=1 << 30, store_dir=tmp_path, store_factory=factory)
+    with registry.use("a") as tenant:
+        add(tenant, "a")
+    registry.drop("a")
+    assert not os.listdir(tmp_path)
+    with registry.use("a") as tenant:
+        assert tenant.store.count() == 0
+
+
+@pytest.mark.parametrize("with_dir", [False, True])
+def test_concurrent_use_of_many_keys(tmp_path, with_dir):
+    registry = StoreRegistry(budget_bytes=200_000, store_dir=tmp_path if with_dir else None, store_factory=factory)
+    errors = []
+
+    def worker(i):
+        try:
+            for round in range(5):
+                with registry.use(f"k{(i + round) % 6}") as tenant:
+                    add(tenant, f"k{i}-{round}-", n=20)
+                    tenant.store.search_hits(np.ones(16).tolist(), top_k=3)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    assert not errors
+    assert not registry._busy
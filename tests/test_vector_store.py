@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("qdrant_client")
+from qdrant_client import QdrantClient  # noqa: E402
+
+from ragify.vector_store import VectorStore, qdrant_filter  # noqa: E402
+
+
+def make_store(**kwargs):
+    store = VectorStore(dim=4, lexical=False, parallel=1, batch_size=2, **kwargs)
+    store._client = QdrantClient(":memory:")
+    store._ensure_collection()
+    return store
+
+
+def point_id(i):
+    return f"00000000-0000-0000-0000-{i:012d}"
+
+
+def test_flush_barrier_after_unwaited_upserts(monkeypatch):
+    store = make_store()
+    deletes = []
+    original = store.client.delete
+    monkeypatch.setattr(store.client, "delete", lambda *a, **kw: deletes.append(kw) or original(*a, **kw))
+
+    store.flush()
+    assert not deletes
+
+    store.upsert([point_id(i) for i in range(5)], [[1, 0, 0, i] for i in range(5)], [{"source": "a"}] * 5, wait=False)
+    # A later waited upsert does not confirm earlier batches on other shards
+    store.upsert([point_id(9)], [[0, 1, 0, 0]], [{"source": "b"}], wait=True)
+    store.flush()
+    assert len(deletes) == 1 and deletes[0]["wait"] is True
+    # The barrier deletes nothing
+    assert store.count_source("a") == 5 and store.count_source("b") == 1
+
+    store.flush()
+    assert len(deletes) == 1
+
+
+@pytest.mark.parametrize("filter", [
+    {"page": 2.0},
+    {"page": [1.5, 2]},
+    {"ingested_at": 1735689600.25},
+    {"chunk_index": {"gte": 0.5}},
+])
+def test_qdrant_filter_accepts_float_values(filter):
+    assert qdrant_filter(filter) is not None
+
+
+def test_float_equality_filters_match_in_qdrant():
+    store = make_store()
+    store.upsert(
+        [point_id(i) for i in range(4)],
+        [[1, 0, 0, i] for i in range(4)],
+        [{"source": "a", "text": f"t{i}", "page": i, "ingested_at": 1735689600.25 + i} for i in range(4)],
+    )
+
+    def hits(filter):
+        return len(store.search([1, 0, 0, 0], top_k=10, filter=filter)["chunks"])
+
+    assert hits({"page": 2.0}) == 1
+    assert hits({"page": [1.0, 3]}) == 2
+    assert hits({"ingested_at": 1735689601.25}) == 1
+    assert hits({"page": 2.5}) == 0